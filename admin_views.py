@@ -1,83 +1,77 @@
 import streamlit as st
 import pandas as pd
-import time
 import io
-import base64
-from db_utils import (
-    get_product_by_id, get_user_by_id, get_order_by_id, get_complaint_by_id, 
-    respond_to_complaint, get_all_users, get_all_products, get_all_orders, 
-    get_all_complaints, get_all_ratings, get_user_orders, get_user_complaints,
-    update_product
+import os
+from backend import (
+    get_product_by_id, get_user_by_id, get_complaint_by_id,
+    respond_to_complaint, get_user_orders, get_user_complaints,
+    update_product, get_users_by_ids, get_products_by_ids,
+    get_users_page, count_users, get_products_page, count_products,
+    get_complaints_page, count_complaints, get_product_filter_options,
+    get_product_stats, get_product_ratings, get_dashboard_summary, export_table_csv,
+    import_products, import_users, import_orders, get_query_instrumentation,
+    set_query_instrumentation, get_query_stats, get_slow_queries, reset_query_stats,
+    get_pool_stats, get_cache_stats, get_snapshot_stats, get_page_timings,
+    get_write_retry_stats, get_write_behind_stats
 )
+from utils import paginate, flash
+from loader import load_parallel
 
 def show_admin_dashboard():
     """Display the admin dashboard with summary information."""
     st.title("Admin Dashboard")
     
-    # Get database information
-    users_df = get_all_users()
-    products_df = get_all_products()
-    orders_df = get_all_orders()
-    complaints_df = get_all_complaints()
-    ratings_df = get_all_ratings()
+    # Counters, recent activity and low stock come from one summary query set
+    summary = get_dashboard_summary()
     
     # Summary metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         # Total users (excluding admin)
-        total_users = len(users_df[~users_df["is_admin"]])
-        st.metric("Total Customers", total_users)
+        st.metric("Total Customers", summary["customers"])
     
     with col2:
         # Total products
-        st.metric("Total Products", len(products_df))
+        st.metric("Total Products", summary["products"])
     
     with col3:
         # Total orders
-        st.metric("Total Orders", len(orders_df))
+        st.metric("Total Orders", summary["orders"])
     
     with col4:
         # Open complaints
-        open_complaints = len(complaints_df[complaints_df["status"] == "Pending"])
-        st.metric("Open Complaints", open_complaints)
+        st.metric("Open Complaints", summary["open_complaints"])
     
     # Recent activity
     st.subheader("Recent Activity")
     
-    # Recent orders
-    if not orders_df.empty:
+    # Recent orders (already joined with username and product name)
+    recent_orders = summary["recent_orders"]
+    
+    if not recent_orders.empty:
         st.write("**Recent Orders:**")
         
-        recent_orders = orders_df.sort_values(by="created_at", ascending=False).head(5)
-        
         for _, order in recent_orders.iterrows():
-            user = get_user_by_id(order["user_id"])
-            product = get_product_by_id(order["product_id"])
-            
-            if user is not None and product is not None:
-                st.write(f"Order #{order['id']} - {user['username']} purchased {order['quantity']} × {product['name']} for ${order['total_price']:.2f} ({order['created_at'].strftime('%Y-%m-%d')})")
+            st.write(f"Order #{order['id']} - {order['username']} purchased {order['quantity']} × {order['product_name']} for ${order['total_price']:.2f} ({order['created_at'].strftime('%Y-%m-%d')})")
         
         st.divider()
     
-    # Recent complaints
-    if not complaints_df.empty:
+    # Recent complaints (already joined with username)
+    recent_complaints = summary["recent_complaints"]
+    
+    if not recent_complaints.empty:
         st.write("**Recent Complaints:**")
         
-        recent_complaints = complaints_df.sort_values(by="created_at", ascending=False).head(5)
-        
         for _, complaint in recent_complaints.iterrows():
-            user = get_user_by_id(complaint["user_id"])
-            
-            if user is not None:
-                st.write(f"Complaint #{complaint['id']} - {user['username']} - {complaint['subject']} - Status: {complaint['status']} ({complaint['created_at'].strftime('%Y-%m-%d')})")
+            st.write(f"Complaint #{complaint['id']} - {complaint['username']} - {complaint['subject']} - Status: {complaint['status']} ({complaint['created_at'].strftime('%Y-%m-%d')})")
         
         st.divider()
     
     # Low stock alerts
     st.subheader("Low Stock Alerts")
     
-    low_stock_products = products_df[products_df["stock"] < 10].sort_values(by="stock")
+    low_stock_products = summary["low_stock"]
     
     if not low_stock_products.empty:
         for _, product in low_stock_products.iterrows():
@@ -88,60 +82,45 @@ def show_admin_dashboard():
     # Export data section
     st.subheader("Export Data")
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        if st.button("Export Users"):
-            csv = users_df.to_csv(index=False)
-            b64 = base64.b64encode(csv.encode()).decode()
-            href = f'<a href="data:file/csv;base64,{b64}" download="users.csv">Download CSV File</a>'
-            st.markdown(href, unsafe_allow_html=True)
-    
-    with col2:
-        if st.button("Export Products"):
-            csv = products_df.to_csv(index=False)
-            b64 = base64.b64encode(csv.encode()).decode()
-            href = f'<a href="data:file/csv;base64,{b64}" download="products.csv">Download CSV File</a>'
-            st.markdown(href, unsafe_allow_html=True)
-    
-    with col3:
-        if st.button("Export Orders"):
-            csv = orders_df.to_csv(index=False)
-            b64 = base64.b64encode(csv.encode()).decode()
-            href = f'<a href="data:file/csv;base64,{b64}" download="orders.csv">Download CSV File</a>'
-            st.markdown(href, unsafe_allow_html=True)
+    # Each export is streamed to a temporary file, offered as a download in the same
+    # run and deleted straight away, so later reruns don't re-read or keep it
+    for column, table in zip(st.columns(3), ("users", "products", "orders")):
+        with column:
+            if st.button(f"Export {table.title()}"):
+                export_path = export_table_csv(table)
+                
+                try:
+                    with open(export_path, "rb") as export_file:
+                        st.download_button(
+                            "Download CSV File",
+                            export_file,
+                            file_name=f"{table}.csv",
+                            mime="text/csv",
+                            key=f"{table}_download"
+                        )
+                finally:
+                    os.remove(export_path)
 
 def show_user_management():
     """Display the user management page."""
     st.title("User Management")
     
-    # Get user data
-    users_df = get_all_users()
-    
-    # Filter out admin users for display
-    regular_users = users_df[~users_df["is_admin"]]
-    
     # Search/filter options
     search_query = st.text_input("Search by Username or Email")
     
-    if search_query:
-        query_lower = search_query.lower()
-        filtered_users = regular_users[
-            regular_users["username"].str.lower().str.contains(query_lower) | 
-            regular_users["email"].str.lower().str.contains(query_lower)
-        ]
-    else:
-        filtered_users = regular_users
+    # Display user list (admin users are left out)
+    st.subheader(f"Users ({count_users(search_query)})")
     
-    # Display user list
-    st.subheader(f"Users ({len(filtered_users)})")
+    # Get one page of users, newest first
+    filtered_users = paginate(
+        "users_page",
+        lambda cursor: get_users_page(cursor, search_query=search_query),
+        filters=(search_query,)
+    )
     
     if filtered_users.empty:
         st.info("No users found.")
     else:
-        # Sort users by creation date
-        filtered_users = filtered_users.sort_values(by="created_at", ascending=False)
-        
         # Display users in a table
         st.dataframe(
             filtered_users[["id", "username", "email", "created_at"]],
@@ -157,10 +136,13 @@ def show_user_management():
     # User details section
     st.subheader("User Details")
     
+    # Users on the current page
+    usernames = dict(zip(filtered_users["id"], filtered_users["username"]))
+    
     selected_user_id = st.selectbox(
         "Select User",
-        options=regular_users["id"].tolist(),
-        format_func=lambda x: f"{get_user_by_id(x)['username']} (ID: {x})"
+        options=filtered_users["id"].tolist(),
+        format_func=lambda x: f"{usernames[x]} (ID: {x})"
     )
     
     if selected_user_id:
@@ -199,9 +181,10 @@ def show_user_management():
                 else:
                     # Sort orders by date
                     user_orders = user_orders.sort_values(by="created_at", ascending=False)
+                    products = get_products_by_ids(user_orders["product_id"])
                     
                     for _, order in user_orders.iterrows():
-                        product = get_product_by_id(order["product_id"])
+                        product = products.get(order["product_id"])
                         
                         if product is not None:
                             st.write(f"**Order #{order['id']}** - {order['created_at'].strftime('%Y-%m-%d')}")
@@ -235,8 +218,7 @@ def show_user_management():
                                         success, message = respond_to_complaint(complaint["id"], response)
                                         
                                         if success:
-                                            st.success("Response submitted successfully!")
-                                            time.sleep(1)
+                                            flash("Response submitted successfully!")
                                             st.rerun()
                                         else:
                                             st.error(message)
@@ -249,9 +231,6 @@ def show_complaint_management():
     """Display the complaint management page."""
     st.title("Complaint Management")
     
-    # Get complaints data
-    complaints_df = get_all_complaints()
-    
     # Filter options
     col1, col2 = st.columns(2)
     
@@ -262,142 +241,115 @@ def show_complaint_management():
         )
     
     with col2:
-        search_query = st.text_input("Search by Subject")
-    
-    # Apply filters
-    filtered_complaints = complaints_df.copy()
-    
-    if status_filter != "All":
-        filtered_complaints = filtered_complaints[filtered_complaints["status"] == status_filter]
+        search_query = st.text_input("Search by Subject or Description")
     
-    if search_query:
-        query_lower = search_query.lower()
-        filtered_complaints = filtered_complaints[
-            filtered_complaints["subject"].str.lower().str.contains(query_lower)
-        ]
+    # Count the complaints in each tab that the status filter allows
+    pending_count = count_complaints("Pending", search_query) if status_filter in ("All", "Pending") else 0
+    resolved_count = count_complaints("Resolved", search_query) if status_filter in ("All", "Resolved") else 0
     
     # Display complaints
-    st.subheader(f"Complaints ({len(filtered_complaints)})")
+    st.subheader(f"Complaints ({pending_count + resolved_count})")
     
-    if filtered_complaints.empty:
+    if pending_count + resolved_count == 0:
         st.info("No complaints found.")
     else:
-        # Sort complaints by date (most recent first)
-        filtered_complaints = filtered_complaints.sort_values(by="created_at", ascending=False)
-        
         # Create tabs for pending and resolved
-        pending_complaints = filtered_complaints[filtered_complaints["status"] == "Pending"]
-        resolved_complaints = filtered_complaints[filtered_complaints["status"] == "Resolved"]
-        
-        tab1, tab2 = st.tabs([f"Pending ({len(pending_complaints)})", f"Resolved ({len(resolved_complaints)})"])
+        tab1, tab2 = st.tabs([f"Pending ({pending_count})", f"Resolved ({resolved_count})"])
         
         with tab1:
-            if pending_complaints.empty:
+            if pending_count == 0:
                 st.info("No pending complaints.")
             else:
+                # One page of complaints, joined with user, order and product, most recent first
+                pending_complaints = paginate(
+                    "pending_complaints",
+                    lambda cursor: get_complaints_page("Pending", search_query, cursor),
+                    filters=(search_query,)
+                )
+                
                 for _, complaint in pending_complaints.iterrows():
-                    user = get_user_by_id(complaint["user_id"])
-                    order = get_order_by_id(complaint["order_id"])
+                    st.write(f"**Complaint #{complaint['id']}** - {complaint['created_at'].strftime('%Y-%m-%d')}")
+                    st.write(f"User: {complaint['username']} | Order: #{complaint['order_id']} | Product: {complaint['product_name']}")
+                    st.write(f"Subject: {complaint['subject']}")
                     
-                    if user is not None and order is not None:
-                        product = get_product_by_id(order["product_id"])
+                    with st.expander("View Details & Respond"):
+                        st.write(f"**Description:**")
+                        st.write(complaint['description'])
                         
-                        if product is not None:
-                            st.write(f"**Complaint #{complaint['id']}** - {complaint['created_at'].strftime('%Y-%m-%d')}")
-                            st.write(f"User: {user['username']} | Order: #{order['id']} | Product: {product['name']}")
-                            st.write(f"Subject: {complaint['subject']}")
-                            
-                            with st.expander("View Details & Respond"):
-                                st.write(f"**Description:**")
-                                st.write(complaint['description'])
-                                
-                                st.divider()
-                                
-                                response = st.text_area(f"Response to Complaint #{complaint['id']}", key=f"response_{complaint['id']}")
+                        st.divider()
+                        
+                        response = st.text_area(f"Response to Complaint #{complaint['id']}", key=f"response_{complaint['id']}")
+                        
+                        if st.button(f"Submit Response", key=f"submit_{complaint['id']}"):
+                            if response:
+                                success, message = respond_to_complaint(complaint["id"], response)
                                 
-                                if st.button(f"Submit Response", key=f"submit_{complaint['id']}"):
-                                    if response:
-                                        success, message = respond_to_complaint(complaint["id"], response)
-                                        
-                                        if success:
-                                            st.success("Response submitted successfully!")
-                                            time.sleep(1)
-                                            st.rerun()
-                                        else:
-                                            st.error(message)
-                                    else:
-                                        st.error("Please enter a response.")
-                            
-                            st.divider()
+                                if success:
+                                    flash("Response submitted successfully!")
+                                    st.rerun()
+                                else:
+                                    st.error(message)
+                            else:
+                                st.error("Please enter a response.")
+                    
+                    st.divider()
         
         with tab2:
-            if resolved_complaints.empty:
+            if resolved_count == 0:
                 st.info("No resolved complaints.")
             else:
+                resolved_complaints = paginate(
+                    "resolved_complaints",
+                    lambda cursor: get_complaints_page("Resolved", search_query, cursor),
+                    filters=(search_query,)
+                )
+                
                 for _, complaint in resolved_complaints.iterrows():
-                    user = get_user_by_id(complaint["user_id"])
-                    order = get_order_by_id(complaint["order_id"])
+                    st.write(f"**Complaint #{complaint['id']}** - {complaint['created_at'].strftime('%Y-%m-%d')}")
+                    st.write(f"User: {complaint['username']} | Order: #{complaint['order_id']} | Product: {complaint['product_name']}")
+                    st.write(f"Subject: {complaint['subject']}")
                     
-                    if user is not None and order is not None:
-                        product = get_product_by_id(order["product_id"])
+                    with st.expander("View Details"):
+                        st.write(f"**Description:**")
+                        st.write(complaint['description'])
                         
-                        if product is not None:
-                            st.write(f"**Complaint #{complaint['id']}** - {complaint['created_at'].strftime('%Y-%m-%d')}")
-                            st.write(f"User: {user['username']} | Order: #{order['id']} | Product: {product['name']}")
-                            st.write(f"Subject: {complaint['subject']}")
-                            
-                            with st.expander("View Details"):
-                                st.write(f"**Description:**")
-                                st.write(complaint['description'])
-                                
-                                st.divider()
-                                
-                                st.write(f"**Admin Response:**")
-                                st.write(complaint['admin_response'])
-                                st.write(f"Responded on: {complaint['updated_at'].strftime('%Y-%m-%d %H:%M')}")
-                            
-                            st.divider()
+                        st.divider()
+                        
+                        st.write(f"**Admin Response:**")
+                        st.write(complaint['admin_response'])
+                        st.write(f"Responded on: {complaint['updated_at'].strftime('%Y-%m-%d %H:%M')}")
+                    
+                    st.divider()
 
 def show_product_management():
     """Display the product management page."""
     st.title("Product Management")
     
-    # Get products data
-    products_df = get_all_products()
-    
     # Filter options
     col1, col2 = st.columns(2)
     
     with col1:
         category_filter = st.selectbox(
             "Filter by Category",
-            options=["All Categories"] + list(products_df["category"].unique())
+            options=["All Categories"] + get_product_filter_options()["categories"]
         )
     
     with col2:
         search_query = st.text_input("Search by Product Name")
     
-    # Apply filters
-    filtered_products = products_df.copy()
-    
-    if category_filter != "All Categories":
-        filtered_products = filtered_products[filtered_products["category"] == category_filter]
-    
-    if search_query:
-        query_lower = search_query.lower()
-        filtered_products = filtered_products[
-            filtered_products["name"].str.lower().str.contains(query_lower)
-        ]
-    
     # Display products
-    st.subheader(f"Products ({len(filtered_products)})")
+    st.subheader(f"Products ({count_products(category_filter, search_query)})")
+    
+    # Get one page of products, sorted by name
+    filtered_products = paginate(
+        "products_page",
+        lambda cursor: get_products_page(cursor, category=category_filter, name_query=search_query),
+        filters=(category_filter, search_query)
+    )
     
     if filtered_products.empty:
         st.info("No products found.")
     else:
-        # Sort products by name
-        filtered_products = filtered_products.sort_values(by="name")
-        
         # Display products in a table
         st.dataframe(
             filtered_products[["id", "name", "category", "price", "stock"]],
@@ -414,14 +366,23 @@ def show_product_management():
     # Product details section
     st.subheader("Product Details")
     
+    # Products on the current page
+    product_names = dict(zip(filtered_products["id"], filtered_products["name"]))
+    
     selected_product_id = st.selectbox(
         "Select Product",
-        options=products_df["id"].tolist(),
-        format_func=lambda x: f"{get_product_by_id(x)['name']} (ID: {x})"
+        options=filtered_products["id"].tolist(),
+        format_func=lambda x: f"{product_names[x]} (ID: {x})"
     )
     
     if selected_product_id:
-        product = get_product_by_id(selected_product_id)
+        # The product, its statistics and its ratings are independent reads, so they run at the same time
+        product_data = load_parallel(
+            product=lambda: get_product_by_id(selected_product_id),
+            stats=lambda: get_product_stats(selected_product_id),
+            ratings=lambda: get_product_ratings(selected_product_id)
+        )
+        product = product_data["product"]
         
         if product is not None:
             col1, col2 = st.columns(2)
@@ -437,47 +398,37 @@ def show_product_management():
                 st.write(product['description'])
             
             # Product sales and ratings
-            orders_df = get_all_orders()
-            product_orders = orders_df[orders_df["product_id"] == selected_product_id]
-            
-            ratings_df = get_all_ratings()
-            product_ratings = ratings_df[ratings_df["product_id"] == selected_product_id]
+            stats = product_data["stats"]
+            product_ratings = product_data["ratings"]
             
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("Sales Statistics")
                 
-                if product_orders.empty:
+                if stats["units_sold"] == 0:
                     st.info("No sales for this product.")
                 else:
-                    total_sales = product_orders["quantity"].sum()
-                    total_revenue = product_orders["total_price"].sum()
-                    
-                    st.metric("Total Units Sold", total_sales)
-                    st.metric("Total Revenue", f"${total_revenue:.2f}")
+                    st.metric("Total Units Sold", stats["units_sold"])
+                    st.metric("Total Revenue", f"${stats['revenue']:.2f}")
             
             with col2:
                 st.subheader("Ratings")
                 
-                if product_ratings.empty:
+                if stats["rating_count"] == 0:
                     st.info("No ratings for this product.")
                 else:
-                    avg_rating = product_ratings["rating"].mean()
-                    num_ratings = len(product_ratings)
-                    
-                    st.metric("Average Rating", f"{avg_rating:.1f}/5.0")
-                    st.metric("Number of Ratings", num_ratings)
+                    st.metric("Average Rating", f"{stats['average_rating']:.1f}/5.0")
+                    st.metric("Number of Ratings", stats["rating_count"])
             
             # Display ratings
             if not product_ratings.empty:
                 st.subheader("Customer Reviews")
                 
-                # Sort ratings by date
-                product_ratings = product_ratings.sort_values(by="created_at", ascending=False)
+                users = get_users_by_ids(product_ratings["user_id"])
                 
                 for _, rating in product_ratings.iterrows():
-                    user = get_user_by_id(rating["user_id"])
+                    user = users.get(rating["user_id"])
                     
                     if user is not None:
                         st.write(f"**{user['username']}** - {'⭐' * int(rating['rating'])} ({rating['created_at'].strftime('%Y-%m-%d')})")
@@ -508,8 +459,151 @@ def show_product_management():
                     )
                     
                     if success:
-                        st.success("Product updated successfully!")
-                        time.sleep(1)
+                        flash("Product updated successfully!")
                         st.rerun()
                     else:
                         st.error(f"Error updating product: {message}")
+
+def show_bulk_import():
+    """Display the bulk import page for products, users and historical orders."""
+    st.title("Bulk Import")
+    
+    importers = {
+        "Products": (import_products, "name, category, price, stock; optional: description, created_at"),
+        "Users": (import_users, "username, email, password; optional: is_admin, created_at"),
+        "Orders": (import_orders, "user_id, product_id, quantity; optional: total_price, status, created_at")
+    }
+    
+    dataset = st.selectbox("Data to Import", list(importers))
+    importer, columns_help = importers[dataset]
+    st.caption(f"Columns: {columns_help}")
+    
+    if dataset == "Orders":
+        st.caption("Imported orders are treated as history: they count towards sales statistics but do not change stock.")
+    
+    uploaded_file = st.file_uploader("CSV or Parquet File", type=["csv", "parquet"])
+    
+    if uploaded_file is not None and st.button("Import"):
+        progress_bar = st.progress(0.0, text="Starting import...")
+        
+        def report(rows, inserted):
+            # The read position in the upload tracks how far through the file we are
+            done = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+            progress_bar.progress(done, text=f"Processed {rows} rows, imported {inserted}")
+        
+        try:
+            result = importer(uploaded_file, progress=report)
+        except Exception as e:
+            st.error(f"Import failed: {e}")
+            return
+        
+        progress_bar.progress(1.0, text=f"Processed {result['rows']} rows")
+        st.success(f"Imported {result['inserted']} of {result['rows']} rows.")
+        
+        if result["failed"]:
+            st.warning(f"{result['failed']} rows were skipped.")
+            st.dataframe(pd.DataFrame(result["errors"]), hide_index=True, use_container_width=True)
+
+def show_performance():
+    """Display query timing, slow queries and cache/pool counters."""
+    st.title("Performance")
+    
+    settings = get_query_instrumentation()
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        enabled = st.toggle("Record query statistics", value=settings["enabled"])
+    
+    with col2:
+        slow_query_ms = st.number_input("Slow query threshold (ms)", value=float(settings["slow_query_ms"]),
+                                        min_value=0.0, step=10.0)
+    
+    if enabled != settings["enabled"] or slow_query_ms != settings["slow_query_ms"]:
+        set_query_instrumentation(enabled, slow_query_ms)
+    
+    if not enabled:
+        st.info("Query statistics are off. Turn them on to time every SQL statement the app runs.")
+    
+    # Per-statement counters
+    st.subheader("Queries")
+    query_stats = get_query_stats()
+    
+    if query_stats:
+        stats_df = pd.DataFrame(query_stats)
+        stats_df["callers"] = stats_df["callers"].map(
+            lambda callers: ", ".join(f"{caller} ({count})" for caller, count in callers.items())
+        )
+        st.dataframe(
+            stats_df[["sql", "calls", "total_ms", "mean_ms", "max_ms", "rows", "callers"]].round(3),
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.write("No statements recorded yet.")
+    
+    if st.button("Reset Statistics"):
+        reset_query_stats()
+        st.rerun()
+    
+    # Slow queries with their plans
+    st.subheader("Slow Queries")
+    slow_queries = get_slow_queries()
+    
+    if slow_queries:
+        st.caption(f"Also written to {settings['slow_query_log']}")
+        
+        for query in slow_queries:
+            with st.expander(f"{query['duration_ms']:.1f} ms - {query['caller']} ({query['at'][:19]})"):
+                st.code(query["sql"], language="sql")
+                
+                if query["plan"]:
+                    st.write("**Query plan:**")
+                    st.code("\n".join(query["plan"]))
+    else:
+        st.write("No slow queries recorded.")
+    
+    # Whole-rerun timings from the rerun profiler
+    st.subheader("Slowest Pages")
+    page_timings = get_page_timings()
+    
+    if page_timings:
+        st.dataframe(
+            pd.DataFrame(page_timings)[["page", "reruns", "mean_ms", "max_ms", "mean_data_ms", "mean_queries"]].round(3),
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.write("No reruns profiled yet. Tick \"Profile reruns\" in the sidebar or set CRM_PROFILE_RERUNS=1.")
+    
+    # Connection pool and cache counters
+    st.subheader("Connection Pool and Caches")
+    
+    pool_stats = get_pool_stats()
+    retry_stats = get_write_retry_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Open Connections", pool_stats["open"])
+    col2.metric("In Use", pool_stats["in_use"])
+    col3.metric("Waits for a Connection", pool_stats["waits"])
+    col4.metric("Busy Retries", retry_stats["retries"], help=f"{retry_stats['gave_up']} writes gave up on a locked database")
+    
+    cache_stats = pd.DataFrame(get_cache_stats()).T
+    st.dataframe(cache_stats, use_container_width=True)
+    
+    snapshot_stats = get_snapshot_stats()
+    st.write(f"**Table snapshots:** {snapshot_stats['hits']} hits, {snapshot_stats['misses']} misses")
+    
+    # Group commits of complaints, ratings and responses
+    st.subheader("Write-Behind Queue")
+    write_behind_stats = get_write_behind_stats()
+    
+    if write_behind_stats is None:
+        st.write("Off. Set CRM_WRITE_BEHIND=1 to commit complaints, ratings and responses in batches.")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Writes", write_behind_stats["writes"], help=f"{write_behind_stats['failed']} failed")
+        col2.metric("Mean Batch Size", f"{write_behind_stats['mean_batch']:.1f}",
+                    help=f"Largest {write_behind_stats['max_batch']} of at most {write_behind_stats['batch_size']}")
+        col3.metric("Mean Queue Latency", f"{write_behind_stats['mean_queue_ms']:.1f} ms",
+                    help=f"Slowest {write_behind_stats['max_queue_ms']:.1f} ms from queueing to commit")
+        col4.metric("Pending", write_behind_stats["pending"])
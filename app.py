@@ -3,17 +3,31 @@ import pandas as pd
 import time
 
 from authentication import login, register, logout, check_authentication
-from db_utils import initialize_database
+from backend import initialize_database, supports_bulk_import
 from user_views import show_dashboard, show_product_search, show_order_history, show_complaint_form, show_ratings
-from admin_views import show_admin_dashboard, show_user_management, show_complaint_management, show_product_management
-from utils import initialize_session_state
+from admin_views import show_admin_dashboard, show_user_management, show_complaint_management, show_product_management, show_bulk_import, show_performance
+from utils import initialize_session_state, show_flash_messages, show_rerun_profile
+from profiler import PROFILE_RERUNS, profile_rerun, phase
 
 def main():
     # Initialize the session state
     initialize_session_state()
     
+    # Time this rerun if profiling is on for every session or for this admin's session
+    with profile_rerun(PROFILE_RERUNS or st.session_state.get("profile_reruns", False)) as profile:
+        page = render_page()
+        
+        if profile is not None:
+            profile.page = page
+    
+    if profile is not None and st.session_state.is_authenticated and st.session_state.is_admin:
+        show_rerun_profile(profile)
+
+def render_page():
+    """Draw the sidebar and the selected view, returning the name of the page shown."""
     # Initialize the database if not already done
-    initialize_database()
+    with phase("initialize_database"):
+        initialize_database()
     
     # Set page config
     st.set_page_config(
@@ -23,8 +37,11 @@ def main():
         initial_sidebar_state="expanded"
     )
     
+    # Confirmations queued by the handler that triggered this rerun
+    show_flash_messages()
+    
     # Display the sidebar for navigation
-    with st.sidebar:
+    with phase("sidebar"), st.sidebar:
         st.title("CRM System")
         
         if not st.session_state.is_authenticated:
@@ -40,10 +57,17 @@ def main():
             if st.session_state.is_admin:
                 # Admin navigation
                 st.subheader("Admin Navigation")
-                admin_choice = st.radio(
-                    "Select Option",
-                    ["Dashboard", "User Management", "Complaint Management", "Product Management"]
-                )
+                admin_options = ["Dashboard", "User Management", "Complaint Management", "Product Management",
+                                 "Bulk Import", "Performance"]
+                
+                # Only the SQLite backends can bulk import
+                if not supports_bulk_import():
+                    admin_options.remove("Bulk Import")
+                
+                admin_choice = st.radio("Select Option", admin_options)
+                
+                st.checkbox("Profile reruns", key="profile_reruns",
+                            help="Time each phase and data call of every rerun in this session")
                 
                 if st.button("Logout"):
                     logout()
@@ -62,11 +86,16 @@ def main():
     
     # Main content based on authentication status and selection
     if not st.session_state.is_authenticated:
-        st.title("Welcome to the CRM System")
-        st.write("Please login or register to access the system.")
-    else:
-        if st.session_state.is_admin:
-            # Admin views
+        page = "Welcome"
+        
+        with phase(f"view: {page}"):
+            st.title("Welcome to the CRM System")
+            st.write("Please login or register to access the system.")
+    elif st.session_state.is_admin:
+        # Admin views
+        page = f"Admin {admin_choice}"
+        
+        with phase(f"view: {page}"):
             if admin_choice == "Dashboard":
                 show_admin_dashboard()
             elif admin_choice == "User Management":
@@ -75,8 +104,15 @@ def main():
                 show_complaint_management()
             elif admin_choice == "Product Management":
                 show_product_management()
-        else:
-            # User views
+            elif admin_choice == "Bulk Import":
+                show_bulk_import()
+            elif admin_choice == "Performance":
+                show_performance()
+    else:
+        # User views
+        page = user_choice
+        
+        with phase(f"view: {page}"):
             if user_choice == "Dashboard":
                 show_dashboard()
             elif user_choice == "Product Search":
@@ -87,6 +123,8 @@ def main():
                 show_complaint_form()
             elif user_choice == "Rate Products":
                 show_ratings()
+    
+    return page
 
 if __name__ == "__main__":
     main()
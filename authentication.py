@@ -1,8 +1,8 @@
 import streamlit as st
 import pandas as pd
 import hashlib
-import time
-from db_utils import authenticate_user, create_user
+from backend import authenticate_user, create_user
+from utils import flash
 
 def hash_password(password):
     """Hash a password for storage."""
@@ -27,8 +27,7 @@ def login():
                     st.session_state.user_id = user["id"]
                     st.session_state.is_admin = user["is_admin"]
                     
-                    st.success("Login successful!")
-                    time.sleep(1)
+                    flash("Login successful!")
                     st.rerun()
                 else:
                     st.error("Invalid username or password!")
@@ -52,8 +51,7 @@ def register():
                     success, message = create_user(username, email, password)
                     
                     if success:
-                        st.success("Registration successful! Please login.")
-                        time.sleep(1)
+                        flash("Registration successful! Please login.")
                         st.rerun()
                     else:
                         st.error(message)
@@ -0,0 +1,105 @@
+import os
+
+import profiler
+import db_utils
+
+# Storage engine the app runs on:
+#   sqlite         - the SQLite database file in db_utils.DB_FILE (default)
+#   sqlite-memory  - the same SQLite engine on an in-memory database shared by the whole process
+#   memory         - the pandas engine in database.py (no SQL at all)
+BACKENDS = ("sqlite", "sqlite-memory", "memory")
+BACKEND = os.environ.get("CRM_BACKEND", "sqlite")
+
+# The database file the sqlite backend goes back to after running in memory
+_DB_FILE = db_utils.DB_FILE
+
+# The data functions every backend provides. The views import them from this module
+# once, so the backend is chosen at startup (CRM_BACKEND) and not switched afterwards
+API = (
+    "initialize_database", "generate_sample_orders", "authenticate_user", "create_user",
+    "get_user_by_username", "get_user_by_id", "get_product_by_id", "get_order_by_id", "get_complaint_by_id",
+    "get_users_by_ids", "get_products_by_ids", "get_orders_by_ids",
+    "get_all_users", "get_all_products", "get_all_orders", "get_all_complaints", "get_all_ratings",
+    "get_user_orders", "get_user_complaints", "get_user_ratings",
+    "get_users_page", "count_users", "get_products_page", "count_products",
+    "get_orders_page", "count_orders", "get_complaints_page", "count_complaints",
+    "search_users", "search_complaints", "search_products",
+    "get_product_filter_options", "get_product_ratings", "get_product_stats",
+    "get_recent_orders", "get_recent_complaints", "get_low_stock_products",
+    "get_dashboard_counts", "get_dashboard_summary",
+    "place_orders", "add_order", "add_complaint", "add_rating", "respond_to_complaint", "update_product",
+    "export_table_csv"
+)
+
+def _no_query_instrumentation():
+    return {"enabled": False, "slow_query_ms": 0.0, "slow_query_log": None}
+
+# Bulk importers, which only the SQLite backends have (None on the others)
+IMPORTERS = ("import_products", "import_users", "import_orders")
+
+# SQLite-only diagnostics, with what a backend without them reports instead
+OPTIONAL = {
+    "get_query_instrumentation": _no_query_instrumentation,
+    "set_query_instrumentation": lambda enabled, slow_query_ms=None: None,
+    "get_query_stats": lambda: [],
+    "get_slow_queries": lambda: [],
+    "reset_query_stats": lambda: None,
+    "get_pool_stats": lambda: {"open": 0, "in_use": 0, "waits": 0},
+    "get_cache_stats": lambda: {},
+    "get_snapshot_stats": lambda: {"hits": 0, "misses": 0, "cached": [], "versions": {}},
+    "get_write_retry_stats": lambda: {"retries": 0, "gave_up": 0},
+    "get_write_behind_stats": lambda: None,
+    "get_page_timings": profiler.get_page_timings
+}
+
+def _engine(name):
+    """Get the module implementing a backend, preparing it to be used."""
+    if name == "memory":
+        import database
+        return database
+    
+    if name == "sqlite-memory":
+        if db_utils.DB_FILE != db_utils.MEMORY_DB:
+            db_utils.stop_checkpoint_scheduler()
+            db_utils.DB_FILE = db_utils.MEMORY_DB
+        
+        return db_utils
+    
+    if name == "sqlite":
+        if db_utils.DB_FILE == db_utils.MEMORY_DB:
+            db_utils.DB_FILE = _DB_FILE
+        
+        return db_utils
+    
+    raise ValueError(f"Unknown backend {name!r} (expected one of {', '.join(BACKENDS)})")
+
+def use_backend(name):
+    """Point this module's data functions at a backend's implementation.
+    
+    Modules that already ran `from backend import ...` keep the functions they got,
+    so call this before the views are imported (the benchmark does, the app uses CRM_BACKEND).
+    """
+    global BACKEND
+    
+    engine = _engine(name)
+    missing = [function for function in API if not hasattr(engine, function)]
+    
+    if missing:
+        raise ValueError(f"Backend {name!r} is missing {', '.join(missing)}")
+    
+    for function in API:
+        globals()[function] = getattr(engine, function)
+    
+    for function in IMPORTERS:
+        globals()[function] = getattr(engine, function, None)
+    
+    for function, fallback in OPTIONAL.items():
+        globals()[function] = getattr(engine, function, fallback)
+    
+    BACKEND = name
+
+def supports_bulk_import():
+    """Whether the current backend can bulk import products, users and orders."""
+    return all(globals()[function] is not None for function in IMPORTERS)
+
+use_backend(BACKEND)
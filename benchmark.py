@@ -0,0 +1,479 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+import db_utils
+import backend
+import data_generator
+from loader import load_parallel
+
+# Dataset sizes the suite can run at (arguments to data_generator.generate_dataset)
+SCALES = {
+    "1k": {"users": 100, "products": 50, "orders": 1000, "complaints": 50, "ratings": 200},
+    "100k": {"users": 10000, "products": 1000, "orders": 100000, "complaints": 5000, "ratings": 20000},
+    "1m": {"users": 100000, "products": 5000, "orders": 1000000, "complaints": 50000, "ratings": 200000}
+}
+
+# Relative slowdown of a percentile that compare() reports as a regression
+REGRESSION_THRESHOLD = 0.2
+
+# Benchmark scenarios: name -> factory(context, rng) returning the function to time
+SCENARIOS = {}
+
+def scenario(name):
+    """Register a scenario factory under name."""
+    def register(factory):
+        SCENARIOS[name] = factory
+        return factory
+    
+    return register
+
+@scenario("get_user_orders")
+def _get_user_orders(context, rng):
+    return lambda: backend.get_user_orders(int(rng.choice(context["user_ids"])))
+
+@scenario("get_orders_page")
+def _get_orders_page(context, rng):
+    return lambda: backend.get_orders_page(int(rng.choice(context["user_ids"])))
+
+@scenario("get_user_by_id")
+def _get_user_by_id(context, rng):
+    return lambda: backend.get_user_by_id(int(rng.choice(context["user_ids"])))
+
+@scenario("authenticate_user")
+def _authenticate_user(context, rng):
+    # Generated customers all have the password "password"
+    return lambda: backend.authenticate_user(str(rng.choice(context["usernames"])), "password")
+
+@scenario("search_products")
+def _search_products(context, rng):
+    return lambda: backend.search_products(str(rng.choice(context["search_terms"])))
+
+@scenario("search_products_filtered")
+def _search_products_filtered(context, rng):
+    return lambda: backend.search_products(
+        str(rng.choice(context["search_terms"])), category=str(rng.choice(context["categories"])),
+        min_price=10, max_price=500
+    )
+
+@scenario("add_order")
+def _add_order(context, rng):
+    return lambda: backend.add_order(int(rng.choice(context["user_ids"])), int(rng.choice(context["product_ids"])), 1)
+
+@scenario("get_complaints_page")
+def _get_complaints_page(context, rng):
+    return lambda: backend.get_complaints_page("Pending")
+
+@scenario("get_dashboard_summary")
+def _get_dashboard_summary(context, rng):
+    return backend.get_dashboard_summary
+
+@scenario("user_dashboard_reads")
+def _user_dashboard_reads(context, rng):
+    # The reads show_dashboard makes, through the same parallel loader
+    def load(user_id):
+        return load_parallel(
+            orders=lambda: backend.get_user_orders(user_id),
+            complaints=lambda: backend.get_user_complaints(user_id),
+            ratings=lambda: backend.get_user_ratings(user_id)
+        )
+    
+    return lambda: load(int(rng.choice(context["user_ids"])))
+
+@scenario("get_all_users")
+def _get_all_users(context, rng):
+    return backend.get_all_users
+
+@scenario("get_all_products")
+def _get_all_products(context, rng):
+    return backend.get_all_products
+
+@scenario("get_all_orders")
+def _get_all_orders(context, rng):
+    return backend.get_all_orders
+
+@scenario("get_all_complaints")
+def _get_all_complaints(context, rng):
+    return backend.get_all_complaints
+
+@scenario("get_all_ratings")
+def _get_all_ratings(context, rng):
+    return backend.get_all_ratings
+
+# The Streamlit app, driven headlessly by the ui_* scenarios
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+def _app_session(username):
+    """Start a headless app session and log in as username."""
+    from streamlit.testing.v1 import AppTest
+    
+    app = AppTest.from_file(APP_FILE, default_timeout=60)
+    app.run()
+    app.sidebar.text_input[0].input(username)
+    app.sidebar.text_input[1].input("password")
+    app.sidebar.button[0].click()
+    app.run()
+    return app
+
+@scenario("ui_login")
+def _ui_login(context, rng):
+    # Opening the app plus the login action and the rerun it triggers
+    return lambda: _app_session(str(rng.choice(context["usernames"])))
+
+@scenario("ui_submit_rating")
+def _ui_submit_rating(context, rng):
+    # A customer who has ordered something, so the rating form is shown
+    username = next(str(context["usernames"][i]) for i in rng.permutation(len(context["user_ids"]))
+                    if not backend.get_user_orders(int(context["user_ids"][i])).empty)
+    app = _app_session(username)
+    app.sidebar.radio[0].set_value("Rate Products")
+    app.run()
+    
+    def submit_rating():
+        # Per-action latency: the click, the write and the rerun that shows the confirmation
+        next(widget for widget in app.text_area if widget.label == "Review").input(f"Review {rng.integers(1_000_000)}")
+        next(button for button in app.button if button.label in ("Submit Rating", "Update Rating")).click()
+        app.run()
+    
+    return submit_rating
+
+def use_database(path):
+    """Point db_utils at another database file, closing connections to the previous one."""
+    db_utils.stop_write_behind()
+    db_utils.stop_checkpoint_scheduler()
+    db_utils.close_connection_pool()
+    db_utils.DB_FILE = path
+
+def seed_database(scale, data_dir, seed):
+    """Return the path of the seeded database for a scale, generating it on first use."""
+    path = os.path.join(data_dir, f"bench_{scale}_seed{seed}.db")
+    
+    if os.path.exists(path):
+        return path
+    
+    os.makedirs(data_dir, exist_ok=True)
+    building = path + ".building"
+    
+    if os.path.exists(building):
+        os.remove(building)
+    
+    print(f"Generating {scale} dataset in {path}...", file=sys.stderr)
+    use_database(building)
+    data_generator.generate_dataset(**SCALES[scale], seed=seed)
+    db_utils.checkpoint_wal("TRUNCATE")
+    use_database(path)
+    
+    # Only a complete dataset gets the final name
+    os.replace(building, path)
+    return path
+
+def use_backend(name, path):
+    """Run the scenarios on a backend, loading it with the database file at path."""
+    if name == "sqlite-memory":
+        db_utils.load_into_memory(path)
+    elif name == "memory":
+        import database
+        database.load_tables({table: getattr(db_utils, f"get_all_{table}")() for table in db_utils.TABLES})
+    
+    backend.use_backend(name)
+
+def load_context(rng):
+    """Collect the IDs and search terms the scenarios pick their arguments from."""
+    with db_utils.db_connection() as conn:
+        users = conn.execute("SELECT id, username FROM users WHERE is_admin = 0").fetchall()
+        products = conn.execute("SELECT id, name, category FROM products").fetchall()
+    
+    # Search for whole words and prefixes of words that appear in product names
+    words = sorted({word.lower() for product in products for word in product["name"].split() if word.isalpha()})
+    terms = words + [word[:3] for word in words if len(word) > 3]
+    
+    return {
+        "user_ids": np.array([user["id"] for user in users]),
+        "usernames": np.array([user["username"] for user in users]),
+        "product_ids": np.array([product["id"] for product in products]),
+        "categories": np.array(sorted({product["category"] for product in products})),
+        "search_terms": np.array(terms)
+    }
+
+def summarize(durations, elapsed):
+    """Latency percentiles (ms) and throughput (calls/s) for a list of call durations."""
+    durations_ms = np.array(durations) * 1000
+    
+    return {
+        "calls": len(durations),
+        "mean_ms": round(float(durations_ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(durations_ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(durations_ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(durations_ms, 99)), 4),
+        "max_ms": round(float(durations_ms.max()), 4),
+        "throughput": round(len(durations) / elapsed, 2) if elapsed else None
+    }
+
+def run_scenario(function, iterations, max_seconds, warm=False):
+    """Time repeated calls of function, stopping early once max_seconds have been spent."""
+    durations = []
+    started = time.perf_counter()
+    
+    for _ in range(iterations):
+        # Measure the database work, not the shared caches in front of it
+        if not warm:
+            db_utils.clear_table_snapshots()
+            db_utils.clear_entity_caches()
+        
+        call_started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - call_started)
+        
+        if len(durations) >= 3 and time.perf_counter() - started > max_seconds:
+            break
+    
+    return summarize(durations, sum(durations))
+
+def run(scales, scenarios, iterations=50, max_seconds=10.0, seed=42, data_dir="bench_data", warm=False,
+        backend_name="sqlite"):
+    """Run scenarios at each scale on a backend and return the results document."""
+    results = {
+        "created_at": datetime.now().isoformat(" "),
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "storage_profile": db_utils.STORAGE_PROFILE,
+            "backend": backend_name
+        },
+        "settings": {"iterations": iterations, "max_seconds": max_seconds, "seed": seed, "warm": warm},
+        "scales": {}
+    }
+    
+    for scale in scales:
+        seeded = seed_database(scale, data_dir, seed)
+        
+        # Scenarios that write work on a throwaway copy of the seeded database
+        working = os.path.join(data_dir, f"bench_{scale}_run.db")
+        shutil.copyfile(seeded, working)
+        use_database(working)
+        db_utils.initialize_database()
+        
+        rng = np.random.default_rng(seed)
+        context = load_context(rng)
+        use_backend(backend_name, working)
+        results["scales"][scale] = {}
+        
+        for name in scenarios:
+            stats = run_scenario(SCENARIOS[name](context, rng), iterations, max_seconds, warm)
+            results["scales"][scale][name] = stats
+            print(f"{scale:>5} {name:<28} p50 {stats['p50_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms  "
+                  f"p99 {stats['p99_ms']:>10.3f} ms  {stats['throughput']:>10.1f}/s")
+        
+        use_database(seeded)
+        os.remove(working)
+    
+    return results
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """List (scale, scenario, metric, before, after, change) for every percentile that got slower than threshold."""
+    regressions = []
+    
+    for scale, scenarios in current["scales"].items():
+        for name, stats in scenarios.items():
+            before = baseline["scales"].get(scale, {}).get(name)
+            
+            if before is None:
+                continue
+            
+            for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                if before[metric] > 0:
+                    change = stats[metric] / before[metric] - 1
+                    
+                    if change > threshold:
+                        regressions.append((scale, name, metric, before[metric], stats[metric], change))
+    
+    return regressions
+
+def stress_orders(writers=16, orders_per_writer=50, stock=500, quantity=1, data_dir="bench_data"):
+    """Place orders for one product from many threads at once and check that none were oversold.
+    
+    Every writer starts at the same moment and orders quantity units at a time,
+    so with more demand than stock the last units are fought over.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, "bench_stress.db")
+    use_database(path)
+    
+    for leftover in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    
+    db_utils.initialize_database()
+    db_utils.create_user("stress_customer", "stress@example.com", "password")
+    
+    with db_utils.db_transaction(immediate=True) as conn:
+        user_id = conn.execute("SELECT id FROM users WHERE username = 'stress_customer'").fetchone()[0]
+        product_id = conn.execute(
+            "INSERT INTO products (name, category, price, description, stock, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            ("Stress Test Item", "Gadgets", 9.99, "Contended product", stock, datetime.now())
+        ).lastrowid
+        db_utils.mark_changed("products", product_id)
+    
+    retries_before = db_utils.get_write_retry_stats()
+    start = threading.Barrier(writers)
+    
+    def writer():
+        outcomes = []
+        start.wait()
+        
+        for _ in range(orders_per_writer):
+            call_started = time.perf_counter()
+            success, message = db_utils.add_order(user_id, product_id, quantity)
+            outcomes.append((time.perf_counter() - call_started, success, message))
+        
+        return outcomes
+    
+    started = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=writers) as executor:
+        outcomes = [outcome for future in [executor.submit(writer) for _ in range(writers)] for outcome in future.result()]
+    
+    elapsed = time.perf_counter() - started
+    retries_after = db_utils.get_write_retry_stats()
+    
+    with db_utils.db_connection() as conn:
+        final_stock = conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+        units_sold = conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM orders WHERE product_id = ?",
+                                  (product_id,)).fetchone()[0]
+    
+    placed = sum(1 for _, success, _ in outcomes if success)
+    sold_out = sum(1 for _, success, message in outcomes if not success and str(message).startswith("Not enough stock"))
+    
+    return {
+        "writers": writers,
+        "attempts": len(outcomes),
+        "placed": placed,
+        "sold_out": sold_out,
+        "errors": sorted({str(message) for _, success, message in outcomes
+                          if not success and not str(message).startswith("Not enough stock")}),
+        "units_sold": units_sold,
+        "final_stock": final_stock,
+        # Stock only balances if every placed order took its units and nothing went below zero
+        "oversold": final_stock < 0 or units_sold > stock or final_stock != stock - units_sold
+                    or units_sold != placed * quantity,
+        "retries": retries_after["retries"] - retries_before["retries"],
+        "gave_up": retries_after["gave_up"] - retries_before["gave_up"],
+        "orders_per_second": round(placed / elapsed, 2) if elapsed else None,
+        "latency": summarize([duration for duration, _, _ in outcomes], elapsed)
+    }
+
+def cmd_run(args):
+    """Run the benchmark suite and write the results file."""
+    scales = args.scales.split(",")
+    scenarios = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in scales if name not in SCALES] + [name for name in scenarios if name not in SCENARIOS]
+    
+    if unknown:
+        print(f"Unknown scale or scenario: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    
+    results = run(scales, scenarios, args.iterations, args.max_seconds, args.seed, args.data_dir, args.warm,
+                  args.backend)
+    output = args.output or os.path.join("bench_results", f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    
+    print(f"Results written to {output}")
+
+def cmd_compare(args):
+    """Compare two results files and fail if any percentile regressed."""
+    with open(args.baseline) as baseline_file, open(args.current) as current_file:
+        regressions = compare(json.load(baseline_file), json.load(current_file), args.threshold)
+    
+    for scale, name, metric, before, after, change in regressions:
+        print(f"{scale:>5} {name:<28} {metric:<7} {before:>10.3f} -> {after:>10.3f} ms  (+{change:.0%})")
+    
+    if regressions:
+        print(f"{len(regressions)} regressions above {args.threshold:.0%}")
+        return 1
+    
+    print("No regressions")
+
+def cmd_stress(args):
+    """Run the concurrent checkout stress test and fail if any stock was oversold."""
+    result = stress_orders(args.writers, args.orders, args.stock, args.quantity, args.data_dir)
+    latency = result["latency"]
+    
+    print(f"{result['writers']} writers, {result['attempts']} attempts: {result['placed']} placed, "
+          f"{result['sold_out']} sold out, {len(result['errors'])} distinct errors")
+    print(f"Units sold {result['units_sold']}, final stock {result['final_stock']}, "
+          f"{result['retries']} busy retries ({result['gave_up']} gave up)")
+    print(f"{result['orders_per_second']:.1f} orders/s  p50 {latency['p50_ms']:.3f} ms  "
+          f"p95 {latency['p95_ms']:.3f} ms  p99 {latency['p99_ms']:.3f} ms")
+    
+    for error in result["errors"]:
+        print(f"Error: {error}")
+    
+    if result["oversold"]:
+        print("Stock was oversold")
+        return 1
+    
+    print("No oversell")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the db_utils data-access layer")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    run_parser = subparsers.add_parser("run", help="Run the benchmark suite")
+    run_parser.add_argument("--scales", default="1k,100k", help=f"Comma-separated scales ({', '.join(SCALES)})")
+    run_parser.add_argument("--scenarios", default=None, help="Comma-separated scenarios (default: all)")
+    run_parser.add_argument("--iterations", type=int, default=50, help="Calls per scenario")
+    run_parser.add_argument("--max-seconds", type=float, default=10.0, help="Time budget per scenario")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--data-dir", default="bench_data", help="Where seeded databases are kept")
+    run_parser.add_argument("--warm", action="store_true", help="Keep the entity and snapshot caches between calls")
+    run_parser.add_argument("--profile", default=None, choices=sorted(db_utils.STORAGE_PROFILES),
+                            help="Storage profile to benchmark")
+    run_parser.add_argument("--backend", default="sqlite", choices=backend.BACKENDS,
+                            help="Storage backend to benchmark (the seeded file is loaded into memory once)")
+    run_parser.add_argument("--output", default=None, help="Results file (default: bench_results/<timestamp>.json)")
+    run_parser.set_defaults(func=cmd_run)
+    
+    compare_parser = subparsers.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                                help="Relative slowdown reported as a regression")
+    compare_parser.set_defaults(func=cmd_compare)
+    
+    stress_parser = subparsers.add_parser("stress", help="Place orders for one product from many parallel writers")
+    stress_parser.add_argument("--writers", type=int, default=16, help="Threads placing orders at once")
+    stress_parser.add_argument("--orders", type=int, default=50, help="Orders each writer attempts")
+    stress_parser.add_argument("--stock", type=int, default=500, help="Starting stock of the contended product")
+    stress_parser.add_argument("--quantity", type=int, default=1, help="Units per order")
+    stress_parser.add_argument("--data-dir", default="bench_data", help="Where the stress database is created")
+    stress_parser.add_argument("--profile", default=None, choices=sorted(db_utils.STORAGE_PROFILES),
+                               help="Storage profile to run under")
+    stress_parser.set_defaults(func=cmd_stress)
+    
+    args = parser.parse_args(argv)
+    
+    if getattr(args, "profile", None):
+        db_utils.STORAGE_PROFILE = args.profile
+    
+    try:
+        return args.func(args) or 0
+    finally:
+        db_utils.stop_checkpoint_scheduler()
+        db_utils.close_connection_pool()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import hashlib
+from datetime import datetime
+
+import numpy as np
+
+import db_utils
+
+# Rows inserted per transaction
+GENERATOR_BATCH_SIZE = 50000
+
+CATEGORIES = [
+    "Electronics", "Audio", "Wearables", "Computer Accessories", "Storage", "Accessories",
+    "Photography", "Smart Home", "Networking", "Office", "Entertainment", "Gadgets"
+]
+
+PRODUCT_ADJECTIVES = ["Ultra", "Smart", "Compact", "Pro", "Wireless", "Portable", "Classic", "Eco", "Max", "Mini"]
+
+PRODUCT_NOUNS = [
+    "Speaker", "Monitor", "Keyboard", "Charger", "Camera", "Router", "Tablet", "Watch",
+    "Headset", "Drive", "Lamp", "Hub", "Printer", "Tracker", "Mouse", "Drone"
+]
+
+COMPLAINT_SUBJECTS = [
+    "Late delivery", "Damaged item", "Wrong item received", "Missing parts",
+    "Refund request", "Item not as described", "Billing issue", "Product stopped working"
+]
+
+# Probability of each star rating, 1 to 5
+RATING_WEIGHTS = [0.05, 0.08, 0.17, 0.35, 0.35]
+
+# Date that seeded datasets count back from, so a seed always gives the same rows
+SEEDED_END = datetime(2024, 1, 1)
+
+def _timestamps(rng, count, days, now):
+    """Random timestamps within the last days, as the text sqlite3 stores datetimes as."""
+    offsets = rng.integers(0, max(int(days * 86400 * 1e6), 1), size=count).astype("timedelta64[us]")
+    values = np.datetime64(now, "us") - offsets
+    return np.char.replace(np.datetime_as_string(values, unit="us"), "T", " ")
+
+def _popularity(rng, count, skew):
+    """Zipf-like selection probabilities over count items, in random item order."""
+    weights = 1.0 / np.arange(1, count + 1) ** skew
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+def _next_id(conn, table):
+    """First unused primary key of a table."""
+    return conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+
+def _insert(table, columns, values, batch_size, progress):
+    """Bulk insert column arrays into a table, one transaction per batch."""
+    total = len(values[0]) if values else 0
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    
+    for start in range(0, total, batch_size):
+        stop = min(start + batch_size, total)
+        
+        with db_utils.db_transaction(immediate=True) as conn:
+            conn.executemany(sql, zip(*(column[start:stop].tolist() for column in values)))
+            db_utils.mark_changed(table)
+        
+        if progress is not None:
+            progress(table, stop, total)
+
+def generate_dataset(users=1000, products=200, orders=10000, complaints=500, ratings=2000,
+                     days=365, skew=1.1, seed=None, batch_size=GENERATOR_BATCH_SIZE, progress=None, end=None):
+    """Add a synthetic dataset to the database and return the number of rows added per table.
+    
+    Rows are built with NumPy and bulk inserted after the existing data. The
+    same seed always produces the same rows for the same starting database.
+    Product popularity follows a Zipf-like distribution controlled by skew
+    (0 = uniform), and all dates fall within the days before end (by default
+    SEEDED_END for seeded runs and the time of the run otherwise).
+    """
+    rng = np.random.default_rng(seed)
+    now = end or (SEEDED_END if seed is not None else datetime.now())
+    db_utils.initialize_database()
+    
+    with db_utils.db_connection() as conn:
+        first_user_id = _next_id(conn, "users")
+        first_product_id = _next_id(conn, "products")
+        first_order_id = _next_id(conn, "orders")
+    
+    # Customers (all share the password "password")
+    user_ids = np.arange(first_user_id, first_user_id + users)
+    usernames = np.char.add("customer", user_ids.astype(str))
+    password = hashlib.sha256("password".encode()).hexdigest()
+    
+    _insert("users", ["id", "username", "email", "password", "is_admin", "created_at"], [
+        user_ids,
+        usernames,
+        np.char.add(usernames, "@example.com"),
+        np.full(users, password),
+        np.zeros(users, dtype=bool),
+        np.sort(_timestamps(rng, users, days, now))
+    ], batch_size, progress)
+    
+    # Products with log-normally distributed prices
+    product_ids = np.arange(first_product_id, first_product_id + products)
+    adjectives = rng.choice(PRODUCT_ADJECTIVES, size=products)
+    nouns = rng.choice(PRODUCT_NOUNS, size=products)
+    names = np.char.add(np.char.add(np.char.add(adjectives, " "), nouns), np.char.add(" ", product_ids.astype(str)))
+    categories = rng.choice(CATEGORIES, size=products)
+    prices = np.round(rng.lognormal(mean=4.5, sigma=1.0, size=products), 2) + 0.99
+    
+    _insert("products", ["id", "name", "category", "price", "description", "stock", "created_at"], [
+        product_ids,
+        names,
+        categories,
+        prices,
+        np.char.add(np.char.add(names, " from our "), categories),
+        rng.integers(0, 500, size=products),
+        _timestamps(rng, products, days, now)
+    ], batch_size, progress)
+    
+    # Orders from all customers for popular products; existing ones are included
+    with db_utils.db_connection() as conn:
+        customer_ids = np.array([row[0] for row in conn.execute("SELECT id FROM users WHERE is_admin = 0")])
+        catalog = conn.execute("SELECT id, price FROM products ORDER BY id").fetchall()
+    
+    catalog_ids = np.array([row[0] for row in catalog])
+    catalog_prices = np.array([row[1] for row in catalog])
+    
+    if orders and (len(customer_ids) == 0 or len(catalog_ids) == 0):
+        raise ValueError("Orders need at least one customer and one product")
+    
+    order_ids = np.arange(first_order_id, first_order_id + orders)
+    order_users = rng.choice(customer_ids, size=orders) if orders else np.array([], dtype=int)
+    product_index = rng.choice(len(catalog_ids), size=orders, p=_popularity(rng, len(catalog_ids), skew)) if orders else np.array([], dtype=int)
+    quantities = rng.integers(1, 4, size=orders)
+    order_dates = _timestamps(rng, orders, days, now)
+    
+    _insert("orders", ["id", "user_id", "product_id", "quantity", "total_price", "status", "created_at"], [
+        order_ids,
+        order_users,
+        catalog_ids[product_index],
+        quantities,
+        np.round(catalog_prices[product_index] * quantities, 2),
+        rng.choice(db_utils.ORDER_STATUSES, size=orders, p=[0.1, 0.2, 0.7]),
+        order_dates
+    ], batch_size, progress)
+    
+    # Complaints about a sample of the new orders
+    complaints = min(complaints, orders)
+    complained = rng.choice(orders, size=complaints, replace=False)
+    resolved = rng.random(complaints) < 0.6
+    subjects = rng.choice(COMPLAINT_SUBJECTS, size=complaints)
+    complaint_dates = order_dates[complained]
+    
+    _insert("complaints", ["user_id", "order_id", "subject", "description", "status",
+                           "admin_response", "created_at", "updated_at"], [
+        order_users[complained],
+        order_ids[complained],
+        subjects,
+        np.char.add(np.char.add("Customer reported: ", np.char.lower(subjects)), " on their order."),
+        np.where(resolved, "Resolved", "Pending"),
+        np.where(resolved, "We're sorry about this and have sorted it out.", None),
+        complaint_dates,
+        complaint_dates
+    ], batch_size, progress)
+    
+    # Ratings for products customers ordered, at most one per customer and product
+    rated = rng.choice(orders, size=min(ratings, orders), replace=False)
+    pairs = np.unique(np.stack([order_users[rated], catalog_ids[product_index][rated]], axis=1), axis=0)
+    
+    with db_utils.db_connection() as conn:
+        existing = np.array(conn.execute("SELECT user_id, product_id FROM ratings").fetchall(), dtype=np.int64)
+    
+    if len(existing) and len(pairs):
+        # Skip pairs that already have a rating
+        key_base = max(int(pairs[:, 1].max()), int(existing[:, 1].max())) + 1
+        already_rated = np.isin(pairs[:, 0] * key_base + pairs[:, 1], existing[:, 0] * key_base + existing[:, 1])
+        pairs = pairs[~already_rated]
+    
+    scores = rng.choice(np.arange(1, 6), size=len(pairs), p=RATING_WEIGHTS)
+    
+    _insert("ratings", ["user_id", "product_id", "rating", "review", "created_at"], [
+        pairs[:, 0],
+        pairs[:, 1],
+        scores,
+        np.char.add(np.char.add("Rated ", scores.astype(str)), " out of 5"),
+        _timestamps(rng, len(pairs), days, now)
+    ], batch_size, progress)
+    
+    # Statistics are cheaper to recompute once than to maintain row by row here
+    db_utils.rebuild_product_stats()
+    
+    return {
+        "users": users,
+        "products": products,
+        "orders": orders,
+        "complaints": complaints,
+        "ratings": len(pairs)
+    }
@@ -1,24 +1,108 @@
-import streamlit as st
-import pandas as pd
+import os
+import hashlib
 import random
-import string
-import time
-from datetime import datetime, timedelta
+import tempfile
+import threading
+from concurrent.futures import Future
+
+import pandas as pd
+
+from db_utils import TABLES, PAGE_SIZE, EXPORT_CHUNK_SIZE, LOW_STOCK_THRESHOLD
+
+# Column types of each table, matching the SQLite schema in db_utils
+SCHEMA = {
+    "users": {
+        "id": "int64", "username": "object", "email": "object", "password": "object",
+        "is_admin": "bool", "created_at": "datetime64[ns]"
+    },
+    "products": {
+        "id": "int64", "name": "object", "category": "object", "price": "float64",
+        "description": "object", "stock": "int64", "created_at": "datetime64[ns]"
+    },
+    "orders": {
+        "id": "int64", "user_id": "int64", "product_id": "int64", "quantity": "int64",
+        "total_price": "float64", "status": "object", "created_at": "datetime64[ns]"
+    },
+    "complaints": {
+        "id": "int64", "user_id": "int64", "order_id": "int64", "subject": "object", "description": "object",
+        "status": "object", "admin_response": "object", "created_at": "datetime64[ns]", "updated_at": "datetime64[ns]"
+    },
+    "ratings": {
+        "id": "int64", "user_id": "int64", "product_id": "int64", "rating": "int64",
+        "review": "object", "created_at": "datetime64[ns]"
+    }
+}
+
+# The tables, shared by every session in the process. Writers replace a table's
+# DataFrame instead of changing it in place, so frames already handed out never change.
+_db = {}
+_lock = threading.RLock()
+
+def _frame(table, rows):
+    """Build a DataFrame with a table's columns and types from a list of row dicts."""
+    return pd.DataFrame(rows, columns=list(SCHEMA[table])).astype(SCHEMA[table])
+
+def _table(table):
+    """Get the current DataFrame of a table, creating the database on first use."""
+    if not _db:
+        initialize_database()
+    
+    return _db[table]
+
+def _append(table, rows):
+    """Add rows (dicts) to a table."""
+    new_rows = _frame(table, rows)
+    current = _table(table)
+    _db[table] = new_rows if current.empty else pd.concat([current, new_rows], ignore_index=True)
+
+def _update(table, mask, values):
+    """Set columns of the rows selected by mask, on a copy of the table."""
+    updated = _table(table).copy()
+    
+    for column, value in values.items():
+        updated.loc[mask, column] = value
+    
+    _db[table] = updated
+
+def _next_id(table):
+    """First unused ID of a table."""
+    df = _table(table)
+    return 1 if df.empty else int(df["id"].max()) + 1
+
+def _first_row(df):
+    """The first row of a DataFrame as a dict of plain Python values, or None."""
+    return None if df.empty else df.iloc[:1].to_dict("records")[0]
+
+def _rows_by_id(table, ids):
+    """Rows of a table by ID, as a dict keyed by ID."""
+    df = _table(table)
+    wanted = {int(row_id) for row_id in ids if not pd.isna(row_id)}
+    return {row["id"]: row for row in df[df["id"].isin(wanted)].to_dict("records")}
+
+def _result(result, wait):
+    """Return a write's result, or an already-completed Future of it with wait=False."""
+    if wait:
+        return result
+    
+    future = Future()
+    future.set_result(result)
+    return future
 
 def initialize_database():
     """Initialize the in-memory database if it hasn't been initialized yet."""
-    if "db" not in st.session_state:
-        st.session_state.db = {}
+    with _lock:
+        if _db:
+            return
         
         # Create users table with admin user
-        users_df = pd.DataFrame({
-            "id": [1],
-            "username": ["admin"],
-            "email": ["admin@example.com"],
-            "password": ["8c6976e5b5410415bde908bd4dee15dfb167a9c873fc4bb8a81f6f2ab448a918"],  # admin
-            "is_admin": [True],
-            "created_at": [pd.Timestamp.now()]
-        })
+        users_df = _frame("users", [{
+            "id": 1,
+            "username": "admin",
+            "email": "admin@example.com",
+            "password": "8c6976e5b5410415bde908bd4dee15dfb167a9c873fc4bb8a81f6f2ab448a918",  # admin
+            "is_admin": True,
+            "created_at": pd.Timestamp.now()
+        }])
         
         # Create products table
         products_df = pd.DataFrame({
@@ -60,288 +144,352 @@ def initialize_database():
             "created_at": [pd.Timestamp.now()] * 20
         })
         
-        # Create empty orders table
-        orders_df = pd.DataFrame({
-            "id": [],
-            "user_id": [],
-            "product_id": [],
-            "quantity": [],
-            "total_price": [],
-            "status": [],
-            "created_at": []
-        })
         
-        # Create empty complaints table
-        complaints_df = pd.DataFrame({
-            "id": [],
-            "user_id": [],
-            "order_id": [],
-            "subject": [],
-            "description": [],
-            "status": [],
-            "admin_response": [],
-            "created_at": [],
-            "updated_at": []
-        })
+        # Store the tables, with empty orders, complaints and ratings
+        _db["users"] = users_df
+        _db["products"] = products_df.astype(SCHEMA["products"])
         
-        # Create empty ratings table
-        ratings_df = pd.DataFrame({
-            "id": [],
-            "user_id": [],
-            "product_id": [],
-            "rating": [],
-            "review": [],
-            "created_at": []
-        })
-        
-        # Store DataFrames in session state
-        st.session_state.db["users"] = users_df
-        st.session_state.db["products"] = products_df
-        st.session_state.db["orders"] = orders_df
-        st.session_state.db["complaints"] = complaints_df
-        st.session_state.db["ratings"] = ratings_df
+        for table in ("orders", "complaints", "ratings"):
+            _db[table] = _frame(table, [])
+
+def load_tables(tables):
+    """Replace the contents of every table with DataFrames (e.g. read from an SQLite database)."""
+    with _lock:
+        for table in TABLES:
+            _db[table] = tables[table][list(SCHEMA[table])].astype(SCHEMA[table]).reset_index(drop=True)
 
 def generate_sample_orders():
     """Generate sample orders for testing (only if no orders exist)."""
-    if len(st.session_state.db["orders"]) == 0 and len(st.session_state.db["users"]) > 1:
-        orders = []
-        order_id = 1
+    with _lock:
+        users = _table("users")
+        customers = users[~users["is_admin"]]
         
-        # Get non-admin users
-        users = st.session_state.db["users"][~st.session_state.db["users"]["is_admin"]]
-        products = st.session_state.db["products"]
+        if len(_table("orders")) > 0 or customers.empty:
+            return
+        
+        products = _table("products")
         
         # Get the current date
         now = pd.Timestamp.now()
+        orders = []
+        order_id = 1
         
         # For each user, create 1-3 random orders
-        for user_id in users["id"].values:
+        for user_id in customers["id"].values:
             num_orders = random.randint(1, 3)
             
             for _ in range(num_orders):
                 # Random product
                 product = products.sample(1).iloc[0]
-                product_id = product["id"]
                 
                 # Random quantity between 1 and 3
                 quantity = random.randint(1, 3)
                 
-                # Calculate total price
-                total_price = product["price"] * quantity
-                
-                # Random date in the last 90 days
-                days_ago = random.randint(0, 90)
-                order_date = now - pd.Timedelta(days=days_ago)
-                
-                # Random status
-                status = random.choice(["Delivered", "Processing", "Shipped"])
-                
                 orders.append({
                     "id": order_id,
                     "user_id": user_id,
-                    "product_id": product_id,
+                    "product_id": product["id"],
                     "quantity": quantity,
-                    "total_price": total_price,
-                    "status": status,
-                    "created_at": order_date
+                    "total_price": product["price"] * quantity,
+                    # Random status
+                    "status": random.choice(["Delivered", "Processing", "Shipped"]),
+                    # Random date in the last 90 days
+                    "created_at": now - pd.Timedelta(days=random.randint(0, 90))
                 })
                 
                 order_id += 1
         
-        if orders:
-            st.session_state.db["orders"] = pd.DataFrame(orders)
+        _append("orders", orders)
+
+def get_all_users():
+    """Get all users from the database."""
+    return _table("users")
+
+def get_all_products():
+    """Get all products from the database."""
+    return _table("products")
+
+def get_all_orders():
+    """Get all orders from the database."""
+    return _table("orders")
+
+def get_all_complaints():
+    """Get all complaints from the database."""
+    return _table("complaints")
+
+def get_all_ratings():
+    """Get all ratings from the database."""
+    return _table("ratings")
 
 def get_user_by_id(user_id):
     """Get a user by ID."""
-    users_df = st.session_state.db["users"]
-    user = users_df[users_df["id"] == user_id]
-    
-    if not user.empty:
-        return user.iloc[0]
-    return None
+    users_df = _table("users")
+    return _first_row(users_df[users_df["id"] == user_id])
+
+def get_user_by_username(username):
+    """Get a user by username."""
+    users_df = _table("users")
+    return _first_row(users_df[users_df["username"] == username])
 
 def get_product_by_id(product_id):
     """Get a product by ID."""
-    products_df = st.session_state.db["products"]
-    product = products_df[products_df["id"] == product_id]
-    
-    if not product.empty:
-        return product.iloc[0]
-    return None
+    products_df = _table("products")
+    return _first_row(products_df[products_df["id"] == product_id])
 
 def get_order_by_id(order_id):
     """Get an order by ID."""
-    orders_df = st.session_state.db["orders"]
-    order = orders_df[orders_df["id"] == order_id]
-    
-    if not order.empty:
-        return order.iloc[0]
-    return None
+    orders_df = _table("orders")
+    return _first_row(orders_df[orders_df["id"] == order_id])
 
 def get_complaint_by_id(complaint_id):
     """Get a complaint by ID."""
-    complaints_df = st.session_state.db["complaints"]
-    complaint = complaints_df[complaints_df["id"] == complaint_id]
-    
-    if not complaint.empty:
-        return complaint.iloc[0]
-    return None
+    complaints_df = _table("complaints")
+    return _first_row(complaints_df[complaints_df["id"] == complaint_id])
+
+def get_users_by_ids(user_ids):
+    """Get users by ID, as a dict keyed by user ID."""
+    return _rows_by_id("users", user_ids)
+
+def get_products_by_ids(product_ids):
+    """Get products by ID, as a dict keyed by product ID."""
+    return _rows_by_id("products", product_ids)
+
+def get_orders_by_ids(order_ids):
+    """Get orders by ID, as a dict keyed by order ID."""
+    return _rows_by_id("orders", order_ids)
 
 def get_user_orders(user_id):
     """Get all orders for a user."""
-    orders_df = st.session_state.db["orders"]
+    orders_df = _table("orders")
     return orders_df[orders_df["user_id"] == user_id].sort_values(by="created_at", ascending=False)
 
 def get_user_complaints(user_id):
     """Get all complaints for a user."""
-    complaints_df = st.session_state.db["complaints"]
+    complaints_df = _table("complaints")
     return complaints_df[complaints_df["user_id"] == user_id].sort_values(by="created_at", ascending=False)
 
 def get_user_ratings(user_id):
     """Get all ratings for a user."""
-    ratings_df = st.session_state.db["ratings"]
+    ratings_df = _table("ratings")
     return ratings_df[ratings_df["user_id"] == user_id].sort_values(by="created_at", ascending=False)
 
-def add_order(user_id, product_id, quantity):
-    """Add a new order to the database."""
-    orders_df = st.session_state.db["orders"]
-    products_df = st.session_state.db["products"]
-    
-    # Get product information
-    product = products_df[products_df["id"] == product_id]
-    
-    if product.empty:
-        return False, "Product not found"
-    
-    product = product.iloc[0]
-    
-    # Check if we have enough stock
-    if product["stock"] < quantity:
-        return False, f"Not enough stock. Available: {product['stock']}"
-    
-    # Calculate total price
-    total_price = product["price"] * quantity
-    
-    # Create new order
-    new_order_id = 1 if len(orders_df) == 0 else orders_df["id"].max() + 1
-    
-    new_order = pd.DataFrame({
-        "id": [new_order_id],
-        "user_id": [user_id],
-        "product_id": [product_id],
-        "quantity": [quantity],
-        "total_price": [total_price],
-        "status": ["Processing"],
-        "created_at": [pd.Timestamp.now()]
-    })
+def _page(df, order_columns, descending, cursor, page_size):
+    """Get one keyset page of a DataFrame, and the cursor for the next page (as db_utils does)."""
+    df = df.sort_values(order_columns, ascending=not descending, kind="stable")
+    
+    if cursor is not None:
+        # Rows that sort after the cursor: greater on some column, and equal on the ones before it
+        after = pd.Series(False, index=df.index)
+        equal = pd.Series(True, index=df.index)
+        
+        for column, value in zip(order_columns, cursor):
+            beyond = df[column] < value if descending else df[column] > value
+            after |= equal & beyond
+            equal &= df[column] == value
+        
+        df = df[after]
     
-    # Add order to database
-    st.session_state.db["orders"] = pd.concat([orders_df, new_order], ignore_index=True)
+    page = df.iloc[:page_size].reset_index(drop=True)
     
-    # Update product stock
-    products_df.loc[products_df["id"] == product_id, "stock"] -= quantity
-    st.session_state.db["products"] = products_df
+    if len(df) <= page_size:
+        return page, None
     
-    return True, new_order_id
+    last_row = page.iloc[-1]
+    return page, tuple(last_row[column] for column in order_columns)
 
-def add_complaint(user_id, order_id, subject, description):
-    """Add a new complaint to the database."""
-    complaints_df = st.session_state.db["complaints"]
-    orders_df = st.session_state.db["orders"]
+def _contains(series, query):
+    """Case-insensitive substring match of a text column."""
+    return series.fillna("").str.lower().str.contains(query.lower(), regex=False)
+
+def _filter_users(search_query=None, include_admins=False):
+    """Users matching the listing filters."""
+    users_df = _table("users")
     
-    # Check if order exists and belongs to the user
-    order = orders_df[(orders_df["id"] == order_id) & (orders_df["user_id"] == user_id)]
+    if search_query:
+        search_query = search_query.strip()
+        users_df = users_df[_contains(users_df["username"], search_query) | _contains(users_df["email"], search_query)]
     
-    if order.empty:
-        return False, "Order not found or does not belong to this user"
+    if not include_admins:
+        users_df = users_df[~users_df["is_admin"]]
     
-    # Create new complaint
-    new_complaint_id = 1 if len(complaints_df) == 0 else complaints_df["id"].max() + 1
+    return users_df
+
+def get_users_page(cursor=None, page_size=PAGE_SIZE, search_query=None, include_admins=False):
+    """Get one page of users, newest first, and the cursor for the next page."""
+    return _page(_filter_users(search_query, include_admins), ["created_at", "id"], True, cursor, page_size)
+
+def count_users(search_query=None, include_admins=False):
+    """Count the users matching the listing filters."""
+    return len(_filter_users(search_query, include_admins))
+
+def search_users(query, limit=50, include_admins=False):
+    """Search users by username or email, returning at most limit matches."""
+    return _filter_users(query, include_admins).sort_values("username").head(limit).reset_index(drop=True)
+
+def _filter_products(category=None, name_query=None):
+    """Products matching the listing filters."""
+    products_df = _table("products")
     
-    new_complaint = pd.DataFrame({
-        "id": [new_complaint_id],
-        "user_id": [user_id],
-        "order_id": [order_id],
-        "subject": [subject],
-        "description": [description],
-        "status": ["Pending"],
-        "admin_response": [None],
-        "created_at": [pd.Timestamp.now()],
-        "updated_at": [pd.Timestamp.now()]
-    })
+    if category and category != "All Categories":
+        products_df = products_df[products_df["category"] == category]
     
-    # Add complaint to database
-    st.session_state.db["complaints"] = pd.concat([complaints_df, new_complaint], ignore_index=True)
+    if name_query:
+        products_df = products_df[_contains(products_df["name"], name_query)]
     
-    return True, new_complaint_id
+    return products_df
 
-def add_rating(user_id, product_id, rating, review):
-    """Add a new product rating to the database."""
-    ratings_df = st.session_state.db["ratings"]
-    products_df = st.session_state.db["products"]
-    
-    # Check if product exists
-    if products_df[products_df["id"] == product_id].empty:
-        return False, "Product not found"
-    
-    # Check if user has already rated this product
-    existing_rating = ratings_df[(ratings_df["user_id"] == user_id) & (ratings_df["product_id"] == product_id)]
+def get_products_page(cursor=None, page_size=PAGE_SIZE, category=None, name_query=None):
+    """Get one page of products ordered by name, and the cursor for the next page."""
+    return _page(_filter_products(category, name_query), ["name", "id"], False, cursor, page_size)
+
+def count_products(category=None, name_query=None):
+    """Count the products matching the listing filters."""
+    return len(_filter_products(category, name_query))
+
+def get_orders_page(user_id=None, cursor=None, page_size=PAGE_SIZE):
+    """Get one page of orders (optionally for one user), newest first, and the next cursor."""
+    orders_df = _table("orders")
     
-    if not existing_rating.empty:
-        # Update existing rating
-        ratings_df.loc[(ratings_df["user_id"] == user_id) & (ratings_df["product_id"] == product_id), 
-                       ["rating", "review", "created_at"]] = [rating, review, pd.Timestamp.now()]
-        
-        st.session_state.db["ratings"] = ratings_df
-        return True, "Rating updated"
+    if user_id is not None:
+        orders_df = orders_df[orders_df["user_id"] == user_id]
     
-    # Create new rating
-    new_rating_id = 1 if len(ratings_df) == 0 else ratings_df["id"].max() + 1
+    return _page(orders_df, ["created_at", "id"], True, cursor, page_size)
+
+def count_orders(user_id=None):
+    """Count all orders, or one user's orders."""
+    orders_df = _table("orders")
+    return len(orders_df) if user_id is None else int((orders_df["user_id"] == user_id).sum())
+
+def _complaints_detailed(status=None, search_query=None):
+    """Complaints matching the filters, with their username, order and product name."""
+    complaints_df = _table("complaints")
     
-    new_rating = pd.DataFrame({
-        "id": [new_rating_id],
-        "user_id": [user_id],
-        "product_id": [product_id],
-        "rating": [rating],
-        "review": [review],
-        "created_at": [pd.Timestamp.now()]
-    })
+    if status and status != "All":
+        complaints_df = complaints_df[complaints_df["status"] == status]
     
-    # Add rating to database
-    st.session_state.db["ratings"] = pd.concat([ratings_df, new_rating], ignore_index=True)
+    if search_query:
+        complaints_df = complaints_df[
+            _contains(complaints_df["subject"], search_query) | _contains(complaints_df["description"], search_query)
+        ]
     
-    return True, new_rating_id
+    orders_df = _table("orders").rename(columns={
+        "id": "order_id", "quantity": "order_quantity", "total_price": "order_total"
+    })[["order_id", "product_id", "order_quantity", "order_total"]]
+    
+    return (
+        complaints_df
+        .merge(_table("users")[["id", "username"]].rename(columns={"id": "user_id"}), on="user_id")
+        .merge(orders_df, on="order_id")
+        .merge(_table("products")[["id", "name"]].rename(columns={"id": "product_id", "name": "product_name"}),
+               on="product_id")
+    )
 
-def respond_to_complaint(complaint_id, response):
-    """Update a complaint with admin response."""
-    complaints_df = st.session_state.db["complaints"]
-    
-    # Check if complaint exists
-    if complaints_df[complaints_df["id"] == complaint_id].empty:
-        return False, "Complaint not found"
+def get_complaints_page(status=None, search_query=None, cursor=None, page_size=PAGE_SIZE):
+    """Get one page of detailed complaints, newest first, and the cursor for the next page."""
+    return _page(_complaints_detailed(status, search_query), ["created_at", "id"], True, cursor, page_size)
+
+def count_complaints(status=None, search_query=None):
+    """Count the complaints matching the filters."""
+    complaints_df = _table("complaints")
     
-    # Update complaint
-    complaints_df.loc[complaints_df["id"] == complaint_id, 
-                     ["status", "admin_response", "updated_at"]] = ["Resolved", response, pd.Timestamp.now()]
+    if status and status != "All":
+        complaints_df = complaints_df[complaints_df["status"] == status]
     
-    st.session_state.db["complaints"] = complaints_df
+    if search_query:
+        complaints_df = complaints_df[
+            _contains(complaints_df["subject"], search_query) | _contains(complaints_df["description"], search_query)
+        ]
     
-    return True, "Complaint updated"
+    return len(complaints_df)
+
+def search_complaints(query, status=None, limit=50):
+    """Search complaints by subject or description, newest first, returning at most limit matches."""
+    complaints = _complaints_detailed(status, query).sort_values(["created_at", "id"], ascending=False)
+    return complaints.head(limit).reset_index(drop=True)
+
+def get_product_filter_options():
+    """Get the product categories and price range used by the search filters."""
+    products_df = _table("products")
+    
+    return {
+        "categories": sorted(products_df["category"].unique()),
+        "min_price": float(products_df["price"].min()) if not products_df.empty else 0.0,
+        "max_price": float(products_df["price"].max()) if not products_df.empty else 0.0
+    }
+
+def get_product_ratings(product_id):
+    """Get all ratings for a product."""
+    ratings_df = _table("ratings")
+    ratings = ratings_df[ratings_df["product_id"] == product_id]
+    return ratings.sort_values("created_at", ascending=False).reset_index(drop=True)
+
+def get_product_stats(product_id):
+    """Get units sold, revenue and rating aggregates for a product."""
+    orders_df = _table("orders")
+    ratings_df = _table("ratings")
+    orders = orders_df[orders_df["product_id"] == product_id]
+    ratings = ratings_df[ratings_df["product_id"] == product_id]
+    
+    stats = {
+        "product_id": product_id,
+        "units_sold": int(orders["quantity"].sum()),
+        "revenue": float(orders["total_price"].sum()),
+        "rating_count": len(ratings),
+        "rating_total": int(ratings["rating"].sum())
+    }
+    stats["average_rating"] = stats["rating_total"] / stats["rating_count"] if stats["rating_count"] else None
+    return stats
+
+def get_recent_orders(limit=5):
+    """Get the most recent orders with their username and product name."""
+    orders = _table("orders").sort_values(["created_at", "id"], ascending=False).head(limit)
+    
+    return (
+        orders
+        .merge(_table("users")[["id", "username"]].rename(columns={"id": "user_id"}), on="user_id")
+        .merge(_table("products")[["id", "name"]].rename(columns={"id": "product_id", "name": "product_name"}),
+               on="product_id")
+        .sort_values(["created_at", "id"], ascending=False)
+        .reset_index(drop=True)
+    )
+
+def get_recent_complaints(limit=5):
+    """Get the most recent complaints with their username."""
+    complaints = _table("complaints").sort_values(["created_at", "id"], ascending=False).head(limit)
+    
+    return (
+        complaints
+        .merge(_table("users")[["id", "username"]].rename(columns={"id": "user_id"}), on="user_id")
+        .sort_values(["created_at", "id"], ascending=False)
+        .reset_index(drop=True)
+    )
+
+def get_low_stock_products(threshold=LOW_STOCK_THRESHOLD):
+    """Get products with less than threshold units in stock, lowest stock first."""
+    products_df = _table("products")
+    return products_df[products_df["stock"] < threshold].sort_values(["stock", "id"]).reset_index(drop=True)
+
+def get_dashboard_counts():
+    """Count customers, products, orders and open complaints."""
+    return {
+        "customers": int((~_table("users")["is_admin"]).sum()),
+        "products": len(_table("products")),
+        "orders": len(_table("orders")),
+        "open_complaints": int((_table("complaints")["status"] == "Pending").sum())
+    }
+
+def get_dashboard_summary(recent_limit=5, low_stock_threshold=LOW_STOCK_THRESHOLD):
+    """Get everything the admin dashboard shows: counters, recent activity and low stock."""
+    summary = get_dashboard_counts()
+    summary["recent_orders"] = get_recent_orders(recent_limit)
+    summary["recent_complaints"] = get_recent_complaints(recent_limit)
+    summary["low_stock"] = get_low_stock_products(low_stock_threshold)
+    return summary
 
 def search_products(query, category=None, min_price=None, max_price=None):
-    """Search for products based on query and filters."""
-    products_df = st.session_state.db["products"]
-    
+    """Search for products based on query and filters, best matches first."""
     # Start with all products
-    results = products_df.copy()
-    
-    # Apply search query if provided
-    if query:
-        query_lower = query.lower()
-        results = results[
-            results["name"].str.lower().str.contains(query_lower) | 
-            results["description"].str.lower().str.contains(query_lower)
-        ]
+    results = _table("products")
     
     # Apply category filter if provided
     if category and category != "All Categories":
@@ -354,4 +502,224 @@ def search_products(query, category=None, min_price=None, max_price=None):
     if max_price is not None:
         results = results[results["price"] <= max_price]
     
-    return results
+    query = (query or "").strip()
+    
+    if not query:
+        return results.sort_values(["name", "id"]).reset_index(drop=True)
+    
+    # Name matches first, then description, then category (the order of db_utils.PRODUCT_SEARCH_WEIGHTS)
+    in_name = _contains(results["name"], query)
+    in_category = _contains(results["category"], query)
+    in_description = _contains(results["description"], query)
+    rank = (~in_name).astype(int) * 2 + (~in_name & ~in_description).astype(int)
+    
+    results = results.assign(_rank=rank)[in_name | in_category | in_description]
+    return results.sort_values(["_rank", "name", "id"]).drop(columns="_rank").reset_index(drop=True)
+
+def export_table_csv(table, path=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write a table to a CSV file and return the file's path.
+    
+    Without a path the CSV goes to a new temporary file, which the caller owns.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix=f"{table}_", suffix=".csv")
+        os.close(handle)
+    
+    _table(table).sort_values("id").to_csv(path, index=False, chunksize=chunk_size)
+    return path
+
+def authenticate_user(username, password):
+    """Authenticate a user."""
+    # Get the user
+    user = get_user_by_username(username)
+    
+    if user:
+        # Hash the password and compare
+        hashed_password = hashlib.sha256(password.encode()).hexdigest()
+        if user['password'] == hashed_password:
+            return True, user
+    
+    return False, None
+
+def create_user(username, email, password, is_admin=False):
+    """Create a new user in the database."""
+    with _lock:
+        users_df = _table("users")
+        
+        # Check if username or email already exists
+        if (users_df["username"] == username).any():
+            return False, "Username already exists"
+        
+        if (users_df["email"] == email).any():
+            return False, "Email already exists"
+        
+        user_id = _next_id("users")
+        
+        _append("users", [{
+            "id": user_id,
+            "username": username,
+            "email": email,
+            "password": hashlib.sha256(password.encode()).hexdigest(),
+            "is_admin": bool(is_admin),
+            "created_at": pd.Timestamp.now()
+        }])
+        
+        return True, user_id
+
+def add_order(user_id, product_id, quantity):
+    """Add a new order to the database."""
+    success, result = place_orders(user_id, [(product_id, quantity)])
+    return (True, result[0]) if success else (False, result)
+
+def place_orders(user_id, items):
+    """Place one order per (product_id, quantity) item, all or nothing.
+    
+    Returns (True, order IDs in item order) or (False, the reason nothing was ordered).
+    Repeated products are combined into one order.
+    """
+    # Combine repeated products, keeping the order they were first added in
+    quantities = {}
+    
+    for product_id, quantity in items:
+        quantities[int(product_id)] = quantities.get(int(product_id), 0) + int(quantity)
+    
+    if not quantities:
+        return False, "Nothing to order"
+    
+    if any(quantity < 1 for quantity in quantities.values()):
+        return False, "Quantity must be at least 1"
+    
+    with _lock:
+        products = get_products_by_ids(quantities)
+        
+        # Check every line before taking any stock
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            
+            if product is None:
+                return False, "Product not found"
+            
+            if product['stock'] < quantity:
+                return False, f"Not enough stock of {product['name']}. Available: {product['stock']}"
+        
+        # Take the stock
+        products_df = _table("products").copy()
+        taken = products_df["id"].map(quantities).fillna(0).astype("int64")
+        products_df["stock"] -= taken
+        _db["products"] = products_df
+        
+        # Create the orders
+        first_order_id = _next_id("orders")
+        order_ids = list(range(first_order_id, first_order_id + len(quantities)))
+        now = pd.Timestamp.now()
+        
+        _append("orders", [
+            {
+                "id": order_id,
+                "user_id": int(user_id),
+                "product_id": product_id,
+                "quantity": quantity,
+                "total_price": products[product_id]['price'] * quantity,
+                "status": "Processing",
+                "created_at": now
+            }
+            for order_id, (product_id, quantity) in zip(order_ids, quantities.items())
+        ])
+    
+    return True, order_ids
+
+def add_complaint(user_id, order_id, subject, description, wait=True):
+    """Add a new complaint to the database."""
+    with _lock:
+        orders_df = _table("orders")
+        
+        # Check if order exists and belongs to the user
+        order = orders_df[(orders_df["id"] == order_id) & (orders_df["user_id"] == user_id)]
+        
+        if order.empty:
+            return _result((False, "Order not found or does not belong to this user"), wait)
+        
+        # Create new complaint
+        complaint_id = _next_id("complaints")
+        now = pd.Timestamp.now()
+        
+        _append("complaints", [{
+            "id": complaint_id,
+            "user_id": int(user_id),
+            "order_id": int(order_id),
+            "subject": subject,
+            "description": description,
+            "status": "Pending",
+            "admin_response": None,
+            "created_at": now,
+            "updated_at": now
+        }])
+    
+    return _result((True, complaint_id), wait)
+
+def add_rating(user_id, product_id, rating, review, wait=True):
+    """Add a new product rating to the database."""
+    with _lock:
+        products_df = _table("products")
+        ratings_df = _table("ratings")
+        
+        # Check if product exists
+        if products_df[products_df["id"] == product_id].empty:
+            return _result((False, "Product not found"), wait)
+        
+        # Check if user has already rated this product
+        existing = (ratings_df["user_id"] == user_id) & (ratings_df["product_id"] == product_id)
+        
+        if existing.any():
+            # Update existing rating
+            _update("ratings", existing, {"rating": rating, "review": review, "created_at": pd.Timestamp.now()})
+            return _result((True, "Rating updated"), wait)
+        
+        # Create new rating
+        rating_id = _next_id("ratings")
+        
+        _append("ratings", [{
+            "id": rating_id,
+            "user_id": int(user_id),
+            "product_id": int(product_id),
+            "rating": int(rating),
+            "review": review,
+            "created_at": pd.Timestamp.now()
+        }])
+    
+    return _result((True, rating_id), wait)
+
+def respond_to_complaint(complaint_id, response, wait=True):
+    """Update a complaint with admin response."""
+    with _lock:
+        complaints_df = _table("complaints")
+        complaint = complaints_df["id"] == complaint_id
+        
+        # Check if complaint exists
+        if not complaint.any():
+            return _result((False, "Complaint not found"), wait)
+        
+        # Update complaint
+        _update("complaints", complaint, {
+            "status": "Resolved", "admin_response": response, "updated_at": pd.Timestamp.now()
+        })
+    
+    return _result((True, "Complaint updated"), wait)
+
+def update_product(product_id, name, category, price, stock, description):
+    """Update a product in the database."""
+    with _lock:
+        product = _table("products")["id"] == product_id
+        
+        # Check if product exists
+        if not product.any():
+            return False, "Product not found"
+        
+        _update("products", product, {
+            "name": name, "category": category, "price": float(price), "stock": int(stock), "description": description
+        })
+    
+    return True, "Product updated successfully"
@@ -1,406 +1,2058 @@
 import sqlite3
 import os
+import csv
+import tempfile
 import pandas as pd
+import numpy as np
 import hashlib
 import time
 import random
+import re
+import threading
+import atexit
+from collections import OrderedDict
+from contextlib import contextmanager
+from queue import LifoQueue, Queue, Empty
+from concurrent.futures import Future
 from datetime import datetime, timedelta
+from dateutil.tz import tzlocal
+
+import instrumentation
+import profiler
+from loader import load_parallel
+
+# IDs taken from DataFrames are NumPy integers, which sqlite3 would otherwise bind as BLOBs
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
 
 # Database file path
 DB_FILE = 'crm_database.db'
 
-def initialize_database():
-    """Initialize the SQLite database if it doesn't exist."""
-    # Check if database file exists
-    db_exists = os.path.exists(DB_FILE)
-    
-    # Connect to database (will create it if it doesn't exist)
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    if not db_exists:
-        # Create users table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            is_admin BOOLEAN NOT NULL,
-            created_at TIMESTAMP NOT NULL
-        )
-        ''')
-        
-        # Create products table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            category TEXT NOT NULL,
-            price REAL NOT NULL,
-            description TEXT,
-            stock INTEGER NOT NULL,
-            created_at TIMESTAMP NOT NULL
-        )
-        ''')
-        
-        # Create orders table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            product_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL,
-            total_price REAL NOT NULL,
-            status TEXT NOT NULL,
-            created_at TIMESTAMP NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (product_id) REFERENCES products (id)
-        )
-        ''')
-        
-        # Create complaints table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS complaints (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            order_id INTEGER NOT NULL,
-            subject TEXT NOT NULL,
-            description TEXT NOT NULL,
-            status TEXT NOT NULL,
-            admin_response TEXT,
-            created_at TIMESTAMP NOT NULL,
-            updated_at TIMESTAMP NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (order_id) REFERENCES orders (id)
-        )
-        ''')
-        
-        # Create ratings table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ratings (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            product_id INTEGER NOT NULL,
-            rating INTEGER NOT NULL,
-            review TEXT,
-            created_at TIMESTAMP NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (product_id) REFERENCES products (id)
+# DB_FILE value for a database kept in memory, shared by every connection in the process
+MEMORY_DB = ":memory:"
+MEMORY_DB_URI = "file:crm_memory?mode=memory&cache=shared"
+
+# Maximum number of connections the pool keeps open at once
+POOL_SIZE = 8
+
+# Seconds a caller waits for a free pooled connection before giving up
+POOL_TIMEOUT = 30
+
+# Most IDs sent in a single IN (...) list; older SQLite builds allow only 999 bound parameters
+MAX_IN_PARAMS = 900
+
+# Rows kept per table in the entity cache, and seconds before a cached row expires (None = never)
+ENTITY_CACHE_SIZE = 2048
+ENTITY_CACHE_TTL = 300
+
+# Seconds a cached table snapshot may be reused even if no write from this process was seen
+# (covers writes made by other processes, e.g. manage.py); None = until a local write
+SNAPSHOT_TTL = 60
+
+# Rows per page in the paged listings
+PAGE_SIZE = 25
+
+# Tables that can be exported and snapshotted
+TABLES = ("users", "products", "orders", "complaints", "ratings")
+
+# Rows fetched per round trip when streaming a table out
+EXPORT_CHUNK_SIZE = 5000
+
+# Rows validated and inserted per transaction by the bulk importers
+IMPORT_BATCH_SIZE = 5000
+
+# Most per-row errors a bulk import keeps (the rest are only counted)
+MAX_IMPORT_ERRORS = 1000
+
+# Order statuses the app uses
+ORDER_STATUSES = ("Processing", "Shipped", "Delivered")
+
+# Attempts at a write transaction that keeps finding the database locked, and the
+# seconds waited before the first retry (doubled, with jitter, for each later one)
+WRITE_RETRIES = 5
+WRITE_RETRY_BACKOFF = 0.05
+
+# Queue complaints, ratings and complaint responses for group commits on a background
+# thread (CRM_WRITE_BEHIND=1): most writes per batch, and seconds a batch stays open
+WRITE_BEHIND = os.environ.get("CRM_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_BATCH_SIZE = 100
+WRITE_BEHIND_INTERVAL = 0.05
+
+# Named SQLite storage profiles; the active one is applied to every new connection
+STORAGE_PROFILES = {
+    # SQLite's own defaults: rollback journal and a full fsync on every commit
+    "default": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+        "wal_autocheckpoint": 1000,
+        "checkpoint_interval": 0
+    },
+    # WAL lets readers run while an order is being written; NORMAL only fsyncs at checkpoints
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "wal_autocheckpoint": 1000,
+        "checkpoint_interval": 60
+    },
+    # WAL concurrency, but every commit is fsynced before it returns
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+        "wal_autocheckpoint": 1000,
+        "checkpoint_interval": 30
+    },
+    # For benchmarks and throwaway databases: no fsync at all
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "wal_autocheckpoint": 10000,
+        "checkpoint_interval": 0
+    }
+}
+
+# Name of the storage profile in use
+STORAGE_PROFILE = os.environ.get("CRM_STORAGE_PROFILE", "balanced")
+
+def _adapt_datetime(value):
+    """Store datetimes in the same text format sqlite3 has always used."""
+    return value.isoformat(" ")
+
+def _convert_timestamp(value):
+    """Read TIMESTAMP columns back as datetime objects."""
+    return datetime.fromisoformat(value.decode())
+
+def _convert_boolean(value):
+    """Read BOOLEAN columns back as Python booleans."""
+    return bool(int(value))
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+sqlite3.register_converter("BOOLEAN", _convert_boolean)
+
+class ConnectionPool:
+    """A bounded pool of long-lived SQLite connections shared by all script threads.
+    
+    A thread that already holds a connection gets the same one back when it asks
+    again, so db_utils functions can call each other (and share a transaction)
+    without checking out a second connection.
+    """
+    
+    def __init__(self, db_file, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_file = db_file
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "checkouts": 0,
+            "reused": 0,
+            "waits": 0,
+            "in_use": 0,
+            "closed": 0
+        }
+    
+    def _connect(self):
+        """Open a new connection for the pool."""
+        conn = get_db_connection(self.db_file)
+        
+        with self._lock:
+            self._stats["created"] += 1
+        
+        return conn
+    
+    def acquire(self):
+        """Check out a connection, reusing the one this thread already holds."""
+        held = getattr(self._local, "conn", None)
+        
+        if held is not None:
+            self._local.depth += 1
+            return held
+        
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        
+        # Wait for a free slot if every connection is in use
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["waits"] += 1
+            
+            if not self._slots.acquire(timeout=self.timeout):
+                raise TimeoutError(f"No database connection available after {self.timeout} seconds")
+        
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except Empty:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+            reused = False
+        
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            
+            if reused:
+                self._stats["reused"] += 1
+        
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+    
+    def release(self, conn):
+        """Return a connection once the outermost caller in this thread is done with it."""
+        self._local.depth -= 1
+        
+        if self._local.depth > 0:
+            return
+        
+        self._local.conn = None
+        
+        # Never hand out a connection with a half-finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        
+        with self._lock:
+            self._stats["in_use"] -= 1
+        
+        if self._closed:
+            self._close(conn)
+        else:
+            self._idle.put(conn)
+        
+        self._slots.release()
+    
+    def _close(self, conn):
+        """Close a pooled connection."""
+        conn.close()
+        
+        with self._lock:
+            self._stats["closed"] += 1
+    
+    def close(self):
+        """Close every idle connection; connections in use are closed when returned."""
+        self._closed = True
+        
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except Empty:
+                break
+    
+    def stats(self):
+        """Return a snapshot of the pool counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        
+        stats["idle"] = self._idle.qsize()
+        stats["open"] = stats["created"] - stats["closed"]
+        stats["max_size"] = self.max_size
+        stats["db_file"] = self.db_file
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """Get the process-wide connection pool for DB_FILE, creating it on first use."""
+    global _pool
+    
+    with _pool_lock:
+        # Start a fresh pool if DB_FILE has been pointed somewhere else
+        if _pool is None or _pool.db_file != DB_FILE:
+            if _pool is not None:
+                _pool.close()
+            
+            if DB_FILE == MEMORY_DB:
+                _open_memory_anchor()
+                
+                # Shared-cache connections fail at once on a table lock instead of waiting
+                # for it, so every thread takes turns on a single connection
+                _pool = ConnectionPool(DB_FILE, max_size=1)
+            else:
+                _pool = ConnectionPool(DB_FILE)
+            
+            # Cached rows belong to the old database
+            clear_entity_caches()
+            clear_table_snapshots()
+        
+        return _pool
+
+# Connection that keeps the in-memory database alive while the pool is closed and reopened
+_memory_anchor = None
+
+def _open_memory_anchor():
+    """Open the connection that owns the in-memory database, once per process."""
+    global _memory_anchor
+    
+    if _memory_anchor is None:
+        _memory_anchor = get_db_connection(MEMORY_DB)
+
+def load_into_memory(path):
+    """Copy a database file into the in-memory database and point DB_FILE at it."""
+    global DB_FILE
+    
+    stop_checkpoint_scheduler()
+    close_connection_pool()
+    
+    with _pool_lock:
+        _open_memory_anchor()
+    
+    source = sqlite3.connect(path)
+    
+    try:
+        source.backup(_memory_anchor)
+    finally:
+        source.close()
+    
+    DB_FILE = MEMORY_DB
+    _fts_tables.pop(MEMORY_DB, None)
+    clear_entity_caches()
+    clear_table_snapshots()
+    _bump_table_versions(*TABLES)
+
+def close_connection_pool():
+    """Close all pooled connections (e.g. before replacing the database file)."""
+    global _pool
+    
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    
+    # The schema may change while no connection is open (e.g. a migration run elsewhere)
+    _fts_tables.clear()
+
+def get_pool_stats():
+    """Get connection pool statistics."""
+    return get_connection_pool().stats()
+
+def set_query_instrumentation(enabled, slow_query_ms=None):
+    """Turn per-statement timing on or off (connections are reopened to pick it up)."""
+    if slow_query_ms is not None:
+        instrumentation.SLOW_QUERY_MS = float(slow_query_ms)
+    
+    if bool(enabled) != instrumentation.ENABLED:
+        instrumentation.ENABLED = bool(enabled)
+        close_connection_pool()
+
+def get_query_instrumentation():
+    """Get the query instrumentation settings."""
+    return {
+        "enabled": instrumentation.ENABLED,
+        "slow_query_ms": instrumentation.SLOW_QUERY_MS,
+        "slow_query_log": instrumentation.SLOW_QUERY_LOG
+    }
+
+def get_query_stats():
+    """Get per-statement timing counters, slowest in total first."""
+    return instrumentation.get_query_stats()
+
+def get_slow_queries():
+    """Get the most recent slow queries with their query plans, newest first."""
+    return instrumentation.get_slow_queries()
+
+def reset_query_stats():
+    """Clear the per-statement timing counters."""
+    instrumentation.reset_query_stats()
+
+def get_page_timings():
+    """Get rerun timings per page from the recently profiled reruns, slowest first."""
+    return profiler.get_page_timings()
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection for the duration of a with-block."""
+    pool = get_connection_pool()
+    conn = pool.acquire()
+    
+    try:
+        # Counts as one data call when the current rerun is being profiled
+        with profiler.data_call(conn):
+            yield conn
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def db_transaction(immediate=False):
+    """Run a with-block in a transaction that commits on success and rolls back on error.
+    
+    Nested calls in the same thread become savepoints of the outer transaction.
+    With immediate=True the write lock is taken up front (BEGIN IMMEDIATE).
+    """
+    with db_connection() as conn:
+        if conn.in_transaction:
+            savepoint = f"sp_{id(conn)}_{time.perf_counter_ns()}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+                raise
+            
+            conn.execute(f"RELEASE {savepoint}")
+        else:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            _transaction_local.after_commit = []
+            
+            try:
+                yield conn
+            except BaseException:
+                _transaction_local.after_commit = None
+                conn.rollback()
+                raise
+            
+            callbacks, _transaction_local.after_commit = _transaction_local.after_commit, None
+            conn.commit()
+            
+            for callback in callbacks:
+                callback()
+
+# Work to run once the current thread's outermost transaction commits
+_transaction_local = threading.local()
+
+def _in_transaction():
+    """Whether the current thread is inside db_transaction()."""
+    return getattr(_transaction_local, "after_commit", None) is not None
+
+def _after_commit(callback):
+    """Run a callback after the current transaction commits, or now if there is none."""
+    pending = getattr(_transaction_local, "after_commit", None)
+    
+    if pending is None:
+        callback()
+    else:
+        pending.append(callback)
+
+# Counters for write transactions retried because the database was locked
+_retry_lock = threading.Lock()
+_retry_stats = {"retries": 0, "gave_up": 0}
+
+def _is_busy(error):
+    """Whether an error means another connection holds the lock (SQLITE_BUSY/SQLITE_LOCKED)."""
+    return isinstance(error, sqlite3.OperationalError) and (
+        getattr(error, "sqlite_errorname", None) in ("SQLITE_BUSY", "SQLITE_LOCKED")
+        or "database is locked" in str(error)
+    )
+
+def _retry_on_busy(operation, retries=WRITE_RETRIES, backoff=WRITE_RETRY_BACKOFF):
+    """Run a write transaction, retrying with exponential backoff while the database is busy.
+    
+    Inside an outer transaction there is nothing safe to retry, so the operation
+    runs once and a busy error goes to the caller.
+    """
+    if _in_transaction():
+        return operation()
+    
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e):
+                raise
+            
+            if attempt == retries:
+                with _retry_lock:
+                    _retry_stats["gave_up"] += 1
+                
+                raise
+        
+        with _retry_lock:
+            _retry_stats["retries"] += 1
+        
+        # Jitter keeps writers that collided from retrying in lockstep
+        time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+def get_write_retry_stats():
+    """Get how often write transactions were retried, or gave up, on a locked database."""
+    with _retry_lock:
+        return dict(_retry_stats)
+
+class EntityCache:
+    """A thread-safe LRU cache of database rows keyed by ID, with an optional time-to-live."""
+    
+    def __init__(self, max_size=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+    
+    def get(self, key):
+        """Return (True, row) on a hit or (False, None) on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+            
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, dict(entry[0])
+    
+    def put(self, key, row, generation):
+        """Cache a row read while the cache was at the given generation.
+        
+        Rows read before an invalidation are dropped, so a slow reader can
+        never put back a value that a concurrent write just replaced.
+        """
+        with self._lock:
+            if generation != self.generation:
+                return
+            
+            self._entries[key] = (dict(row), time.monotonic())
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+    
+    def invalidate(self, *keys):
+        """Drop the given keys."""
+        with self._lock:
+            self.generation += 1
+            
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._stats["invalidations"] += 1
+    
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+    
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["max_size"] = self.max_size
+        stats["ttl"] = self.ttl
+        return stats
+
+# Read-through caches in front of the single-row getters
+_entity_caches = {
+    "users": EntityCache(),
+    "products": EntityCache(),
+    "orders": EntityCache(),
+    "complaints": EntityCache()
+}
+
+def get_cache_stats():
+    """Get hit/miss/eviction counters for each entity cache."""
+    return {table: cache.stats() for table, cache in _entity_caches.items()}
+
+def clear_entity_caches():
+    """Empty every entity cache."""
+    for cache in _entity_caches.values():
+        cache.clear()
+
+# Per-table version counters, bumped by every write, that cached snapshots are keyed on
+_table_versions = {"users": 0, "products": 0, "orders": 0, "complaints": 0, "ratings": 0}
+_table_versions_lock = threading.Lock()
+
+def _bump_table_versions(*tables):
+    """Advance the version counter of each table."""
+    with _table_versions_lock:
+        for table in tables:
+            _table_versions[table] = _table_versions.get(table, 0) + 1
+
+def get_table_version(table):
+    """Get a table's in-process version counter."""
+    return _table_versions.get(table, 0)
+
+def mark_changed(table, *ids):
+    """Record a write to a table once the current transaction commits.
+    
+    Bumps the table's version (so cached snapshots are rebuilt) and evicts the
+    given row IDs from its entity cache. Code that writes with its own SQL inside
+    db_transaction() calls this for every table it changes.
+    """
+    cache = _entity_caches.get(table)
+    ids = [int(row_id) for row_id in ids]
+    
+    def invalidate():
+        _bump_table_versions(table)
+        
+        if cache is not None:
+            cache.invalidate(*ids)
+    
+    _after_commit(invalidate)
+
+# Cached query results shared by every session: key -> (versions, loaded_at, result)
+_table_snapshots = {}
+_snapshot_locks = {}
+_snapshot_locks_lock = threading.Lock()
+_snapshot_stats = {"hits": 0, "misses": 0}
+
+def _count_snapshot(outcome):
+    """Count a snapshot hit or miss (sessions and loader threads look up snapshots at once)."""
+    with _snapshot_locks_lock:
+        _snapshot_stats[outcome] += 1
+
+def _versioned_snapshot(key, tables, loader):
+    """Return loader()'s result, reusing it across sessions until one of the tables changes.
+    
+    Snapshots are shared, so callers must treat returned DataFrames as read-only.
+    """
+    versions = tuple(get_table_version(table) for table in tables)
+    
+    def fresh(entry):
+        return (entry is not None and entry[0] == versions
+                and (SNAPSHOT_TTL is None or time.monotonic() - entry[1] <= SNAPSHOT_TTL))
+    
+    entry = _table_snapshots.get(key)
+    
+    if fresh(entry):
+        _count_snapshot("hits")
+        return entry[2]
+    
+    with _snapshot_locks_lock:
+        lock = _snapshot_locks.setdefault(key, threading.Lock())
+    
+    # Only one session rebuilds a snapshot; the others wait and reuse its result
+    with lock:
+        entry = _table_snapshots.get(key)
+        
+        if fresh(entry):
+            _count_snapshot("hits")
+            return entry[2]
+        
+        _count_snapshot("misses")
+        result = loader()
+        
+        # Don't keep a result if a write landed while we were loading it
+        if tuple(get_table_version(table) for table in tables) == versions:
+            _table_snapshots[key] = (versions, time.monotonic(), result)
+        
+        return result
+
+def get_snapshot_stats():
+    """Get hit/miss counters and the cached keys of the table snapshot cache."""
+    with _snapshot_locks_lock:
+        stats = dict(_snapshot_stats)
+    
+    stats["cached"] = sorted(_table_snapshots)
+    stats["versions"] = dict(_table_versions)
+    return stats
+
+def clear_table_snapshots():
+    """Drop every cached table snapshot."""
+    _table_snapshots.clear()
+
+def _fts5_available(conn):
+    """Check whether this SQLite build includes the FTS5 extension."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    
+    conn.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+def _create_fts_index(conn, table, columns, tokenize, prefix=None):
+    """Create an external-content FTS5 index over some columns of a table.
+    
+    Triggers keep the index in step with inserts, deletes and updates of the
+    indexed columns, and the rows already in the table are indexed up front.
+    """
+    fts_table = f"{table}_fts"
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    options = f", prefix='{prefix}'" if prefix else ""
+    
+    conn.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+        {column_list},
+        content='{table}', content_rowid='id',
+        tokenize='{tokenize}'{options}
+    )
+    ''')
+    
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+        INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+    END
+    ''')
+    
+    conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+def _create_products_fts(conn):
+    """Index product name, description and category for ranked full-text search."""
+    # search_products falls back to LIKE on SQLite builds without FTS5 or the
+    # trigram tokenizer (SQLite 3.34+)
+    if not _fts5_available(conn) or sqlite3.sqlite_version_info < (3, 34, 0):
+        return
+    
+    # Trigrams keep the substring matching of the LIKE search ("phone" finds "Smartphone X")
+    _create_fts_index(conn, "products", ["name", "description", "category"], "trigram")
+
+def _create_admin_search_fts(conn):
+    """Index usernames/emails and complaint subjects/descriptions for admin search."""
+    if not _fts5_available(conn):
+        return
+    
+    # Trigrams keep "contains" semantics for partial usernames and email domains
+    # (the trigram tokenizer needs SQLite 3.34+; older builds keep using LIKE)
+    if sqlite3.sqlite_version_info >= (3, 34, 0):
+        _create_fts_index(conn, "users", ["username", "email"], "trigram")
+    
+    _create_fts_index(conn, "complaints", ["subject", "description"],
+                      "unicode61 remove_diacritics 2", prefix="2 3")
+
+def _has_table(conn, name):
+    """Check whether a table (including a virtual table) exists."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+def _fts_match_query(text):
+    """Turn free text into an FTS5 query that prefix-matches every word."""
+    # Quote each word so punctuation and FTS operators in user input are taken literally
+    terms = re.findall(r"\w+", text or "")
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _fts_substring_query(text):
+    """Turn free text into an FTS5 trigram query matching it as a substring."""
+    return '"' + text.replace('"', '""') + '"'
+
+# Seconds the list of full-text index tables is trusted before it is looked up again
+# (another process may run `manage.py migrate` while the app is up)
+FTS_TABLES_TTL = 60
+
+# Full-text index tables of each database file: db_file -> (looked_up_at, table names)
+_fts_tables = {}
+
+def _get_fts_tables():
+    """Get the names of DB_FILE's full-text index tables, looked up at most once per FTS_TABLES_TTL.
+    
+    run_migrations() and close_connection_pool() forget them, since migrations
+    are what create the indexes.
+    """
+    db_file = DB_FILE
+    entry = _fts_tables.get(db_file)
+    
+    if entry is None or time.monotonic() - entry[0] > FTS_TABLES_TTL:
+        with db_connection() as conn:
+            tables = frozenset(
+                row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                if row[0].endswith("_fts")
+            )
+        
+        entry = _fts_tables[db_file] = (time.monotonic(), tables)
+    
+    return entry[1]
+
+def _fts_condition(table, id_column, match_query):
+    """Build an "id IN (full-text matches)" condition, or None if the table has no index."""
+    fts_table = f"{table}_fts"
+    
+    if not match_query or fts_table not in _get_fts_tables():
+        return None
+    
+    return f"{id_column} IN (SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?)"
+
+def _rebuild_product_stats(conn):
+    """Recompute every product_stats row from the orders and ratings tables."""
+    conn.execute("DELETE FROM product_stats")
+    conn.execute('''
+    INSERT INTO product_stats (product_id, units_sold, revenue, rating_count, rating_total)
+    SELECT p.id,
+           COALESCE(o.units_sold, 0), COALESCE(o.revenue, 0),
+           COALESCE(r.rating_count, 0), COALESCE(r.rating_total, 0)
+    FROM products p
+    LEFT JOIN (
+        SELECT product_id, SUM(quantity) AS units_sold, SUM(total_price) AS revenue
+        FROM orders GROUP BY product_id
+    ) o ON o.product_id = p.id
+    LEFT JOIN (
+        SELECT product_id, COUNT(*) AS rating_count, SUM(rating) AS rating_total
+        FROM ratings GROUP BY product_id
+    ) r ON r.product_id = p.id
+    ''')
+
+def _bump_product_stats(cursor, product_id, units_sold=0, revenue=0, rating_count=0, rating_total=0):
+    """Add deltas to a product's statistics row, creating it if needed."""
+    cursor.execute('''
+    INSERT INTO product_stats (product_id, units_sold, revenue, rating_count, rating_total)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (product_id) DO UPDATE SET
+        units_sold = units_sold + excluded.units_sold,
+        revenue = revenue + excluded.revenue,
+        rating_count = rating_count + excluded.rating_count,
+        rating_total = rating_total + excluded.rating_total
+    ''', (product_id, units_sold, revenue, rating_count, rating_total))
+
+# Schema migrations in the order they are applied: (version, description, steps).
+# A step is either an SQL statement or a function that takes the connection.
+MIGRATIONS = [
+    (1, "Secondary indexes for per-user history, rating lookups and filters", [
+        # get_user_orders / get_user_complaints / get_user_ratings: WHERE user_id ORDER BY created_at DESC
+        # (ascending indexes are walked backwards, also for a (created_at DESC, id DESC) order)
+        "CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_complaints_user_created ON complaints (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_ratings_user_created ON ratings (user_id, created_at)",
+        # add_rating's existing-rating probe
+        "CREATE INDEX IF NOT EXISTS idx_ratings_user_product ON ratings (user_id, product_id)",
+        # Complaint status filters, newest first
+        "CREATE INDEX IF NOT EXISTS idx_complaints_status_created ON complaints (status, created_at)",
+        # search_products' category and price filters
+        "CREATE INDEX IF NOT EXISTS idx_products_category_price ON products (category, price)"
+    ]),
+    (2, "Indexes for newest-first activity feeds", [
+        "CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_complaints_created ON complaints (created_at)"
+    ]),
+    (3, "Indexes for keyset-paged listings ordered by (created_at, id) and (name, id)", [
+        "CREATE INDEX IF NOT EXISTS idx_users_admin_created ON users (is_admin, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_products_name ON products (name)"
+    ]),
+    (4, "Full-text index over product name, description and category", [
+        _create_products_fts
+    ]),
+    (5, "Full-text indexes for admin user and complaint search", [
+        _create_admin_search_fts
+    ]),
+    (6, "Per-product sales and rating statistics", [
+        '''
+        CREATE TABLE IF NOT EXISTS product_stats (
+            product_id INTEGER PRIMARY KEY,
+            units_sold INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            rating_count INTEGER NOT NULL DEFAULT 0,
+            rating_total INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+        ''',
+        _rebuild_product_stats,
+        # Reviews shown on the product detail page, newest first
+        "CREATE INDEX IF NOT EXISTS idx_ratings_product_created ON ratings (product_id, created_at)"
+    ]),
+    (7, "Index for the low-stock range query", [
+        "CREATE INDEX IF NOT EXISTS idx_products_stock ON products (stock)"
+    ])
+]
+
+def get_schema_version():
+    """Get the highest migration version applied to the database."""
+    with db_connection() as conn:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+        ).fetchone()
+        
+        if not exists:
+            return 0
+        
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def run_migrations():
+    """Apply every migration newer than the database's schema version.
+    
+    Each migration runs in its own IMMEDIATE transaction, so concurrent app
+    processes starting at once apply it exactly one time.
+    """
+    current_version = get_schema_version()
+    applied = []
+    
+    for version, description, steps in MIGRATIONS:
+        if version <= current_version:
+            continue
+        
+        with db_transaction(immediate=True) as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+            ''')
+            
+            # Another process may have applied it since we looked
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+                continue
+            
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now())
+            )
+            applied.append(version)
+    
+    # Migrations may have added full-text indexes
+    _fts_tables.pop(DB_FILE, None)
+    return applied
+
+# Database file already initialized by this process
+_initialized_db_file = None
+
+def initialize_database():
+    """Initialize the SQLite database if it doesn't exist."""
+    global _initialized_db_file
+    
+    # Nothing to do on reruns once this process has set up the database
+    if _initialized_db_file == DB_FILE:
+        return
+    
+    # Check if database file exists (an in-memory database exists once it has tables)
+    if DB_FILE == MEMORY_DB:
+        with db_connection() as conn:
+            db_exists = _has_table(conn, "users")
+    else:
+        db_exists = os.path.exists(DB_FILE)
+    
+    # Borrow a pooled connection (will create the database if it doesn't exist)
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+        
+        if not db_exists:
+            # Create users table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                username TEXT UNIQUE NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                is_admin BOOLEAN NOT NULL,
+                created_at TIMESTAMP NOT NULL
+            )
+            ''')
+            
+            # Create products table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                price REAL NOT NULL,
+                description TEXT,
+                stock INTEGER NOT NULL,
+                created_at TIMESTAMP NOT NULL
+            )
+            ''')
+            
+            # Create orders table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                total_price REAL NOT NULL,
+                status TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                FOREIGN KEY (product_id) REFERENCES products (id)
+            )
+            ''')
+            
+            # Create complaints table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS complaints (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                order_id INTEGER NOT NULL,
+                subject TEXT NOT NULL,
+                description TEXT NOT NULL,
+                status TEXT NOT NULL,
+                admin_response TEXT,
+                created_at TIMESTAMP NOT NULL,
+                updated_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                FOREIGN KEY (order_id) REFERENCES orders (id)
+            )
+            ''')
+            
+            # Create ratings table
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ratings (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                rating INTEGER NOT NULL,
+                review TEXT,
+                created_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                FOREIGN KEY (product_id) REFERENCES products (id)
+            )
+            ''')
+            
+            # Insert admin user
+            admin_password = hashlib.sha256('admin'.encode()).hexdigest()
+            cursor.execute('''
+            INSERT INTO users (username, email, password, is_admin, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ''', ('admin', 'admin@example.com', admin_password, True, datetime.now()))
+            
+            # Insert sample products
+            sample_products = [
+                (1, "Laptop Pro", "Electronics", 1299.99, "High-performance laptop for professionals", 15, datetime.now()),
+                (2, "Smartphone X", "Electronics", 999.99, "Latest smartphone with advanced features", 25, datetime.now()),
+                (3, "Tablet Air", "Electronics", 499.99, "Lightweight tablet for entertainment and productivity", 20, datetime.now()),
+                (4, "Wireless Headphones", "Audio", 249.99, "Noise-cancelling wireless headphones", 30, datetime.now()),
+                (5, "Smart Watch", "Wearables", 349.99, "Smart watch with health monitoring features", 18, datetime.now()),
+                (6, "4K Monitor", "Computer Accessories", 399.99, "Ultra HD 4K monitor for crisp visuals", 10, datetime.now()),
+                (7, "Gaming Mouse", "Computer Accessories", 79.99, "High-precision gaming mouse", 45, datetime.now()),
+                (8, "Mechanical Keyboard", "Computer Accessories", 129.99, "RGB mechanical keyboard with custom switches", 25, datetime.now()),
+                (9, "Bluetooth Speaker", "Audio", 149.99, "Portable Bluetooth speaker with deep bass", 30, datetime.now()),
+                (10, "External SSD", "Storage", 199.99, "1TB External SSD with high-speed transfer", 20, datetime.now()),
+                (11, "Wireless Charger", "Accessories", 59.99, "Fast wireless charger compatible with all devices", 35, datetime.now()),
+                (12, "USB Hub", "Computer Accessories", 49.99, "Multi-port USB hub with pass-through charging", 40, datetime.now()),
+                (13, "Power Bank", "Accessories", 89.99, "20,000mAh power bank for multiple charges", 50, datetime.now()),
+                (14, "Camera DSLR", "Photography", 799.99, "Professional DSLR camera with 24MP sensor", 12, datetime.now()),
+                (15, "Fitness Tracker", "Wearables", 129.99, "Water-resistant fitness tracker with heart rate monitor", 25, datetime.now()),
+                (16, "Smart Home Hub", "Smart Home", 199.99, "Central hub for all smart home devices", 15, datetime.now()),
+                (17, "Wireless Router", "Networking", 149.99, "High-speed wireless router with wide coverage", 20, datetime.now()),
+                (18, "Portable Printer", "Office", 179.99, "Compact portable printer for documents and photos", 18, datetime.now()),
+                (19, "VR Headset", "Entertainment", 399.99, "Immersive virtual reality headset", 10, datetime.now()),
+                (20, "Drone Pro", "Gadgets", 799.99, "4K camera drone with 30-minute flight time", 8, datetime.now())
+            ]
+            
+            cursor.executemany('''
+            INSERT INTO products (id, name, category, price, description, stock, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', sample_products)
+    
+    # Bring the schema of new and existing databases up to date
+    run_migrations()
+    
+    # Keep the WAL from growing without bound between automatic checkpoints
+    start_checkpoint_scheduler()
+    
+    _initialized_db_file = DB_FILE
+
+def get_db_connection(db_file=None):
+    """Open a new connection to the SQLite database."""
+    db_file = db_file or DB_FILE
+    memory = db_file == MEMORY_DB
+    
+    conn = sqlite3.connect(
+        MEMORY_DB_URI if memory else db_file,
+        uri=memory,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        isolation_level=None,  # Transactions are managed explicitly by db_transaction()
+        check_same_thread=False,  # Pooled connections are handed between script threads
+        factory=instrumentation.InstrumentedConnection if instrumentation.ENABLED else sqlite3.Connection
+    )
+    conn.row_factory = sqlite3.Row  # This enables column access by name
+    apply_storage_profile(conn)
+    return conn
+
+def apply_storage_profile(conn, profile=None):
+    """Apply a named storage profile's PRAGMA settings to a connection."""
+    profile = profile or STORAGE_PROFILE
+    
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile}")
+    
+    settings = STORAGE_PROFILES[profile]
+    
+    conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {int(settings['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {settings['temp_store']}")
+    conn.execute(f"PRAGMA busy_timeout = {int(settings['busy_timeout'])}")
+    conn.execute(f"PRAGMA wal_autocheckpoint = {int(settings['wal_autocheckpoint'])}")
+
+def get_storage_profile():
+    """Report the active storage profile and the settings SQLite actually reports back."""
+    with db_connection() as conn:
+        # Pragmas that don't apply (e.g. mmap_size for an in-memory database) report nothing
+        active = {
+            pragma: (conn.execute(f"PRAGMA {pragma}").fetchone() or [None])[0]
+            for pragma in ["journal_mode", "synchronous", "cache_size", "mmap_size",
+                           "temp_store", "busy_timeout", "wal_autocheckpoint"]
+        }
+    
+    return {
+        "name": STORAGE_PROFILE,
+        "configured": dict(STORAGE_PROFILES[STORAGE_PROFILE]),
+        "active": active
+    }
+
+def checkpoint_wal(mode="PASSIVE"):
+    """Copy committed WAL frames back into the database file.
+    
+    PASSIVE never blocks readers or writers; TRUNCATE also resets the WAL file to zero bytes.
+    """
+    mode = mode.upper()
+    
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Unknown checkpoint mode: {mode}")
+    
+    with db_connection() as conn:
+        busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    
+    return {"busy": bool(busy), "log_frames": log_frames, "checkpointed_frames": checkpointed}
+
+_checkpoint_thread = None
+_checkpoint_stop = threading.Event()
+
+def _run_checkpoints(interval):
+    """Background loop that checkpoints the WAL every interval seconds."""
+    while not _checkpoint_stop.wait(interval):
+        try:
+            checkpoint_wal("PASSIVE")
+        except sqlite3.Error:
+            # A busy database just means we try again next time
+            pass
+
+def start_checkpoint_scheduler(interval=None):
+    """Start the background WAL checkpoint thread (once per process)."""
+    global _checkpoint_thread
+    
+    if interval is None:
+        interval = STORAGE_PROFILES[STORAGE_PROFILE]["checkpoint_interval"]
+    
+    # An in-memory database has no WAL to checkpoint
+    if DB_FILE == MEMORY_DB or not interval or (_checkpoint_thread is not None and _checkpoint_thread.is_alive()):
+        return False
+    
+    _checkpoint_stop.clear()
+    _checkpoint_thread = threading.Thread(
+        target=_run_checkpoints, args=(interval,), name="crm-wal-checkpoint", daemon=True
+    )
+    _checkpoint_thread.start()
+    return True
+
+def stop_checkpoint_scheduler():
+    """Stop the background WAL checkpoint thread."""
+    global _checkpoint_thread
+    
+    _checkpoint_stop.set()
+    
+    if _checkpoint_thread is not None:
+        _checkpoint_thread.join()
+        _checkpoint_thread = None
+
+class WriteBehindQueue:
+    """A background writer that commits queued writes in groups, one transaction per batch.
+    
+    A batch is committed when it reaches batch_size writes or interval seconds
+    after its first write arrived. Each write runs in its own savepoint, so one
+    failing write does not undo the rest of its batch. submit() returns a Future
+    that resolves to the write's (success, result) once the batch has committed.
+    """
+    
+    def __init__(self, batch_size=WRITE_BEHIND_BATCH_SIZE, interval=WRITE_BEHIND_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = Queue()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            "writes": 0, "failed": 0, "batches": 0, "max_batch": 0,
+            "queue_ms": 0.0, "max_queue_ms": 0.0, "commit_ms": 0.0
+        }
+        self._thread = threading.Thread(target=self._run, name="crm-write-behind", daemon=True)
+        self._thread.start()
+    
+    def submit(self, operation, *args):
+        """Queue operation(*args) and return a Future of its (success, result)."""
+        future = Future()
+        
+        # Checked under the lock so nothing can be queued after the writer's last look
+        with self._lock:
+            if self._stopping.is_set():
+                raise RuntimeError("The write-behind queue has been stopped")
+            
+            self._queue.put((operation, args, future, time.perf_counter()))
+        
+        return future
+    
+    def _next_batch(self):
+        """Wait for a first write, then gather more until the batch is full or the interval is up."""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except Empty:
+            return []
+        
+        deadline = time.perf_counter() + self.interval
+        
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except Empty:
+                break
+        
+        return batch
+    
+    def _commit(self, batch):
+        """Run every write of a batch inside one IMMEDIATE transaction and return their results."""
+        results = []
+        
+        with db_transaction(immediate=True):
+            for operation, args, _, _ in batch:
+                try:
+                    results.append(operation(*args))
+                except Exception as e:
+                    results.append((False, str(e)))
+        
+        return results
+    
+    def _run(self):
+        # Keep going after a stop request until everything already queued is written
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            
+            if not batch:
+                continue
+            
+            started = time.perf_counter()
+            
+            try:
+                # A failed batch was rolled back as a whole, so it can be run again
+                results = _retry_on_busy(lambda: self._commit(batch))
+            except Exception as e:
+                results = [(False, str(e))] * len(batch)
+            
+            committed = time.perf_counter()
+            queue_ms = [(committed - enqueued) * 1000 for _, _, _, enqueued in batch]
+            
+            with self._lock:
+                self._stats["writes"] += len(batch)
+                self._stats["failed"] += sum(1 for success, _ in results if not success)
+                self._stats["batches"] += 1
+                self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+                self._stats["queue_ms"] += sum(queue_ms)
+                self._stats["max_queue_ms"] = max(self._stats["max_queue_ms"], max(queue_ms))
+                self._stats["commit_ms"] += (committed - started) * 1000
+            
+            # Results are only handed out once they are durable
+            for (_, _, future, _), result in zip(batch, results):
+                future.set_result(result)
+                self._queue.task_done()
+    
+    def flush(self):
+        """Wait until every write queued so far has been committed."""
+        self._queue.join()
+    
+    def stop(self):
+        """Write out everything still queued and stop the writer thread."""
+        with self._lock:
+            self._stopping.set()
+        
+        self._thread.join()
+    
+    def stats(self):
+        """Return a snapshot of the batching and latency counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        
+        stats["pending"] = self._queue.qsize()
+        stats["mean_batch"] = stats["writes"] / stats["batches"] if stats["batches"] else 0.0
+        stats["mean_queue_ms"] = stats["queue_ms"] / stats["writes"] if stats["writes"] else 0.0
+        stats["mean_commit_ms"] = stats["commit_ms"] / stats["batches"] if stats["batches"] else 0.0
+        stats["batch_size"] = self.batch_size
+        stats["interval"] = self.interval
+        return stats
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+def start_write_behind(batch_size=WRITE_BEHIND_BATCH_SIZE, interval=WRITE_BEHIND_INTERVAL):
+    """Start the write-behind queue (once per process); it is flushed when the process exits."""
+    global _write_queue
+    
+    with _write_queue_lock:
+        if _write_queue is not None:
+            return False
+        
+        _write_queue = WriteBehindQueue(batch_size, interval)
+    
+    atexit.register(stop_write_behind)
+    return True
+
+def stop_write_behind():
+    """Commit everything still queued and stop the write-behind queue."""
+    global _write_queue
+    
+    with _write_queue_lock:
+        write_queue, _write_queue = _write_queue, None
+    
+    if write_queue is not None:
+        write_queue.stop()
+
+def flush_write_behind():
+    """Wait until every queued write has been committed."""
+    write_queue = _write_queue
+    
+    if write_queue is not None:
+        write_queue.flush()
+
+def get_write_behind_stats():
+    """Get the write-behind queue's batch and latency counters, or None when it is off."""
+    write_queue = _write_queue
+    return write_queue.stats() if write_queue is not None else None
+
+def _write(operation, *args, wait=True):
+    """Run a low-criticality write now, or through the write-behind queue when it is on.
+    
+    With wait=False a Future of (success, result) is returned instead of the result.
+    """
+    if WRITE_BEHIND and _write_queue is None:
+        start_write_behind()
+    
+    write_queue = _write_queue
+    
+    # Inside a transaction the caller's own commit decides, and waiting on the queue could deadlock
+    if write_queue is None or _in_transaction():
+        result = operation(*args)
+        
+        if wait:
+            return result
+        
+        future = Future()
+        future.set_result(result)
+        return future
+    
+    future = write_queue.submit(operation, *args)
+    return future.result() if wait else future
+
+def _read_table(table):
+    """Read a whole table into a DataFrame."""
+    with db_connection() as conn:
+        return pd.read_sql_query(f"SELECT * FROM {table}", conn)
+
+def get_all_users():
+    """Get all users from the database."""
+    return _versioned_snapshot("users", ["users"], lambda: _read_table("users"))
+
+def get_all_products():
+    """Get all products from the database."""
+    return _versioned_snapshot("products", ["products"], lambda: _read_table("products"))
+
+def get_all_orders():
+    """Get all orders from the database."""
+    return _versioned_snapshot("orders", ["orders"], lambda: _read_table("orders"))
+
+def get_all_complaints():
+    """Get all complaints from the database."""
+    return _versioned_snapshot("complaints", ["complaints"], lambda: _read_table("complaints"))
+
+def get_all_ratings():
+    """Get all ratings from the database."""
+    return _versioned_snapshot("ratings", ["ratings"], lambda: _read_table("ratings"))
+
+def get_product_filter_options():
+    """Get the product categories and price range used by the search filters."""
+    def load():
+        with db_connection() as conn:
+            categories = [row[0] for row in conn.execute("SELECT DISTINCT category FROM products ORDER BY category")]
+            min_price, max_price = conn.execute("SELECT MIN(price), MAX(price) FROM products").fetchone()
+        
+        return {"categories": categories, "min_price": min_price or 0.0, "max_price": max_price or 0.0}
+    
+    return _versioned_snapshot("product_filter_options", ["products"], load)
+
+def export_table_csv(table, path=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream a table to a CSV file a chunk at a time and return the file's path.
+    
+    Without a path the CSV goes to a new temporary file, which the caller owns.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix=f"{table}_", suffix=".csv")
+        os.close(handle)
+    
+    with db_connection() as conn, open(path, "w", newline="", encoding="utf-8") as csv_file:
+        cursor = conn.execute(f"SELECT * FROM {table} ORDER BY id")
+        writer = csv.writer(csv_file)
+        writer.writerow(column[0] for column in cursor.description)
+        
+        # Only one chunk of rows is held in memory at a time
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            
+            if not rows:
+                break
+            
+            writer.writerows(rows)
+    
+    return path
+
+def get_user_by_username(username):
+    """Get a user by username."""
+    with db_connection() as conn:
+        user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+    return dict(user) if user else None
+
+def _get_row_by_id(table, row_id):
+    """Get one row of a table by ID, through the table's entity cache."""
+    if row_id is None:
+        return None
+    
+    # Inside a transaction the cache may not reflect our own uncommitted writes,
+    # and what we read may still be rolled back, so go straight to the database
+    cache = None if _in_transaction() else _entity_caches[table]
+    row_id = int(row_id)
+    
+    if cache is not None:
+        hit, row = cache.get(row_id)
+        
+        if hit:
+            return row
+        
+        generation = cache.generation
+    
+    with db_connection() as conn:
+        row = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (row_id,)).fetchone()
+    
+    if not row:
+        return None
+    
+    row = dict(row)
+    
+    if cache is not None:
+        cache.put(row_id, row, generation)
+    
+    return row
+
+def get_user_by_id(user_id):
+    """Get a user by ID."""
+    return _get_row_by_id("users", user_id)
+
+def get_product_by_id(product_id):
+    """Get a product by ID."""
+    return _get_row_by_id("products", product_id)
+
+def get_order_by_id(order_id):
+    """Get an order by ID."""
+    return _get_row_by_id("orders", order_id)
+
+def get_complaint_by_id(complaint_id):
+    """Get a complaint by ID."""
+    return _get_row_by_id("complaints", complaint_id)
+
+def _get_rows_by_ids(table, ids):
+    """Get rows of a table by ID in one round trip, as a dict keyed by ID."""
+    # Bypass the cache inside a transaction, as in _get_row_by_id
+    cache = None if _in_transaction() else _entity_caches[table]
+    
+    # Drop missing and repeated IDs (and turn numpy integers into plain ints)
+    unique_ids = list(dict.fromkeys(int(row_id) for row_id in ids if not pd.isna(row_id)))
+    rows = {}
+    missing_ids = []
+    
+    # Serve what we can from the cache
+    for row_id in unique_ids:
+        hit, row = cache.get(row_id) if cache is not None else (False, None)
+        
+        if hit:
+            rows[row_id] = row
+        else:
+            missing_ids.append(row_id)
+    
+    if not missing_ids:
+        return rows
+    
+    generation = cache.generation if cache is not None else None
+    
+    with db_connection() as conn:
+        # Stay under SQLite's limit on bound parameters per statement
+        for start in range(0, len(missing_ids), MAX_IN_PARAMS):
+            chunk = missing_ids[start:start + MAX_IN_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            
+            for row in conn.execute(f"SELECT * FROM {table} WHERE id IN ({placeholders})", chunk):
+                rows[row["id"]] = dict(row)
+                
+                if cache is not None:
+                    cache.put(row["id"], row, generation)
+    
+    return rows
+
+def get_users_by_ids(user_ids):
+    """Get users by ID, as a dict keyed by user ID."""
+    return _get_rows_by_ids("users", user_ids)
+
+def get_products_by_ids(product_ids):
+    """Get products by ID, as a dict keyed by product ID."""
+    return _get_rows_by_ids("products", product_ids)
+
+def get_orders_by_ids(order_ids):
+    """Get orders by ID, as a dict keyed by order ID."""
+    return _get_rows_by_ids("orders", order_ids)
+
+# Complaints joined with the username, order and product name the admin views show
+_COMPLAINTS_DETAILED_SQL = '''
+    SELECT c.*, u.username, o.product_id, o.quantity AS order_quantity,
+           o.total_price AS order_total, p.name AS product_name
+    FROM complaints c
+    JOIN users u ON u.id = c.user_id
+    JOIN orders o ON o.id = c.order_id
+    JOIN products p ON p.id = o.product_id
+'''
+
+def _complaint_filters(status=None, search_query=None):
+    """Build the WHERE conditions and parameters for the complaint filters."""
+    where = []
+    params = []
+    
+    full_text = False
+    
+    # Apply subject/description search if provided
+    if search_query:
+        match_query = _fts_match_query(search_query)
+        condition = _fts_condition("complaints", "c.id", match_query)
+        
+        if condition:
+            where.append(condition)
+            params.append(match_query)
+            full_text = True
+        else:
+            where.append("(LOWER(c.subject) LIKE ? OR LOWER(c.description) LIKE ?)")
+            query_param = f"%{search_query.lower()}%"
+            params.extend([query_param, query_param])
+    
+    # Apply status filter if provided (as a plain filter over full-text matches)
+    if status and status != "All":
+        where.append("+c.status = ?" if full_text else "c.status = ?")
+        params.append(status)
+    
+    return where, params
+
+def get_complaints_detailed(status=None, search_query=None, limit=None):
+    """Get complaints with their username, order and product name, newest first."""
+    where, params = _complaint_filters(status, search_query)
+    sql_query = _COMPLAINTS_DETAILED_SQL
+    
+    if where:
+        sql_query += " WHERE " + " AND ".join(where)
+    
+    sql_query += " ORDER BY c.created_at DESC, c.id DESC"
+    
+    if limit is not None:
+        sql_query += " LIMIT ?"
+        params.append(int(limit))
+    
+    with db_connection() as conn:
+        return pd.read_sql_query(sql_query, conn, params=params)
+
+def get_recent_orders(limit=5):
+    """Get the most recent orders with their username and product name."""
+    with db_connection() as conn:
+        return pd.read_sql_query('''
+        SELECT o.*, u.username, p.name AS product_name
+        FROM (SELECT * FROM orders ORDER BY created_at DESC, id DESC LIMIT ?) o
+        JOIN users u ON u.id = o.user_id
+        JOIN products p ON p.id = o.product_id
+        ORDER BY o.created_at DESC, o.id DESC
+        ''', conn, params=(int(limit),))
+
+def get_recent_complaints(limit=5):
+    """Get the most recent complaints with their username."""
+    with db_connection() as conn:
+        return pd.read_sql_query('''
+        SELECT c.*, u.username
+        FROM (SELECT * FROM complaints ORDER BY created_at DESC, id DESC LIMIT ?) c
+        JOIN users u ON u.id = c.user_id
+        ORDER BY c.created_at DESC, c.id DESC
+        ''', conn, params=(int(limit),))
+
+# Products with fewer units than this are flagged on the admin dashboard
+LOW_STOCK_THRESHOLD = 10
+
+def get_low_stock_products(threshold=LOW_STOCK_THRESHOLD):
+    """Get products with less than threshold units in stock, lowest stock first."""
+    with db_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM products WHERE stock < ? ORDER BY stock, id",
+                                 conn, params=(int(threshold),))
+
+def get_dashboard_counts():
+    """Count customers, products, orders and open complaints in one statement."""
+    with db_connection() as conn:
+        counts = conn.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM users WHERE is_admin = 0) AS customers,
+            (SELECT COUNT(*) FROM products) AS products,
+            (SELECT COUNT(*) FROM orders) AS orders,
+            (SELECT COUNT(*) FROM complaints WHERE status = 'Pending') AS open_complaints
+        ''').fetchone()
+    
+    return dict(counts)
+
+def get_dashboard_summary(recent_limit=5, low_stock_threshold=LOW_STOCK_THRESHOLD):
+    """Get everything the admin dashboard shows: counters, recent activity and low stock."""
+    def load():
+        # The four reads are independent, so they run at the same time
+        results = load_parallel(
+            counts=get_dashboard_counts,
+            recent_orders=lambda: get_recent_orders(recent_limit),
+            recent_complaints=lambda: get_recent_complaints(recent_limit),
+            low_stock=lambda: get_low_stock_products(low_stock_threshold)
         )
-        ''')
-        
-        # Insert admin user
-        admin_password = hashlib.sha256('admin'.encode()).hexdigest()
-        cursor.execute('''
-        INSERT INTO users (username, email, password, is_admin, created_at)
-        VALUES (?, ?, ?, ?, ?)
-        ''', ('admin', 'admin@example.com', admin_password, True, datetime.now()))
-        
-        # Insert sample products
-        sample_products = [
-            (1, "Laptop Pro", "Electronics", 1299.99, "High-performance laptop for professionals", 15, datetime.now()),
-            (2, "Smartphone X", "Electronics", 999.99, "Latest smartphone with advanced features", 25, datetime.now()),
-            (3, "Tablet Air", "Electronics", 499.99, "Lightweight tablet for entertainment and productivity", 20, datetime.now()),
-            (4, "Wireless Headphones", "Audio", 249.99, "Noise-cancelling wireless headphones", 30, datetime.now()),
-            (5, "Smart Watch", "Wearables", 349.99, "Smart watch with health monitoring features", 18, datetime.now()),
-            (6, "4K Monitor", "Computer Accessories", 399.99, "Ultra HD 4K monitor for crisp visuals", 10, datetime.now()),
-            (7, "Gaming Mouse", "Computer Accessories", 79.99, "High-precision gaming mouse", 45, datetime.now()),
-            (8, "Mechanical Keyboard", "Computer Accessories", 129.99, "RGB mechanical keyboard with custom switches", 25, datetime.now()),
-            (9, "Bluetooth Speaker", "Audio", 149.99, "Portable Bluetooth speaker with deep bass", 30, datetime.now()),
-            (10, "External SSD", "Storage", 199.99, "1TB External SSD with high-speed transfer", 20, datetime.now()),
-            (11, "Wireless Charger", "Accessories", 59.99, "Fast wireless charger compatible with all devices", 35, datetime.now()),
-            (12, "USB Hub", "Computer Accessories", 49.99, "Multi-port USB hub with pass-through charging", 40, datetime.now()),
-            (13, "Power Bank", "Accessories", 89.99, "20,000mAh power bank for multiple charges", 50, datetime.now()),
-            (14, "Camera DSLR", "Photography", 799.99, "Professional DSLR camera with 24MP sensor", 12, datetime.now()),
-            (15, "Fitness Tracker", "Wearables", 129.99, "Water-resistant fitness tracker with heart rate monitor", 25, datetime.now()),
-            (16, "Smart Home Hub", "Smart Home", 199.99, "Central hub for all smart home devices", 15, datetime.now()),
-            (17, "Wireless Router", "Networking", 149.99, "High-speed wireless router with wide coverage", 20, datetime.now()),
-            (18, "Portable Printer", "Office", 179.99, "Compact portable printer for documents and photos", 18, datetime.now()),
-            (19, "VR Headset", "Entertainment", 399.99, "Immersive virtual reality headset", 10, datetime.now()),
-            (20, "Drone Pro", "Gadgets", 799.99, "4K camera drone with 30-minute flight time", 8, datetime.now())
-        ]
-        
-        cursor.executemany('''
-        INSERT INTO products (id, name, category, price, description, stock, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', sample_products)
-        
-        # Commit the changes
-        conn.commit()
-    
-    # Close the connection
-    conn.close()
-
-def get_db_connection():
-    """Get a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    return conn
+        summary = results.pop("counts")
+        summary.update(results)
+        return summary
+    
+    return _versioned_snapshot(
+        f"dashboard_summary:{recent_limit}:{low_stock_threshold}",
+        ("users", "products", "orders", "complaints"),
+        load
+    )
 
-def get_all_users():
-    """Get all users from the database."""
-    conn = get_db_connection()
-    users = pd.read_sql_query("SELECT * FROM users", conn)
-    conn.close()
-    return users
+def _sql_value(value):
+    """Turn a pandas/numpy scalar from a DataFrame row back into a value sqlite3 can bind."""
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    
+    if hasattr(value, "item"):
+        return value.item()
+    
+    return value
 
-def get_all_products():
-    """Get all products from the database."""
-    conn = get_db_connection()
-    products = pd.read_sql_query("SELECT * FROM products", conn)
-    conn.close()
-    return products
+def _fetch_page(select_sql, where, params, order_columns, descending, cursor, page_size):
+    """Run a keyset-paginated query.
+    
+    Returns one page of rows and the cursor for the next page (None on the last
+    page). The cursor holds the order_columns values of the page's last row, so
+    each page is an index range scan instead of an ever-growing OFFSET.
+    """
+    where = list(where)
+    params = list(params)
+    
+    if cursor is not None:
+        columns = ", ".join(order_columns)
+        placeholders = ", ".join("?" * len(order_columns))
+        where.append(f"({columns}) {'<' if descending else '>'} ({placeholders})")
+        params.extend(_sql_value(value) for value in cursor)
+    
+    sql_query = select_sql
+    
+    if where:
+        sql_query += " WHERE " + " AND ".join(where)
+    
+    direction = " DESC" if descending else ""
+    sql_query += " ORDER BY " + ", ".join(column + direction for column in order_columns)
+    
+    # Read one extra row to find out whether there is a next page
+    sql_query += " LIMIT ?"
+    params.append(int(page_size) + 1)
+    
+    with db_connection() as conn:
+        page = pd.read_sql_query(sql_query, conn, params=params)
+    
+    if len(page) <= page_size:
+        return page, None
+    
+    page = page.iloc[:page_size]
+    last_row = page.iloc[-1]
+    next_cursor = tuple(_sql_value(last_row[column.split(".")[-1]]) for column in order_columns)
+    return page, next_cursor
 
-def get_all_orders():
-    """Get all orders from the database."""
-    conn = get_db_connection()
-    orders = pd.read_sql_query("SELECT * FROM orders", conn)
-    conn.close()
-    return orders
+def _count_rows(from_sql, where, params):
+    """Count the rows matching a set of WHERE conditions."""
+    sql_query = f"SELECT COUNT(*) FROM {from_sql}"
+    
+    if where:
+        sql_query += " WHERE " + " AND ".join(where)
+    
+    with db_connection() as conn:
+        return conn.execute(sql_query, params).fetchone()[0]
 
-def get_all_complaints():
-    """Get all complaints from the database."""
-    conn = get_db_connection()
-    complaints = pd.read_sql_query("SELECT * FROM complaints", conn)
-    conn.close()
-    return complaints
+def _user_filters(search_query=None, include_admins=False):
+    """Build the WHERE conditions and parameters for the user listing."""
+    where = []
+    params = []
+    
+    full_text = False
+    
+    if search_query:
+        search_query = search_query.strip()
+        
+        # Trigram matching needs at least three characters
+        match_query = _fts_substring_query(search_query) if len(search_query) >= 3 else None
+        condition = _fts_condition("users", "id", match_query)
+        
+        if condition:
+            where.append(condition)
+            params.append(match_query)
+            full_text = True
+        else:
+            where.append("(LOWER(username) LIKE ? OR LOWER(email) LIKE ?)")
+            query_param = f"%{search_query.lower()}%"
+            params.extend([query_param, query_param])
+    
+    if not include_admins:
+        # With a full-text match, drive the query from the (few) matching ids;
+        # the unary + keeps SQLite from scanning idx_users_admin_created instead
+        where.append("+is_admin = 0" if full_text else "is_admin = 0")
+    
+    return where, params
 
-def get_all_ratings():
-    """Get all ratings from the database."""
-    conn = get_db_connection()
-    ratings = pd.read_sql_query("SELECT * FROM ratings", conn)
-    conn.close()
-    return ratings
+def get_users_page(cursor=None, page_size=PAGE_SIZE, search_query=None, include_admins=False):
+    """Get one page of users, newest first, and the cursor for the next page."""
+    where, params = _user_filters(search_query, include_admins)
+    return _fetch_page("SELECT * FROM users", where, params, ["created_at", "id"], True, cursor, page_size)
 
-def get_user_by_username(username):
-    """Get a user by username."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
-    conn.close()
-    return dict(user) if user else None
+def count_users(search_query=None, include_admins=False):
+    """Count the users matching the listing filters."""
+    where, params = _user_filters(search_query, include_admins)
+    return _count_rows("users", where, params)
 
-def get_user_by_id(user_id):
-    """Get a user by ID."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return dict(user) if user else None
+def _product_filters(category=None, name_query=None):
+    """Build the WHERE conditions and parameters for the product listing."""
+    where = []
+    params = []
+    
+    if category and category != "All Categories":
+        where.append("category = ?")
+        params.append(category)
+    
+    if name_query:
+        where.append("LOWER(name) LIKE ?")
+        params.append(f"%{name_query.lower()}%")
+    
+    return where, params
 
-def get_product_by_id(product_id):
-    """Get a product by ID."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-    product = cursor.fetchone()
-    conn.close()
-    return dict(product) if product else None
+def get_products_page(cursor=None, page_size=PAGE_SIZE, category=None, name_query=None):
+    """Get one page of products ordered by name, and the cursor for the next page."""
+    where, params = _product_filters(category, name_query)
+    return _fetch_page("SELECT * FROM products", where, params, ["name", "id"], False, cursor, page_size)
 
-def get_order_by_id(order_id):
-    """Get an order by ID."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM orders WHERE id = ?", (order_id,))
-    order = cursor.fetchone()
-    conn.close()
-    return dict(order) if order else None
+def count_products(category=None, name_query=None):
+    """Count the products matching the listing filters."""
+    where, params = _product_filters(category, name_query)
+    return _count_rows("products", where, params)
 
-def get_complaint_by_id(complaint_id):
-    """Get a complaint by ID."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM complaints WHERE id = ?", (complaint_id,))
-    complaint = cursor.fetchone()
-    conn.close()
-    return dict(complaint) if complaint else None
+def get_orders_page(user_id=None, cursor=None, page_size=PAGE_SIZE):
+    """Get one page of orders (optionally for one user), newest first, and the next cursor."""
+    where, params = (["user_id = ?"], [int(user_id)]) if user_id is not None else ([], [])
+    return _fetch_page("SELECT * FROM orders", where, params, ["created_at", "id"], True, cursor, page_size)
+
+def count_orders(user_id=None):
+    """Count all orders, or one user's orders."""
+    where, params = (["user_id = ?"], [int(user_id)]) if user_id is not None else ([], [])
+    return _count_rows("orders", where, params)
+
+def get_complaints_page(status=None, search_query=None, cursor=None, page_size=PAGE_SIZE):
+    """Get one page of detailed complaints, newest first, and the cursor for the next page."""
+    where, params = _complaint_filters(status, search_query)
+    return _fetch_page(_COMPLAINTS_DETAILED_SQL, where, params, ["c.created_at", "c.id"], True, cursor, page_size)
+
+def count_complaints(status=None, search_query=None):
+    """Count the complaints matching the filters."""
+    where, params = _complaint_filters(status, search_query)
+    return _count_rows("complaints c", where, params)
+
+def search_users(query, limit=50, include_admins=False):
+    """Search users by username or email, returning at most limit matches."""
+    where, params = _user_filters(query, include_admins)
+    sql_query = "SELECT * FROM users"
+    
+    if where:
+        sql_query += " WHERE " + " AND ".join(where)
+    
+    sql_query += " ORDER BY username LIMIT ?"
+    params.append(int(limit))
+    
+    with db_connection() as conn:
+        return pd.read_sql_query(sql_query, conn, params=params)
+
+def search_complaints(query, status=None, limit=50):
+    """Search complaints by subject or description, newest first, returning at most limit matches."""
+    return get_complaints_detailed(status, query, limit)
 
 def get_user_orders(user_id):
     """Get all orders for a user."""
-    conn = get_db_connection()
-    orders = pd.read_sql_query("SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC", 
-                               conn, params=(user_id,))
-    conn.close()
-    return orders
+    with db_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC",
+                                 conn, params=(user_id,))
 
 def get_user_complaints(user_id):
     """Get all complaints for a user."""
-    conn = get_db_connection()
-    complaints = pd.read_sql_query("SELECT * FROM complaints WHERE user_id = ? ORDER BY created_at DESC", 
+    with db_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM complaints WHERE user_id = ? ORDER BY created_at DESC",
                                  conn, params=(user_id,))
-    conn.close()
-    return complaints
 
 def get_user_ratings(user_id):
     """Get all ratings for a user."""
-    conn = get_db_connection()
-    ratings = pd.read_sql_query("SELECT * FROM ratings WHERE user_id = ? ORDER BY created_at DESC", 
-                              conn, params=(user_id,))
-    conn.close()
-    return ratings
+    with db_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM ratings WHERE user_id = ? ORDER BY created_at DESC",
+                                 conn, params=(user_id,))
 
-def create_user(username, email, password, is_admin=False):
-    """Create a new user in the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if username or email already exists
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    if cursor.fetchone():
-        conn.close()
-        return False, "Username already exists"
+def get_product_ratings(product_id):
+    """Get all ratings for a product."""
+    with db_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM ratings WHERE product_id = ? ORDER BY created_at DESC",
+                                 conn, params=(product_id,))
+
+def get_product_stats(product_id):
+    """Get units sold, revenue and rating aggregates for a product."""
+    with db_connection() as conn:
+        stats = conn.execute("SELECT * FROM product_stats WHERE product_id = ?", (product_id,)).fetchone()
     
-    cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-    if cursor.fetchone():
-        conn.close()
-        return False, "Email already exists"
+    stats = dict(stats) if stats else {
+        "product_id": product_id, "units_sold": 0, "revenue": 0.0, "rating_count": 0, "rating_total": 0
+    }
+    stats["average_rating"] = stats["rating_total"] / stats["rating_count"] if stats["rating_count"] else None
+    return stats
+
+def rebuild_product_stats():
+    """Recompute the product_stats table from scratch (e.g. after editing orders by hand)."""
+    with db_transaction(immediate=True) as conn:
+        _rebuild_product_stats(conn)
+        return conn.execute("SELECT COUNT(*) FROM product_stats").fetchone()[0]
+
+def after_bulk_restore(conn, tables=TABLES):
+    """Bring derived data and caches in line with tables whose rows were replaced in conn's transaction.
     
-    # Hash the password
-    hashed_password = hashlib.sha256(password.encode()).hexdigest()
+    Product statistics are recomputed rather than trusted from the restored rows,
+    and the caches are dropped once the transaction commits.
+    """
+    for table in tables:
+        mark_changed(table)
     
-    # Insert the new user
+    _rebuild_product_stats(conn)
+    _after_commit(clear_entity_caches)
+
+def create_user(username, email, password, is_admin=False):
+    """Create a new user in the database."""
     try:
-        cursor.execute('''
-        INSERT INTO users (username, email, password, is_admin, created_at)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (username, email, hashed_password, is_admin, datetime.now()))
-        
-        # Get the ID of the newly created user
-        user_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
-        return True, user_id
+        with db_transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Check if username or email already exists
+            cursor.execute("SELECT 1 FROM users WHERE username = ?", (username,))
+            if cursor.fetchone():
+                return False, "Username already exists"
+            
+            cursor.execute("SELECT 1 FROM users WHERE email = ?", (email,))
+            if cursor.fetchone():
+                return False, "Email already exists"
+            
+            # Hash the password
+            hashed_password = hashlib.sha256(password.encode()).hexdigest()
+            
+            # Insert the new user
+            cursor.execute('''
+            INSERT INTO users (username, email, password, is_admin, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ''', (username, email, hashed_password, is_admin, datetime.now()))
+            
+            # Get the ID of the newly created user
+            user_id = cursor.lastrowid
+            mark_changed("users", user_id)
+            
+            return True, user_id
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return False, str(e)
 
 def authenticate_user(username, password):
     """Authenticate a user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Get the user
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
+    user = get_user_by_username(username)
     
     if user:
         # Hash the password and compare
         hashed_password = hashlib.sha256(password.encode()).hexdigest()
         if user['password'] == hashed_password:
-            conn.close()
-            return True, dict(user)
+            return True, user
     
-    conn.close()
     return False, None
 
 def add_order(user_id, product_id, quantity):
     """Add a new order to the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get product information
-    cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-    product = cursor.fetchone()
-    
-    if not product:
-        conn.close()
-        return False, "Product not found"
-    
-    # Check if we have enough stock
-    if product['stock'] < quantity:
-        conn.close()
-        return False, f"Not enough stock. Available: {product['stock']}"
-    
-    # Calculate total price
-    total_price = product['price'] * quantity
+    success, result = place_orders(user_id, [(product_id, quantity)])
+    return (True, result[0]) if success else (False, result)
+
+def place_orders(user_id, items):
+    """Place one order per (product_id, quantity) item, all or nothing, in one transaction.
     
-    # Create new order
+    Returns (True, order IDs in item order) or (False, the reason nothing was ordered).
+    Repeated products are combined into one order.
+    """
     try:
-        cursor.execute('''
-        INSERT INTO orders (user_id, product_id, quantity, total_price, status, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, product_id, quantity, total_price, "Processing", datetime.now()))
-        
-        # Get the ID of the newly created order
-        order_id = cursor.lastrowid
-        
-        # Update product stock
-        cursor.execute('''
-        UPDATE products SET stock = stock - ? WHERE id = ?
-        ''', (quantity, product_id))
-        
-        conn.commit()
-        conn.close()
-        return True, order_id
+        return _retry_on_busy(lambda: _place_orders(user_id, items))
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return False, str(e)
 
-def add_complaint(user_id, order_id, subject, description):
-    """Add a new complaint to the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+class _CheckoutFailed(Exception):
+    """Raised inside the checkout transaction to roll it back with a message for the user."""
+
+def _place_orders(user_id, items):
+    """Validate, take the stock for and record every item of a checkout in one write transaction."""
+    # Combine repeated products, keeping the order they were first added in
+    quantities = {}
     
-    # Check if order exists and belongs to the user
-    cursor.execute("SELECT * FROM orders WHERE id = ? AND user_id = ?", (order_id, user_id))
-    order = cursor.fetchone()
+    for product_id, quantity in items:
+        quantities[int(product_id)] = quantities.get(int(product_id), 0) + int(quantity)
     
-    if not order:
-        conn.close()
-        return False, "Order not found or does not belong to this user"
+    if not quantities:
+        return False, "Nothing to order"
+    
+    if any(quantity < 1 for quantity in quantities.values()):
+        return False, "Quantity must be at least 1"
     
-    # Create new complaint
     try:
-        now = datetime.now()
-        cursor.execute('''
-        INSERT INTO complaints (user_id, order_id, subject, description, status, admin_response, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, order_id, subject, description, "Pending", None, now, now))
-        
-        # Get the ID of the newly created complaint
-        complaint_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
-        return True, complaint_id
-    except Exception as e:
-        conn.rollback()
-        conn.close()
+        # Take the write lock up front so no other checkout can interleave with this one
+        with db_transaction(immediate=True) as conn:
+            products = _get_rows_by_ids("products", quantities)
+            
+            for product_id, quantity in quantities.items():
+                product = products.get(product_id)
+                
+                if product is None:
+                    raise _CheckoutFailed("Product not found")
+                
+                if product['stock'] < quantity:
+                    raise _CheckoutFailed(f"Not enough stock of {product['name']}. Available: {product['stock']}")
+            
+            # Decrement stock only where there is enough of it; the check and the update are one statement
+            cursor = conn.executemany('''
+            UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?
+            ''', [(quantity, product_id, quantity) for product_id, quantity in quantities.items()])
+            
+            if cursor.rowcount != len(quantities):
+                raise _CheckoutFailed("Stock changed during checkout, please try again")
+            
+            # Number the new orders ourselves so executemany can insert them all at once
+            first_order_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM orders").fetchone()[0]
+            order_ids = list(range(first_order_id, first_order_id + len(quantities)))
+            now = datetime.now()
+            
+            orders = [
+                (order_id, user_id, product_id, quantity, products[product_id]['price'] * quantity, "Processing", now)
+                for order_id, (product_id, quantity) in zip(order_ids, quantities.items())
+            ]
+            
+            conn.executemany('''
+            INSERT INTO orders (id, user_id, product_id, quantity, total_price, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', orders)
+            
+            # Keep the products' sales statistics current
+            for _, _, product_id, quantity, total_price, _, _ in orders:
+                _bump_product_stats(conn, product_id, units_sold=quantity, revenue=total_price)
+            
+            mark_changed("products", *quantities)
+            mark_changed("orders", *order_ids)
+    except _CheckoutFailed as e:
         return False, str(e)
-
-def add_rating(user_id, product_id, rating, review):
-    """Add a new product rating to the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if product exists
-    cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-    if not cursor.fetchone():
-        conn.close()
-        return False, "Product not found"
-    
-    # Check if user has already rated this product
-    cursor.execute("SELECT * FROM ratings WHERE user_id = ? AND product_id = ?", (user_id, product_id))
-    existing_rating = cursor.fetchone()
     
+    return True, order_ids
+
+def add_complaint(user_id, order_id, subject, description, wait=True):
+    """Add a new complaint to the database (through the write-behind queue when it is on)."""
+    return _write(_add_complaint, user_id, order_id, subject, description, wait=wait)
+
+def _add_complaint(user_id, order_id, subject, description):
+    """Insert a complaint, on its own or as one write of a write-behind batch."""
     try:
-        if existing_rating:
-            # Update existing rating
+        with db_transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Check if order exists and belongs to the user
+            cursor.execute("SELECT 1 FROM orders WHERE id = ? AND user_id = ?", (order_id, user_id))
+            
+            if not cursor.fetchone():
+                return False, "Order not found or does not belong to this user"
+            
+            # Create new complaint
+            now = datetime.now()
             cursor.execute('''
-            UPDATE ratings SET rating = ?, review = ?, created_at = ?
-            WHERE user_id = ? AND product_id = ?
-            ''', (rating, review, datetime.now(), user_id, product_id))
+            INSERT INTO complaints (user_id, order_id, subject, description, status, admin_response, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, order_id, subject, description, "Pending", None, now, now))
+            
+            # Get the ID of the newly created complaint
+            complaint_id = cursor.lastrowid
+            mark_changed("complaints", complaint_id)
+            
+            return True, complaint_id
+    except Exception as e:
+        return False, str(e)
+
+def add_rating(user_id, product_id, rating, review, wait=True):
+    """Add a new product rating to the database (through the write-behind queue when it is on)."""
+    return _write(_add_rating, user_id, product_id, rating, review, wait=wait)
+
+def _add_rating(user_id, product_id, rating, review):
+    """Insert or update a rating, on its own or as one write of a write-behind batch."""
+    try:
+        with db_transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Check if product exists
+            cursor.execute("SELECT 1 FROM products WHERE id = ?", (product_id,))
+            if not cursor.fetchone():
+                return False, "Product not found"
+            
+            # Check if user has already rated this product
+            cursor.execute("SELECT rating FROM ratings WHERE user_id = ? AND product_id = ?", (user_id, product_id))
+            existing_rating = cursor.fetchone()
+            
+            if existing_rating:
+                # Update existing rating
+                cursor.execute('''
+                UPDATE ratings SET rating = ?, review = ?, created_at = ?
+                WHERE user_id = ? AND product_id = ?
+                ''', (rating, review, datetime.now(), user_id, product_id))
+                
+                # Replace the old score in the product's rating total
+                _bump_product_stats(cursor, product_id, rating_total=rating - existing_rating["rating"])
+                
+                mark_changed("ratings")
+                
+                return True, "Rating updated"
             
-            conn.commit()
-            conn.close()
-            return True, "Rating updated"
-        else:
             # Create new rating
             cursor.execute('''
             INSERT INTO ratings (user_id, product_id, rating, review, created_at)
@@ -410,159 +2062,448 @@ def add_rating(user_id, product_id, rating, review):
             # Get the ID of the newly created rating
             rating_id = cursor.lastrowid
             
-            conn.commit()
-            conn.close()
+            # Add the score to the product's rating aggregates
+            _bump_product_stats(cursor, product_id, rating_count=1, rating_total=rating)
+            
+            mark_changed("ratings", rating_id)
+            
             return True, rating_id
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return False, str(e)
 
-def respond_to_complaint(complaint_id, response):
-    """Update a complaint with admin response."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if complaint exists
-    cursor.execute("SELECT * FROM complaints WHERE id = ?", (complaint_id,))
-    if not cursor.fetchone():
-        conn.close()
-        return False, "Complaint not found"
-    
-    # Update complaint
+def respond_to_complaint(complaint_id, response, wait=True):
+    """Update a complaint with admin response (through the write-behind queue when it is on)."""
+    return _write(_respond_to_complaint, complaint_id, response, wait=wait)
+
+def _respond_to_complaint(complaint_id, response):
+    """Record an admin response, on its own or as one write of a write-behind batch."""
     try:
-        cursor.execute('''
-        UPDATE complaints SET status = ?, admin_response = ?, updated_at = ?
-        WHERE id = ?
-        ''', ("Resolved", response, datetime.now(), complaint_id))
-        
-        conn.commit()
-        conn.close()
-        return True, "Complaint updated"
+        with db_transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Check if complaint exists
+            cursor.execute("SELECT 1 FROM complaints WHERE id = ?", (complaint_id,))
+            if not cursor.fetchone():
+                return False, "Complaint not found"
+            
+            # Update complaint
+            cursor.execute('''
+            UPDATE complaints SET status = ?, admin_response = ?, updated_at = ?
+            WHERE id = ?
+            ''', ("Resolved", response, datetime.now(), complaint_id))
+            
+            mark_changed("complaints", complaint_id)
+            
+            return True, "Complaint updated"
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return False, str(e)
 
+# Relative bm25 weights of the products_fts columns: name, description, category
+PRODUCT_SEARCH_WEIGHTS = (10.0, 1.0, 4.0)
+
 def search_products(query, category=None, min_price=None, max_price=None):
-    """Search for products based on query and filters."""
-    conn = get_db_connection()
-    
-    # Build the query dynamically
-    sql_query = "SELECT * FROM products WHERE 1=1"
+    """Search for products based on query and filters, best matches first."""
+    where = []
     params = []
     
-    # Apply search query if provided
-    if query:
-        sql_query += " AND (LOWER(name) LIKE ? OR LOWER(description) LIKE ?)"
-        query_param = f"%{query.lower()}%"
-        params.extend([query_param, query_param])
-    
     # Apply category filter if provided
     if category and category != "All Categories":
-        sql_query += " AND category = ?"
+        where.append("p.category = ?")
         params.append(category)
     
     # Apply price filters if provided
     if min_price is not None:
-        sql_query += " AND price >= ?"
-        params.append(min_price)
+        where.append("p.price >= ?")
+        params.append(_sql_value(min_price))
     
     if max_price is not None:
-        sql_query += " AND price <= ?"
-        params.append(max_price)
+        where.append("p.price <= ?")
+        params.append(_sql_value(max_price))
     
-    # Execute the query
-    products = pd.read_sql_query(sql_query, conn, params=params)
+    # Trigram matching needs at least three characters
+    query = (query or "").strip()
+    match_query = _fts_substring_query(query) if len(query) >= 3 else None
+    full_text = match_query is not None and "products_fts" in _get_fts_tables()
     
-    conn.close()
-    return products
+    with db_connection() as conn:
+        if full_text:
+            # Ranked full-text search; bm25() is lower for better matches
+            weights = ", ".join(str(weight) for weight in PRODUCT_SEARCH_WEIGHTS)
+            sql_query = f'''
+            SELECT p.* FROM products_fts
+            JOIN products p ON p.id = products_fts.rowid
+            WHERE products_fts MATCH ?{"".join(f" AND {condition}" for condition in where)}
+            ORDER BY bm25(products_fts, {weights}), p.id
+            '''
+            return pd.read_sql_query(sql_query, conn, params=[match_query] + params)
+        
+        if query:
+            # Substring match for short queries and databases without a full-text index
+            where.append("(LOWER(p.name) LIKE ? OR LOWER(p.description) LIKE ? OR LOWER(p.category) LIKE ?)")
+            query_param = f"%{query.lower()}%"
+            params.extend([query_param, query_param, query_param])
+        
+        sql_query = "SELECT p.* FROM products p"
+        
+        if where:
+            sql_query += " WHERE " + " AND ".join(where)
+        
+        return pd.read_sql_query(sql_query + " ORDER BY p.name, p.id", conn, params=params)
 
 def generate_sample_orders():
     """Generate sample orders for testing (only if no orders exist)."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+        
+        # Check if any orders exist
+        cursor.execute("SELECT COUNT(*) FROM orders")
+        order_count = cursor.fetchone()[0]
+        
+        # Check if there are non-admin users
+        cursor.execute("SELECT COUNT(*) FROM users WHERE is_admin = 0")
+        user_count = cursor.fetchone()[0]
+        
+        if order_count == 0 and user_count > 0:
+            # Get non-admin users
+            cursor.execute("SELECT id FROM users WHERE is_admin = 0")
+            user_ids = [row[0] for row in cursor.fetchall()]
+            
+            # Get all products
+            cursor.execute("SELECT id, price FROM products")
+            products = cursor.fetchall()
+            
+            # Get the current date
+            now = datetime.now()
+            
+            # For each user, create 1-3 random orders
+            order_id = 1
+            orders = []
+            sales = {}
+            
+            for user_id in user_ids:
+                num_orders = random.randint(1, 3)
+                
+                for _ in range(num_orders):
+                    # Random product
+                    product = random.choice(products)
+                    product_id = product[0]
+                    product_price = product[1]
+                    
+                    # Random quantity between 1 and 3
+                    quantity = random.randint(1, 3)
+                    
+                    # Calculate total price
+                    total_price = product_price * quantity
+                    
+                    # Random date in the last 90 days
+                    days_ago = random.randint(0, 90)
+                    order_date = now - timedelta(days=days_ago)
+                    
+                    # Random status
+                    status = random.choice(["Delivered", "Processing", "Shipped"])
+                    
+                    orders.append((order_id, user_id, product_id, quantity, total_price, status, order_date))
+                    
+                    # Tally sales per product for the statistics table
+                    units_sold, revenue = sales.get(product_id, (0, 0))
+                    sales[product_id] = (units_sold + quantity, revenue + total_price)
+                    
+                    order_id += 1
+            
+            # Insert all orders in one statement
+            cursor.executemany('''
+            INSERT INTO orders (id, user_id, product_id, quantity, total_price, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', orders)
+            
+            for product_id, (units_sold, revenue) in sales.items():
+                _bump_product_stats(cursor, product_id, units_sold=units_sold, revenue=revenue)
+            
+            mark_changed("orders")
+
+
+def update_product(product_id, name, category, price, stock, description):
+    """Update a product in the database."""
+    try:
+        with db_transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Check if product exists
+            cursor.execute("SELECT 1 FROM products WHERE id = ?", (product_id,))
+            if not cursor.fetchone():
+                return False, "Product not found"
+            
+            # Update product
+            cursor.execute('''
+            UPDATE products SET name = ?, category = ?, price = ?, stock = ?, description = ?
+            WHERE id = ?
+            ''', (name, category, price, stock, description, product_id))
+            
+            mark_changed("products", product_id)
+            
+            return True, "Product updated successfully"
+    except Exception as e:
+        return False, str(e)
+
+def _read_import_chunks(source, chunk_size, file_format=None):
+    """Read a CSV or Parquet file (a path or file-like object) as DataFrames of chunk_size rows."""
+    if file_format is None:
+        name = source if isinstance(source, str) else getattr(source, "name", "")
+        file_format = "parquet" if name.lower().endswith((".parquet", ".pq")) else "csv"
+    
+    if file_format == "parquet":
+        # pyarrow is only needed for Parquet input
+        import pyarrow.parquet as pq
+        
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_size)
+
+def _flag(problems, mask, message):
+    """Record message against the rows in mask that have no problem yet."""
+    problems[mask.fillna(False).astype(bool) & (problems == "")] = message
+
+def _text_column(chunk, column):
+    """Get a column as stripped strings, with blanks and missing values as <NA>."""
+    if column not in chunk:
+        return pd.Series(pd.NA, index=chunk.index, dtype="string")
+    
+    values = chunk[column].astype("string").str.strip()
+    return values.mask(values == "")
+
+def _number_column(chunk, column, default=None):
+    """Get a column as numbers, with unparseable values as NaN."""
+    if column not in chunk:
+        return pd.Series(default, index=chunk.index, dtype="float64")
     
-    # Check if any orders exist
-    cursor.execute("SELECT COUNT(*) FROM orders")
-    order_count = cursor.fetchone()[0]
+    values = pd.to_numeric(chunk[column], errors="coerce")
+    return values.fillna(default) if default is not None else values
+
+# A time of day followed by a timezone: "Z", "UTC", "+02", "+02:00", "-0500"
+_TIMEZONE_SUFFIX = re.compile(r"\d:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:[zZ]|UTC|GMT|[+-]\d{2}(?::?\d{2})?)$")
+
+def _timestamp_column(chunk, column, problems):
+    """Get a column as timestamps, defaulting missing ones to now and flagging bad ones."""
+    now = pd.Timestamp(datetime.now())
     
-    # Check if there are non-admin users
-    cursor.execute("SELECT COUNT(*) FROM users WHERE is_admin = 0")
-    user_count = cursor.fetchone()[0]
+    if column not in chunk:
+        return pd.Series(now, index=chunk.index)
     
-    if order_count == 0 and user_count > 0:
-        # Get non-admin users
-        cursor.execute("SELECT id FROM users WHERE is_admin = 0")
-        user_ids = [row[0] for row in cursor.fetchall()]
-        
-        # Get all products
-        cursor.execute("SELECT id, price FROM products")
-        products = cursor.fetchall()
+    # The app stores naive local times (datetime.now()), so values with a
+    # timezone are converted to local time and naive ones are kept as they are
+    raw = chunk[column]
+    
+    if isinstance(raw.dtype, pd.DatetimeTZDtype):
+        values = raw.dt.tz_convert(tzlocal()).dt.tz_localize(None)
+    elif pd.api.types.is_datetime64_dtype(raw):
+        values = raw
+    else:
+        # Parsing as UTC keeps the wall time of naive values
+        parsed = pd.to_datetime(raw, errors="coerce", format="mixed", utc=True)
+        has_timezone = raw.astype("string").str.strip().str.contains(_TIMEZONE_SUFFIX, na=False)
+        local = parsed.dt.tz_convert(tzlocal()).dt.tz_localize(None)
+        values = local.where(has_timezone, parsed.dt.tz_localize(None))
+    
+    provided = _text_column(chunk, column).notna()
+    _flag(problems, values.isna() & provided, f"{column} is not a valid date")
+    return values.fillna(now)
+
+def _whole_number(values):
+    """Mask of values that are whole numbers."""
+    return values.notna() & (values % 1 == 0)
+
+def _lookup_values(conn, table, column, values, fields="1"):
+    """Map each of values found in table.column to the row's fields, looked up in chunked IN lists."""
+    values = list(dict.fromkeys(value for value in values if value is not None))
+    found = {}
+    
+    for start in range(0, len(values), MAX_IN_PARAMS):
+        chunk = values[start:start + MAX_IN_PARAMS]
+        placeholders = ", ".join("?" for _ in chunk)
         
-        # Get the current date
-        now = datetime.now()
+        for row in conn.execute(f"SELECT {column}, {fields} FROM {table} WHERE {column} IN ({placeholders})", chunk):
+            found[row[0]] = tuple(row)[1:]
+    
+    return found
+
+def _sql_column(values):
+    """Turn a validated DataFrame column into Python values sqlite3 can bind."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return [None if pd.isna(value) else value.to_pydatetime() for value in values]
+    
+    return values.astype(object).where(values.notna(), None).tolist()
+
+def _validate_products(chunk, conn):
+    """Validate a chunk of product rows."""
+    problems = pd.Series("", index=chunk.index)
+    
+    name = _text_column(chunk, "name")
+    category = _text_column(chunk, "category")
+    price = _number_column(chunk, "price")
+    stock = _number_column(chunk, "stock")
+    
+    _flag(problems, name.isna(), "name is required")
+    _flag(problems, category.isna(), "category is required")
+    _flag(problems, price.isna() | (price < 0), "price must be a non-negative number")
+    _flag(problems, ~_whole_number(stock) | (stock < 0), "stock must be a non-negative whole number")
+    
+    rows = pd.DataFrame({
+        "name": name,
+        "category": category,
+        "price": price,
+        "description": _text_column(chunk, "description"),
+        "stock": stock.round().astype("Int64"),
+        "created_at": _timestamp_column(chunk, "created_at", problems)
+    })
+    return rows, problems
+
+def _validate_users(chunk, conn):
+    """Validate a chunk of user rows; plain-text passwords are hashed like create_user does."""
+    problems = pd.Series("", index=chunk.index)
+    
+    username = _text_column(chunk, "username")
+    email = _text_column(chunk, "email")
+    password = _text_column(chunk, "password")
+    
+    is_admin = pd.Series(False, index=chunk.index)
+    
+    if "is_admin" in chunk:
+        is_admin = chunk["is_admin"].astype("string").str.strip().str.lower().isin(["1", "true", "yes"])
+    
+    _flag(problems, username.isna(), "username is required")
+    _flag(problems, email.isna() | ~email.str.contains("@", regex=False), "email is not valid")
+    _flag(problems, password.isna(), "password is required")
+    _flag(problems, username.duplicated(keep="first") & username.notna(), "username is repeated in the file")
+    _flag(problems, email.duplicated(keep="first") & email.notna(), "email is repeated in the file")
+    
+    # Usernames and emails must also be new to the database
+    taken_usernames = _lookup_values(conn, "users", "username", username.dropna().tolist())
+    taken_emails = _lookup_values(conn, "users", "email", email.dropna().tolist())
+    _flag(problems, username.isin(list(taken_usernames)), "Username already exists")
+    _flag(problems, email.isin(list(taken_emails)), "Email already exists")
+    
+    rows = pd.DataFrame({
+        "username": username,
+        "email": email,
+        "password": password.map(lambda value: hashlib.sha256(value.encode()).hexdigest(), na_action="ignore"),
+        "is_admin": is_admin,
+        "created_at": _timestamp_column(chunk, "created_at", problems)
+    })
+    return rows, problems
+
+def _validate_orders(chunk, conn):
+    """Validate a chunk of historical order rows against the users and products they reference."""
+    problems = pd.Series("", index=chunk.index)
+    
+    user_id = _number_column(chunk, "user_id")
+    product_id = _number_column(chunk, "product_id")
+    quantity = _number_column(chunk, "quantity")
+    total_price = _number_column(chunk, "total_price")
+    total_provided = _text_column(chunk, "total_price").notna()
+    status = _text_column(chunk, "status").fillna("Delivered")
+    
+    _flag(problems, ~_whole_number(user_id), "user_id is required")
+    _flag(problems, ~_whole_number(product_id), "product_id is required")
+    _flag(problems, ~_whole_number(quantity) | (quantity <= 0), "quantity must be a positive whole number")
+    _flag(problems, (total_price.isna() & total_provided) | (total_price < 0),
+          "total_price must be a non-negative number")
+    _flag(problems, ~status.isin(ORDER_STATUSES), f"status must be one of {', '.join(ORDER_STATUSES)}")
+    
+    user_id = user_id.round().astype("Int64")
+    product_id = product_id.round().astype("Int64")
+    quantity = quantity.round().astype("Int64")
+    
+    # Referenced users and products must exist
+    users = _lookup_values(conn, "users", "id", user_id.dropna().tolist())
+    products = _lookup_values(conn, "products", "id", product_id.dropna().tolist(), "price")
+    _flag(problems, ~user_id.isin(list(users)), "User not found")
+    _flag(problems, ~product_id.isin(list(products)), "Product not found")
+    
+    # Price orders without a total at the product's current price
+    prices = product_id.map({key: value[0] for key, value in products.items()}).astype("float64")
+    
+    rows = pd.DataFrame({
+        "user_id": user_id,
+        "product_id": product_id,
+        "quantity": quantity,
+        "total_price": total_price.where(total_provided, prices * quantity.astype("float64")),
+        "status": status,
+        "created_at": _timestamp_column(chunk, "created_at", problems)
+    })
+    return rows, problems
+
+def _record_imported_orders(cursor, rows):
+    """Add imported orders to the per-product sales statistics."""
+    totals = rows.groupby("product_id")[["quantity", "total_price"]].sum()
+    
+    for product_id, total in totals.iterrows():
+        _bump_product_stats(cursor, int(product_id), units_sold=int(total["quantity"]),
+                            revenue=float(total["total_price"]))
+
+def _bulk_import(table, required_columns, validate, source, file_format=None,
+                 batch_size=IMPORT_BATCH_SIZE, progress=None, after_insert=None):
+    """Validate and insert a CSV/Parquet file a batch at a time, one transaction per batch.
+    
+    Returns {"rows", "inserted", "failed", "errors"}, where errors lists
+    {"row", "error"} for (up to MAX_IMPORT_ERRORS) rejected rows, numbered from 1.
+    """
+    result = {"rows": 0, "inserted": 0, "failed": 0, "errors": []}
+    
+    for chunk in _read_import_chunks(source, batch_size, file_format):
+        chunk = chunk.reset_index(drop=True)
         
-        # For each user, create 1-3 random orders
-        order_id = 1
+        # Reject the file outright if whole columns are missing
+        missing = [column for column in required_columns if column not in chunk]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
         
-        for user_id in user_ids:
-            num_orders = random.randint(1, 3)
+        with db_transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            rows, problems = validate(chunk, conn)
+            valid = problems == ""
+            rows = rows[valid]
             
-            for _ in range(num_orders):
-                # Random product
-                product = random.choice(products)
-                product_id = product[0]
-                product_price = product[1]
-                
-                # Random quantity between 1 and 3
-                quantity = random.randint(1, 3)
+            if not rows.empty:
+                columns = list(rows.columns)
+                cursor.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    zip(*(_sql_column(rows[column]) for column in columns))
+                )
                 
-                # Calculate total price
-                total_price = product_price * quantity
+                if after_insert is not None:
+                    after_insert(cursor, rows)
                 
-                # Random date in the last 90 days
-                days_ago = random.randint(0, 90)
-                order_date = now - timedelta(days=days_ago)
-                
-                # Random status
-                status = random.choice(["Delivered", "Processing", "Shipped"])
-                
-                # Insert order
-                cursor.execute('''
-                INSERT INTO orders (id, user_id, product_id, quantity, total_price, status, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (order_id, user_id, product_id, quantity, total_price, status, order_date))
-                
-                order_id += 1
+                mark_changed(table)
         
-        conn.commit()
+        # Keep per-row errors, numbered by their position in the file
+        for position, message in problems[~valid].items():
+            if len(result["errors"]) < MAX_IMPORT_ERRORS:
+                result["errors"].append({"row": result["rows"] + position + 1, "error": message})
+        
+        result["rows"] += len(chunk)
+        result["inserted"] += len(rows)
+        result["failed"] += int((~valid).sum())
+        
+        if progress is not None:
+            progress(result["rows"], result["inserted"])
     
-    conn.close()
+    return result
 
+def import_products(source, file_format=None, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Bulk import products (name, category, price, stock[, description, created_at])."""
+    return _bulk_import("products", ["name", "category", "price", "stock"], _validate_products,
+                        source, file_format, batch_size, progress)
 
-def update_product(product_id, name, category, price, stock, description):
-    """Update a product in the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if product exists
-    cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-    if not cursor.fetchone():
-        conn.close()
-        return False, "Product not found"
+def import_users(source, file_format=None, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Bulk import users (username, email, password[, is_admin, created_at])."""
+    return _bulk_import("users", ["username", "email", "password"], _validate_users,
+                        source, file_format, batch_size, progress)
+
+def import_orders(source, file_format=None, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Bulk import historical orders (user_id, product_id, quantity[, total_price, status, created_at]).
     
-    # Update product
-    try:
-        cursor.execute('''
-        UPDATE products SET name = ?, category = ?, price = ?, stock = ?, description = ?
-        WHERE id = ?
-        ''', (name, category, price, stock, description, product_id))
-        
-        conn.commit()
-        conn.close()
-        return True, "Product updated successfully"
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return False, str(e)
\ No newline at end of file
+    Imported orders count towards product statistics but do not change stock.
+    """
+    return _bulk_import("orders", ["user_id", "product_id", "quantity"], _validate_orders,
+                        source, file_format, batch_size, progress, after_insert=_record_imported_orders)
\ No newline at end of file
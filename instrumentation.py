@@ -0,0 +1,252 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+# Opt-in: set CRM_QUERY_INSTRUMENTATION=1 (or call db_utils.set_query_instrumentation(True))
+ENABLED = os.environ.get("CRM_QUERY_INSTRUMENTATION", "0") == "1"
+
+# Statements slower than this many milliseconds go to the slow-query log
+SLOW_QUERY_MS = float(os.environ.get("CRM_SLOW_QUERY_MS", "100"))
+
+# File the slow-query log is appended to (one JSON object per line)
+SLOW_QUERY_LOG = os.environ.get("CRM_SLOW_QUERY_LOG", "slow_queries.log")
+
+# Slow queries kept in memory for the admin Performance page
+RECENT_SLOW_QUERIES = 100
+
+# Modules whose frames are skipped when looking for the function that ran a statement
+_INTERNAL_MODULES = ("instrumentation", "profiler", "sqlite3", "pandas", "contextlib", "threading", "concurrent")
+
+_lock = threading.Lock()
+_stats = {}
+_recent_slow = deque(maxlen=RECENT_SLOW_QUERIES)
+_slow_logger = None
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape: literals become ?, IN lists and whitespace collapse."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("(?, ...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+# Helper functions skipped so statements are credited to the public function that needed them
+_HELPER_FUNCTIONS = ("db_connection", "db_transaction", "load", "<lambda>", "<genexpr>", "<listcomp>")
+
+def calling_function():
+    """Name the first public function outside the database plumbing that is running a statement."""
+    frame = sys._getframe(1)
+    
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        name = frame.f_code.co_name
+        
+        if not (module.startswith(_INTERNAL_MODULES) or name.startswith("_") or name in _HELPER_FUNCTIONS):
+            return f"{module}.{name}"
+        
+        frame = frame.f_back
+    
+    return "unknown"
+
+def _get_slow_logger():
+    """Set up the slow-query file logger on first use."""
+    global _slow_logger
+    
+    if _slow_logger is None:
+        logger = logging.getLogger("crm.slow_queries")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8"))
+        _slow_logger = logger
+    
+    return _slow_logger
+
+def _explain(conn, sql, params):
+    """Get a statement's EXPLAIN QUERY PLAN, or None for statements that have no plan."""
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")):
+        return None
+    
+    try:
+        rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    except sqlite3.Error as e:
+        return [f"(plan unavailable: {e})"]
+    
+    return [row[3] for row in rows]
+
+def record(conn, sql, params, duration, rows, caller, many=False, explain=True):
+    """Add one finished statement to the counters, logging it if it was slow.
+    
+    With explain=False a slow statement is logged without its plan, for callers
+    that may no longer own conn.
+    """
+    normalized = normalize_sql(sql)
+    duration_ms = duration * 1000
+    
+    with _lock:
+        entry = _stats.get(normalized)
+        
+        if entry is None:
+            entry = _stats[normalized] = {
+                "sql": normalized, "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "callers": {}
+            }
+        
+        entry["calls"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        entry["rows"] += max(rows, 0)
+        entry["callers"][caller] = entry["callers"].get(caller, 0) + 1
+    
+    if duration_ms >= SLOW_QUERY_MS:
+        slow_query = {
+            "at": datetime.now().isoformat(" "),
+            "duration_ms": round(duration_ms, 3),
+            "rows": rows,
+            "caller": caller,
+            "sql": normalized,
+            # executemany has no single set of parameters to plan with
+            "plan": _explain(conn, sql, params) if explain and not many else None
+        }
+        
+        with _lock:
+            _recent_slow.append(slow_query)
+        
+        _get_slow_logger().info(json.dumps(slow_query))
+
+def get_query_stats():
+    """Get the per-statement counters, slowest in total first."""
+    with _lock:
+        entries = [dict(entry, callers=dict(entry["callers"])) for entry in _stats.values()]
+    
+    for entry in entries:
+        entry["mean_ms"] = entry["total_ms"] / entry["calls"]
+    
+    return sorted(entries, key=lambda entry: entry["total_ms"], reverse=True)
+
+def get_slow_queries():
+    """Get the most recent slow queries, newest first."""
+    with _lock:
+        return list(reversed(_recent_slow))
+
+def reset_query_stats():
+    """Clear the counters and the in-memory slow-query list."""
+    with _lock:
+        _stats.clear()
+        _recent_slow.clear()
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor that times each statement, including the fetches that step through its rows."""
+    
+    _pending = None
+    
+    def _start(self, sql, params, many):
+        self._finish()
+        self._pending = {"sql": sql, "params": params, "many": many, "caller": calling_function(), "duration": 0.0, "rows": 0}
+    
+    def _finish(self, explain=True):
+        pending = self._pending
+        
+        if pending is not None:
+            self._pending = None
+            rows = pending["rows"] if self.description is not None else self.rowcount
+            record(self.connection, pending["sql"], pending["params"], pending["duration"], rows,
+                   pending["caller"], pending["many"], explain)
+    
+    def _timed(self, call, *args):
+        started = time.perf_counter()
+        
+        try:
+            return call(*args)
+        finally:
+            if self._pending is not None:
+                self._pending["duration"] += time.perf_counter() - started
+    
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters, False)
+        result = self._timed(super().execute, sql, parameters)
+        
+        # Statements without a result set are done once executed
+        if self.description is None:
+            self._finish()
+        
+        return result
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, (), True)
+        result = self._timed(super().executemany, sql, seq_of_parameters)
+        self._finish()
+        return result
+    
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        
+        if row is None:
+            self._finish()
+        elif self._pending is not None:
+            self._pending["rows"] += 1
+        
+        return row
+    
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        
+        if self._pending is not None:
+            self._pending["rows"] += len(rows)
+        
+        if not rows:
+            self._finish()
+        
+        return rows
+    
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        
+        if self._pending is not None:
+            self._pending["rows"] += len(rows)
+        
+        self._finish()
+        return rows
+    
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        
+        if self._pending is not None:
+            self._pending["rows"] += 1
+        
+        return row
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def __del__(self):
+        # Single-row lookups are usually never fetched to the end. By the time the
+        # cursor is collected its pooled connection may belong to another thread,
+        # so only the timing is recorded, without running EXPLAIN on it
+        self._finish(explain=False)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """A connection whose statements all run through InstrumentedCursor."""
+    
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,59 @@
+import os
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Threads shared by every session for running a page's independent reads at once
+LOADER_THREADS = int(os.environ.get("CRM_LOADER_THREADS", "4"))
+
+# Set inside loader threads, where nested loads run inline instead of waiting on the pool
+_in_loader = contextvars.ContextVar("in_loader", default=False)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Get the shared loader thread pool, creating it on first use."""
+    global _executor
+    
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=LOADER_THREADS, thread_name_prefix="crm-loader")
+        
+        return _executor
+
+def _run_loader(loader):
+    _in_loader.set(True)
+    return loader()
+
+def load_parallel(**loaders):
+    """Run independent read functions at the same time and return their results by name.
+    
+    Each function takes no arguments, runs on the shared loader pool in a copy of
+    the caller's context (so rerun profiling follows it) and borrows its own pooled
+    connection. Only use it for reads made outside a transaction: the loader
+    threads cannot see the caller's uncommitted writes. If any function raises,
+    the first error is raised once all of them have finished.
+    """
+    # Nothing to overlap, or already on a loader thread (waiting on the pool from it could deadlock)
+    if len(loaders) < 2 or LOADER_THREADS < 2 or _in_loader.get():
+        return {name: loader() for name, loader in loaders.items()}
+    
+    executor = _get_executor()
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, _run_loader, loader)
+        for name, loader in loaders.items()
+    }
+    wait(futures.values())
+    
+    return {name: future.result() for name, future in futures.items()}
+
+def shutdown_loader():
+    """Stop the shared loader threads (a new pool is started on the next load)."""
+    global _executor
+    
+    with _executor_lock:
+        executor, _executor = _executor, None
+    
+    if executor is not None:
+        executor.shutdown(wait=True)
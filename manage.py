@@ -0,0 +1,154 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import db_utils
+
+def cmd_init(args):
+    """Create (or update) the database."""
+    db_utils.initialize_database()
+    db_utils.stop_checkpoint_scheduler()
+    print(f"Database ready at {db_utils.DB_FILE} (schema version {db_utils.get_schema_version()})")
+
+def cmd_migrate(args):
+    """Apply pending schema migrations to an existing database."""
+    if not os.path.exists(db_utils.DB_FILE):
+        print(f"No database at {db_utils.DB_FILE}; run 'init' to create one.", file=sys.stderr)
+        return 1
+    
+    applied = db_utils.run_migrations()
+    
+    if applied:
+        print(f"Applied migrations: {', '.join(str(version) for version in applied)}")
+    else:
+        print("Schema is up to date.")
+    
+    print(f"Schema version: {db_utils.get_schema_version()}")
+
+def cmd_status(args):
+    """Show the schema version, storage profile and pending migrations."""
+    version = db_utils.get_schema_version()
+    pending = [migration for migration in db_utils.MIGRATIONS if migration[0] > version]
+    
+    print(f"Database: {db_utils.DB_FILE}")
+    print(f"Schema version: {version}")
+    
+    for number, description, _ in pending:
+        print(f"  pending {number}: {description}")
+    
+    profile = db_utils.get_storage_profile()
+    print(f"Storage profile: {profile['name']}")
+    
+    for pragma, value in profile["active"].items():
+        print(f"  {pragma} = {value}")
+
+def cmd_checkpoint(args):
+    """Run a WAL checkpoint."""
+    result = db_utils.checkpoint_wal(args.mode)
+    print(f"Checkpointed {result['checkpointed_frames']} of {result['log_frames']} WAL frames"
+          + (" (database busy)" if result["busy"] else ""))
+
+def cmd_rebuild_stats(args):
+    """Recompute the per-product sales and rating statistics."""
+    count = db_utils.rebuild_product_stats()
+    print(f"Rebuilt statistics for {count} products")
+
+def cmd_snapshot_export(args):
+    """Dump every table to Parquet files."""
+    # pyarrow is only needed for snapshots
+    import snapshots
+    
+    row_counts = snapshots.export_snapshot(args.directory, compression=args.compression)
+    
+    for table, count in row_counts.items():
+        print(f"  {table}: {count} rows")
+    
+    print(f"Snapshot written to {args.directory}")
+
+def cmd_snapshot_import(args):
+    """Replace the database contents with a Parquet snapshot."""
+    import snapshots
+    
+    row_counts = snapshots.import_snapshot(args.directory)
+    
+    for table, count in row_counts.items():
+        print(f"  {table}: {count} rows")
+    
+    print(f"Restored {db_utils.DB_FILE} from {args.directory}")
+
+def cmd_generate(args):
+    """Add a synthetic dataset for load testing."""
+    # numpy-based generator is only needed for this command
+    import data_generator
+    
+    def report(table, done, total):
+        print(f"\r  {table}: {done}/{total}", end="\n" if done == total else "", flush=True)
+    
+    started = time.perf_counter()
+    added = data_generator.generate_dataset(
+        users=args.users, products=args.products, orders=args.orders,
+        complaints=args.complaints, ratings=args.ratings, days=args.days,
+        skew=args.skew, seed=args.seed, batch_size=args.batch_size, progress=report, end=args.end
+    )
+    
+    print(f"Added {', '.join(f'{count} {table}' for table, count in added.items())} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CRM database maintenance")
+    parser.add_argument("--db", default=db_utils.DB_FILE, help="Path to the SQLite database file")
+    parser.add_argument("--profile", default=None, choices=sorted(db_utils.STORAGE_PROFILES),
+                        help="Storage profile to use for this command")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    subparsers.add_parser("init", help="Create the database if needed and apply migrations").set_defaults(func=cmd_init)
+    subparsers.add_parser("migrate", help="Apply pending migrations to an existing database").set_defaults(func=cmd_migrate)
+    subparsers.add_parser("status", help="Show schema version and storage settings").set_defaults(func=cmd_status)
+    
+    checkpoint_parser = subparsers.add_parser("checkpoint", help="Checkpoint the write-ahead log")
+    checkpoint_parser.add_argument("--mode", default="TRUNCATE",
+                                   choices=["PASSIVE", "FULL", "RESTART", "TRUNCATE"])
+    checkpoint_parser.set_defaults(func=cmd_checkpoint)
+    
+    export_parser = subparsers.add_parser("snapshot-export", help="Dump all tables to Parquet files")
+    export_parser.add_argument("directory", help="Directory to write the snapshot to")
+    export_parser.add_argument("--compression", default="zstd", choices=["zstd", "snappy", "gzip", "none"])
+    export_parser.set_defaults(func=cmd_snapshot_export)
+    
+    import_parser = subparsers.add_parser("snapshot-import",
+                                          help="Replace the database contents with a Parquet snapshot")
+    import_parser.add_argument("directory", help="Directory holding the snapshot")
+    import_parser.set_defaults(func=cmd_snapshot_import)
+    
+    generate_parser = subparsers.add_parser("generate", help="Add a synthetic dataset for load testing")
+    generate_parser.add_argument("--users", type=int, default=1000)
+    generate_parser.add_argument("--products", type=int, default=200)
+    generate_parser.add_argument("--orders", type=int, default=10000)
+    generate_parser.add_argument("--complaints", type=int, default=500)
+    generate_parser.add_argument("--ratings", type=int, default=2000)
+    generate_parser.add_argument("--days", type=int, default=365, help="Spread dates over this many past days")
+    generate_parser.add_argument("--skew", type=float, default=1.1,
+                                 help="Zipf exponent of product popularity (0 = uniform)")
+    generate_parser.add_argument("--seed", type=int, default=None, help="Random seed for a reproducible dataset")
+    generate_parser.add_argument("--end", type=datetime.fromisoformat, default=None,
+                                 help="Date the generated dates count back from (default: 2024-01-01 with --seed, else now)")
+    generate_parser.add_argument("--batch-size", type=int, default=50000, help="Rows inserted per transaction")
+    generate_parser.set_defaults(func=cmd_generate)
+    
+    subparsers.add_parser("rebuild-stats", help="Recompute per-product sales and rating statistics").set_defaults(func=cmd_rebuild_stats)
+    
+    args = parser.parse_args(argv)
+    
+    db_utils.DB_FILE = args.db
+    if args.profile:
+        db_utils.STORAGE_PROFILE = args.profile
+    
+    try:
+        return args.func(args) or 0
+    finally:
+        db_utils.close_connection_pool()
+
+if __name__ == "__main__":
+    sys.exit(main())
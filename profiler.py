@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from instrumentation import calling_function
+
+# Profile every rerun of every session (admins can also turn it on for their own session)
+PROFILE_RERUNS = os.environ.get("CRM_PROFILE_RERUNS", "0") == "1"
+
+# File finished rerun profiles are appended to (one JSON object per line)
+PROFILE_LOG = os.environ.get("CRM_PROFILE_LOG", "rerun_profile.log")
+
+# Finished profiles kept in memory for the per-page summary
+RECENT_PROFILES = 500
+
+# Profile of the rerun running in this context, and whether a data call is already being timed
+_current = contextvars.ContextVar("rerun_profile", default=None)
+_in_data_call = contextvars.ContextVar("in_data_call", default=False)
+
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_PROFILES)
+_logger = None
+
+class RerunProfile:
+    """Timings collected during one Streamlit rerun."""
+    
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.page = None
+        self.total_ms = None
+        self.phases = []
+        self.data_calls = []
+        self.queries = 0
+        self._lock = threading.Lock()
+    
+    def add_phase(self, name, duration):
+        with self._lock:
+            self.phases.append({"phase": name, "ms": duration * 1000})
+    
+    def add_data_call(self, name, duration, queries):
+        with self._lock:
+            self.data_calls.append({"call": name, "ms": duration * 1000, "queries": queries})
+    
+    def count_statement(self, statement):
+        """sqlite3 trace callback: count each statement (trigger bodies are reported as comments)."""
+        if not statement.startswith("--"):
+            with self._lock:
+                self.queries += 1
+    
+    def to_dict(self):
+        with self._lock:
+            return {
+                "at": self.started_at.isoformat(" "),
+                "page": self.page,
+                "total_ms": self.total_ms,
+                "queries": self.queries,
+                "data_ms": sum(call["ms"] for call in self.data_calls),
+                "phases": list(self.phases),
+                "data_calls": list(self.data_calls)
+            }
+
+def current_profile():
+    """Get the profile of the rerun running in this context, if it is being profiled."""
+    return _current.get()
+
+def _get_logger():
+    """Set up the profile file logger on first use."""
+    global _logger
+    
+    if _logger is None:
+        logger = logging.getLogger("crm.rerun_profile")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(logging.FileHandler(PROFILE_LOG, encoding="utf-8"))
+        _logger = logger
+    
+    return _logger
+
+@contextmanager
+def profile_rerun(enabled=True):
+    """Profile the with-block as one rerun, yielding the profile (or None when disabled).
+    
+    Reruns cut short by an exception (including st.rerun()) are not recorded.
+    """
+    if not enabled:
+        yield None
+        return
+    
+    profile = RerunProfile()
+    token = _current.set(profile)
+    
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+    
+    profile.total_ms = (time.perf_counter() - profile.started) * 1000
+    summary = profile.to_dict()
+    
+    with _lock:
+        _recent.append(summary)
+    
+    _get_logger().info(json.dumps(summary))
+
+@contextmanager
+def phase(name):
+    """Time the with-block as a named phase of the current rerun."""
+    profile = _current.get()
+    
+    if profile is None:
+        yield
+        return
+    
+    started = time.perf_counter()
+    
+    try:
+        yield
+    finally:
+        profile.add_phase(name, time.perf_counter() - started)
+
+@contextmanager
+def data_call(conn):
+    """Time an outermost use of a database connection and count the statements it runs."""
+    profile = _current.get()
+    
+    # Nested borrows belong to the data call that is already being timed
+    if profile is None or _in_data_call.get():
+        yield
+        return
+    
+    name = calling_function()
+    token = _in_data_call.set(True)
+    queries_before = profile.queries
+    conn.set_trace_callback(profile.count_statement)
+    started = time.perf_counter()
+    
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        conn.set_trace_callback(None)
+        _in_data_call.reset(token)
+        profile.add_data_call(name, duration, profile.queries - queries_before)
+
+def get_page_timings():
+    """Summarize the recent profiles per page, slowest on average first."""
+    pages = {}
+    
+    with _lock:
+        profiles = list(_recent)
+    
+    for summary in profiles:
+        page = pages.setdefault(summary["page"], {"page": summary["page"], "reruns": 0, "total_ms": 0.0,
+                                                  "max_ms": 0.0, "data_ms": 0.0, "queries": 0})
+        page["reruns"] += 1
+        page["total_ms"] += summary["total_ms"]
+        page["max_ms"] = max(page["max_ms"], summary["total_ms"])
+        page["data_ms"] += summary["data_ms"]
+        page["queries"] += summary["queries"]
+    
+    for page in pages.values():
+        page["mean_ms"] = page["total_ms"] / page["reruns"]
+        page["mean_data_ms"] = page["data_ms"] / page["reruns"]
+        page["mean_queries"] = page["queries"] / page["reruns"]
+    
+    return sorted(pages.values(), key=lambda page: page["mean_ms"], reverse=True)
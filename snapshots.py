@@ -0,0 +1,113 @@
+import os
+import json
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import db_utils
+
+# Arrow types for the column types declared in the CRM schema
+ARROW_TYPES = {
+    "INTEGER": pa.int64(),
+    "REAL": pa.float64(),
+    "TEXT": pa.string(),
+    "BOOLEAN": pa.bool_(),
+    "TIMESTAMP": pa.timestamp("us")
+}
+
+# Name of the file describing a snapshot directory
+MANIFEST_FILE = "manifest.json"
+
+def table_schema(conn, table):
+    """Build the Arrow schema for a table from its declared column types."""
+    fields = []
+    
+    for column in conn.execute(f"PRAGMA table_info({table})"):
+        arrow_type = ARROW_TYPES.get(column["type"].upper(), pa.string())
+        fields.append(pa.field(column["name"], arrow_type, nullable=not column["notnull"]))
+    
+    return pa.schema(fields)
+
+def export_snapshot(directory, compression="zstd", batch_size=db_utils.EXPORT_CHUNK_SIZE):
+    """Write every CRM table to a Parquet file in directory and return the row counts.
+    
+    All tables are read in one transaction, so the snapshot is consistent.
+    """
+    os.makedirs(directory, exist_ok=True)
+    row_counts = {}
+    
+    with db_utils.db_transaction() as conn:
+        schema_version = db_utils.get_schema_version()
+        
+        for table in db_utils.TABLES:
+            schema = table_schema(conn, table)
+            cursor = conn.execute(f"SELECT {', '.join(schema.names)} FROM {table} ORDER BY id")
+            row_counts[table] = 0
+            
+            with pq.ParquetWriter(os.path.join(directory, f"{table}.parquet"), schema,
+                                  compression=compression) as writer:
+                # Write one row group per batch so memory use stays bounded
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    
+                    if not rows:
+                        break
+                    
+                    columns = list(zip(*rows))
+                    writer.write_batch(pa.RecordBatch.from_arrays(
+                        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                        schema=schema
+                    ))
+                    row_counts[table] += len(rows)
+    
+    manifest = {
+        "created_at": datetime.now().isoformat(" "),
+        "schema_version": schema_version,
+        "compression": compression,
+        "tables": row_counts
+    }
+    
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    
+    return row_counts
+
+def import_snapshot(directory, batch_size=db_utils.EXPORT_CHUNK_SIZE):
+    """Replace the contents of every CRM table with a snapshot and return the row counts.
+    
+    The database is created first if needed, and the whole restore runs in one
+    transaction, so a failed import leaves the existing data untouched.
+    """
+    missing = [table for table in db_utils.TABLES
+               if not os.path.exists(os.path.join(directory, f"{table}.parquet"))]
+    
+    if missing:
+        raise FileNotFoundError(f"Snapshot in {directory} has no data for: {', '.join(missing)}")
+    
+    db_utils.initialize_database()
+    row_counts = {}
+    
+    with db_utils.db_transaction(immediate=True) as conn:
+        # Clear children before parents
+        for table in reversed(db_utils.TABLES):
+            conn.execute(f"DELETE FROM {table}")
+        
+        for table in db_utils.TABLES:
+            parquet_file = pq.ParquetFile(os.path.join(directory, f"{table}.parquet"))
+            
+            # Only load columns the current schema still has
+            table_columns = set(table_schema(conn, table).names)
+            columns = [name for name in parquet_file.schema_arrow.names if name in table_columns]
+            sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+            row_counts[table] = 0
+            
+            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+                values = [batch.column(name).to_pylist() for name in columns]
+                conn.executemany(sql, zip(*values))
+                row_counts[table] += batch.num_rows
+        
+        # Statistics are recomputed from the restored rows and the caches dropped on commit
+        db_utils.after_bulk_restore(conn)
+    
+    return row_counts
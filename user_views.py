@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import time
-from db_utils import (
+from backend import (
     get_product_by_id, get_user_orders, get_user_complaints, get_user_ratings,
-    search_products, add_order, add_complaint, add_rating, generate_sample_orders
+    search_products, place_orders, add_complaint, add_rating, generate_sample_orders,
+    get_all_products, get_products_by_ids, get_orders_by_ids, get_product_filter_options,
+    get_orders_page, count_orders, get_order_by_id
 )
+from utils import paginate, flash
+from loader import load_parallel
 
 def show_dashboard():
     """Display the user dashboard with summary information."""
@@ -15,11 +18,16 @@ def show_dashboard():
     
     col1, col2 = st.columns(2)
     
-    # Get user data
+    # Get user data (the three reads are independent, so they run at the same time)
     user_id = st.session_state.user_id
-    orders = get_user_orders(user_id)
-    complaints = get_user_complaints(user_id)
-    ratings = get_user_ratings(user_id)
+    user_data = load_parallel(
+        orders=lambda: get_user_orders(user_id),
+        complaints=lambda: get_user_complaints(user_id),
+        ratings=lambda: get_user_ratings(user_id)
+    )
+    orders = user_data["orders"]
+    complaints = user_data["complaints"]
+    ratings = user_data["ratings"]
     
     with col1:
         st.subheader("Your Activity")
@@ -45,9 +53,10 @@ def show_dashboard():
         
         if not orders.empty:
             recent_orders = orders.head(3)
+            products = get_products_by_ids(recent_orders["product_id"])
             
             for _, order in recent_orders.iterrows():
-                product = get_product_by_id(order["product_id"])
+                product = products.get(order["product_id"])
                 
                 if product is not None:
                     st.write(f"**{product['name']}** - ${order['total_price']:.2f}")
@@ -85,17 +94,18 @@ def show_product_search():
     with col1:
         search_query = st.text_input("Search Products", value="")
     
+    # Get the category list and price range (cached until the products change)
+    filter_options = get_product_filter_options()
+    
     with col2:
         # Get all unique categories
-        products_df = get_all_products()
-        categories = products_df["category"].unique().tolist()
-        categories = ["All Categories"] + categories
+        categories = ["All Categories"] + filter_options["categories"]
         selected_category = st.selectbox("Category", categories)
     
     with col3:
         # Price range slider
-        min_price = float(products_df["price"].min())
-        max_price = float(products_df["price"].max())
+        min_price = float(filter_options["min_price"])
+        max_price = float(filter_options["max_price"])
         
         price_range = st.slider(
             "Price Range",
@@ -152,7 +162,7 @@ def show_product_search():
                                 if st.button(f"View", key=f"view_{product['id']}"):
                                     st.session_state.selected_product = product["id"]
                                     st.session_state.last_page = "search"
-                                    
+                            
                             with col2:
                                 if st.button(f"Buy", key=f"buy_{product['id']}"):
                                     show_purchase_form(product["id"])
@@ -179,23 +189,75 @@ def show_product_search():
             
             # Purchase form
             st.subheader("Purchase")
-            quantity = st.number_input("Quantity", min_value=1, max_value=int(product['stock']), value=1)
+            cart = st.session_state.setdefault("cart", {})
+            in_cart = cart.get(product_id, 0)
             
-            if st.button("Add to Order"):
-                success, message = add_order(st.session_state.user_id, product_id, quantity)
+            if in_cart >= product['stock']:
+                st.info("All available stock of this product is already in your cart.")
+            else:
+                quantity = st.number_input("Quantity", min_value=1, max_value=int(product['stock']) - in_cart, value=1)
                 
-                if success:
-                    st.success(f"Order placed successfully! Order #{message}")
-                    time.sleep(1)
+                if st.button("Add to Cart"):
+                    cart[product_id] = in_cart + quantity
                     st.session_state.pop("selected_product", None)
                     st.rerun()
-                else:
-                    st.error(message)
             
             # Go back button
             if st.button("Back to Results"):
                 st.session_state.pop("selected_product", None)
                 st.rerun()
+    
+    show_cart()
+
+def show_cart():
+    """Show the cart and check every item in it out as one order batch."""
+    cart = st.session_state.get("cart")
+    
+    if not cart:
+        return
+    
+    st.divider()
+    st.subheader("Your Cart")
+    
+    # Look up every product in the cart in one query
+    products = get_products_by_ids(cart)
+    total = 0
+    
+    for product_id, quantity in list(cart.items()):
+        product = products.get(product_id)
+        
+        if product is None:
+            cart.pop(product_id)
+            continue
+        
+        line_total = product['price'] * quantity
+        total += line_total
+        
+        col1, col2, col3 = st.columns([3, 1, 1])
+        
+        with col1:
+            st.write(f"**{product['name']}**")
+            st.write(f"{quantity} × ${product['price']:.2f}")
+        
+        with col2:
+            st.write(f"${line_total:.2f}")
+        
+        with col3:
+            if st.button("Remove", key=f"remove_{product_id}"):
+                cart.pop(product_id)
+                st.rerun()
+    
+    st.write(f"**Total: ${total:.2f}**")
+    
+    if st.button("Checkout"):
+        success, result = place_orders(st.session_state.user_id, list(cart.items()))
+        
+        if success:
+            st.session_state.cart = {}
+            flash(f"Order placed successfully! Order #{', #'.join(str(order_id) for order_id in result)}")
+            st.rerun()
+        else:
+            st.error(result)
 
 def show_purchase_form(product_id):
     """Show the purchase form for a product."""
@@ -211,17 +273,19 @@ def show_order_history():
     
     # Get user orders
     user_id = st.session_state.user_id
-    orders = get_user_orders(user_id)
     
-    if orders.empty:
+    if count_orders(user_id) == 0:
         st.info("You haven't placed any orders yet.")
     else:
-        # Sort orders by date (most recent first)
-        orders = orders.sort_values(by="created_at", ascending=False)
+        # Get one page of orders (most recent first)
+        orders = paginate("order_history", lambda cursor: get_orders_page(user_id, cursor))
+        
+        # Look up every ordered product on this page in one query
+        products = get_products_by_ids(orders["product_id"])
         
         # Display orders
         for _, order in orders.iterrows():
-            product = get_product_by_id(order["product_id"])
+            product = products.get(order["product_id"])
             
             if product is not None:
                 col1, col2, col3 = st.columns([2, 1, 1])
@@ -247,7 +311,7 @@ def show_order_history():
         # Display complaint form if an order is selected
         if "selected_order_for_complaint" in st.session_state:
             order_id = st.session_state.selected_order_for_complaint
-            order = orders[orders["id"] == order_id].iloc[0]
+            order = get_order_by_id(order_id)
             product = get_product_by_id(order["product_id"])
             
             st.subheader(f"Submit Complaint for Order #{order_id}")
@@ -265,8 +329,7 @@ def show_order_history():
                         success, message = add_complaint(user_id, order_id, subject, description)
                         
                         if success:
-                            st.success(f"Complaint submitted successfully! Complaint #{message}")
-                            time.sleep(1)
+                            flash(f"Complaint submitted successfully! Complaint #{message}")
                             st.session_state.pop("selected_order_for_complaint", None)
                             st.rerun()
                         else:
@@ -298,9 +361,10 @@ def show_complaint_form():
         else:
             # Create order options
             order_options = []
+            products = get_products_by_ids(orders["product_id"])
             
             for _, order in orders.iterrows():
-                product = get_product_by_id(order["product_id"])
+                product = products.get(order["product_id"])
                 
                 if product is not None:
                     option_text = f"Order #{order['id']} - {product['name']} - ${order['total_price']:.2f} ({order['created_at'].strftime('%Y-%m-%d')})"
@@ -324,8 +388,7 @@ def show_complaint_form():
                     success, message = add_complaint(user_id, selected_order_id, subject, description)
                     
                     if success:
-                        st.success(f"Complaint submitted successfully! Complaint #{message}")
-                        time.sleep(1)
+                        flash(f"Complaint submitted successfully! Complaint #{message}")
                         st.rerun()
                     else:
                         st.error(message)
@@ -344,14 +407,16 @@ def show_complaint_form():
             # Sort complaints by date (most recent first)
             complaints = complaints.sort_values(by="created_at", ascending=False)
             
+            # Look up the complained-about orders and their products, one query each
+            complaint_orders = get_orders_by_ids(complaints["order_id"])
+            complaint_products = get_products_by_ids(order["product_id"] for order in complaint_orders.values())
+            
             # Display complaints
             for _, complaint in complaints.iterrows():
-                order = get_user_orders(user_id)
-                order = order[order["id"] == complaint["order_id"]]
+                order = complaint_orders.get(complaint["order_id"])
                 
-                if not order.empty:
-                    order = order.iloc[0]
-                    product = get_product_by_id(order["product_id"])
+                if order is not None and order["user_id"] == user_id:
+                    product = complaint_products.get(order["product_id"])
                     
                     if product is not None:
                         st.write(f"**Subject:** {complaint['subject']}")
@@ -385,6 +450,9 @@ def show_ratings():
         ratings = get_user_ratings(user_id)
         rated_product_ids = [] if ratings.empty else ratings["product_id"].unique()
         
+        # Look up every ordered or rated product in one query
+        products = get_products_by_ids(list(ordered_product_ids) + list(rated_product_ids))
+        
         # Tabs for rating and history
         tab1, tab2 = st.tabs(["Rate a Product", "Your Ratings"])
         
@@ -395,7 +463,7 @@ def show_ratings():
             product_options = []
             
             for product_id in ordered_product_ids:
-                product = get_product_by_id(product_id)
+                product = products.get(product_id)
                 
                 if product is not None:
                     option_text = f"{product['name']} - ${product['price']:.2f}"
@@ -410,7 +478,7 @@ def show_ratings():
             )
             
             selected_product_id = product_options[selected_option][1]
-            selected_product = get_product_by_id(selected_product_id)
+            selected_product = products[selected_product_id]
             
             # Get existing rating if available
             existing_rating = None
@@ -443,8 +511,7 @@ def show_ratings():
                     success, message = add_rating(user_id, selected_product_id, rating, review)
                     
                     if success:
-                        st.success(f"Rating {'updated' if existing_rating else 'submitted'} successfully!")
-                        time.sleep(1)
+                        flash(f"Rating {'updated' if existing_rating else 'submitted'} successfully!")
                         st.rerun()
                     else:
                         st.error(message)
@@ -462,7 +529,7 @@ def show_ratings():
                 
                 # Display ratings
                 for _, user_rating in ratings.iterrows():
-                    product = get_product_by_id(user_rating["product_id"])
+                    product = products.get(user_rating["product_id"])
                     
                     if product is not None:
                         st.write(f"**{product['name']}**")
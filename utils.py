@@ -1,4 +1,5 @@
 import streamlit as st
+import pandas as pd
 
 def initialize_session_state():
     """Initialize session state variables if they don't exist."""
@@ -14,6 +15,15 @@ def initialize_session_state():
     if "is_admin" not in st.session_state:
         st.session_state.is_admin = False
 
+def flash(message, kind="success"):
+    """Queue a message to show on the next run, so a handler can st.rerun() straight away."""
+    st.session_state.setdefault("flash_messages", []).append((kind, message))
+
+def show_flash_messages():
+    """Show the queued flash messages once, then forget them."""
+    for kind, message in st.session_state.pop("flash_messages", []):
+        getattr(st, kind)(message)
+
 def format_price(price):
     """Format a price value as a string with $ symbol."""
     return f"${price:.2f}"
@@ -25,3 +35,58 @@ def format_date(date):
 def format_datetime(datetime):
     """Format a datetime as a readable datetime string."""
     return datetime.strftime("%Y-%m-%d %H:%M:%S")
+
+def paginate(key, fetch_page, filters=()):
+    """Fetch the current page of a keyset-paged listing and render Previous/Next controls.
+    
+    fetch_page(cursor) must return (page, next_cursor). The stack of cursors for
+    the pages visited so far lives in session state under key, and is reset
+    whenever filters change.
+    """
+    state_key = f"{key}_cursors"
+    filters_key = f"{key}_filters"
+    
+    # Start from the first page when the filters change
+    if st.session_state.get(filters_key) != filters or state_key not in st.session_state:
+        st.session_state[state_key] = [None]
+        st.session_state[filters_key] = filters
+    
+    cursors = st.session_state[state_key]
+    page, next_cursor = fetch_page(cursors[-1])
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    
+    with col1:
+        if st.button("← Previous", key=f"{key}_previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    
+    with col3:
+        if st.button("Next →", key=f"{key}_next", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    
+    return page
+
+def show_rerun_profile(profile):
+    """Render the timing breakdown of a profiled rerun in a collapsible panel."""
+    summary = profile.to_dict()
+    
+    with st.expander(f"Rerun profile: {summary['total_ms']:.1f} ms, {summary['queries']} queries"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total", f"{summary['total_ms']:.1f} ms")
+        col2.metric("Data Calls", f"{summary['data_ms']:.1f} ms")
+        col3.metric("Queries", summary["queries"])
+        
+        st.write("**Phases**")
+        st.dataframe(pd.DataFrame(summary["phases"], columns=["phase", "ms"]).round(3),
+                     hide_index=True, use_container_width=True)
+        
+        # Slowest data calls first
+        st.write("**Data calls**")
+        data_calls = pd.DataFrame(summary["data_calls"], columns=["call", "ms", "queries"])
+        st.dataframe(data_calls.sort_values("ms", ascending=False).round(3),
+                     hide_index=True, use_container_width=True)